@@ -0,0 +1,91 @@
+# measures cache hit latency for small responses with pickled and compact cache entries (see
+#  `SourceConfig.cache_compact_entries`), both for deserialization alone and for `BaseSource.get`
+#  using the sqlite backend
+#
+# usage: python benchmarks/cache_serializer.py [requests]
+
+import os
+import sys
+import time
+import pickle
+import tempfile
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+from reqcli.cache import serializer
+from reqcli.config import Configuration
+from reqcli.source import BaseSource, ReqData, SourceConfig
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"id": 1, "name": "test"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(func: Callable[[], object], n: int) -> float:
+    times: List[float] = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run(url: str, compact: bool, n: int) -> List[float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        Configuration.cache_backend = 'sqlite'
+        Configuration.cache_name = os.path.join(tmp, 'cache.db')
+        source = BaseSource(ReqData(path=url), SourceConfig(cache_compact_entries=compact, requests_per_second=float('inf')))
+        reqdata = ReqData(path='item')
+        source.get(reqdata).close()
+
+        # value as stored in the database
+        responses = source._session.cache.responses  # type: ignore
+        key = next(iter(responses))
+        data = responses.serialize(responses[key])
+        loads = serializer.loads if compact else pickle.loads
+
+        def get() -> None:
+            res = source.get(reqdata)
+            assert res.from_cache  # type: ignore
+            res.content
+            res.close()
+
+        return [len(data), measure(lambda: loads(data), n), measure(get, n)]
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    server = start_server()
+    url = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    results = {name: run(url, compact, n) for name, compact in (('pickle', False), ('compact', True))}
+    print(f'{"":<10}{"entry size":>12}{"loads":>12}{"cache hit":>12}  (median of {n})')
+    for name, (size, loads, hit) in results.items():
+        print(f'{name:<10}{size:>10} B{loads * 1e6:>10.1f}us{hit * 1e6:>10.1f}us')
+    pickled, compact = results['pickle'], results['compact']
+    print(f'speedup:  loads {pickled[1] / compact[1]:.1f}x, cache hit {pickled[2] / compact[2]:.1f}x')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
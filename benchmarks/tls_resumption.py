@@ -0,0 +1,86 @@
+# measures request latency on new pinned-fingerprint connections to a local server, with and without
+#  TLS session resumption; the difference is the handshake time saved
+#
+# usage: python benchmarks/tls_resumption.py [connections]
+
+import os
+import ssl
+import sys
+import time
+import hashlib
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from reqcli.source import BaseSource, ReqData, SourceConfig
+
+
+CERT_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'data', 'localhost.pem')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(CERT_PATH)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def get_fingerprint() -> str:
+    with open(CERT_PATH) as f:
+        pem = f.read()
+    cert = ssl.PEM_cert_to_DER_cert(pem[:pem.index(ssl.PEM_FOOTER) + len(ssl.PEM_FOOTER)])
+    return hashlib.sha256(cert).hexdigest()
+
+
+def run(url: str, resumption: bool, n: int) -> float:
+    source = BaseSource(
+        ReqData(path=url),
+        SourceConfig(enable_cache=False, tls_session_resumption=resumption, requests_per_second=float('inf')),
+        verify_tls=False,
+        require_fingerprint=get_fingerprint()
+    )
+    poolmanager = source._session.adapters['https://'].poolmanager  # type: ignore
+
+    times = []
+    for _ in range(n + 1):
+        # new pool for every connection
+        poolmanager.clear()
+        start = time.perf_counter()
+        source.get(ReqData(path='')).close()
+        times.append(time.perf_counter() - start)
+    poolmanager.clear()
+
+    # first handshake can't be resumed
+    return statistics.median(times[1:])
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    server = start_server()
+    url = f'https://localhost:{server.server_address[1]}/'
+
+    full = run(url, False, n)
+    resumed = run(url, True, n)
+    print(f'full handshake:    {full * 1000:.3f}ms per request (median of {n})')
+    print(f'resumed handshake: {resumed * 1000:.3f}ms per request (median of {n})')
+    print(f'saved:             {(full - resumed) * 1000:.3f}ms ({(1 - resumed / full) * 100:.1f}%)')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+from .access import CacheAccessTracker
+from .keys import CacheKeyRules, CacheKeyStats, CacheKeyStatsRecorder
+from .serializer import CompactCachedResponse
+from .snapshot import export_snapshot, import_snapshot
+from .sharded import ShardedDbCache, ShardedDbDict
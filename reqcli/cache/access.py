@@ -0,0 +1,78 @@
+import time
+import atexit
+import sqlite3
+import logging
+import weakref
+import threading
+import contextlib
+from typing import Dict, Iterator, Tuple
+
+
+ACCESS_TABLE = 'access_stats'
+
+_logger = logging.getLogger(__name__)
+
+
+def create_access_table(con: sqlite3.Connection) -> None:
+    con.execute(f'create table if not exists `{ACCESS_TABLE}` (key PRIMARY KEY, hits INTEGER NOT NULL, last_access REAL NOT NULL)')
+
+
+# counts cache hits per key, written to the cache database in batches to keep the lookup path cheap
+class CacheAccessTracker:
+    def __init__(self, db_path: str, *, flush_interval: float = 5.0, max_pending: int = 1000, timeout: float = 30.0):
+        assert flush_interval > 0 and max_pending > 0
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._pending: Dict[str, Tuple[int, float]] = {}  # key -> (hits, last access)
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        with self.__connect() as con:
+            create_access_table(con)
+        atexit.register(CacheAccessTracker.__flush_ref, weakref.ref(self))
+
+    def record(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            hits, _ = self._pending.get(key, (0, 0.0))
+            self._pending[key] = (hits + 1, time.time())
+            due = len(self._pending) >= self.max_pending or now - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._last_flush = time.monotonic()
+            if not pending:
+                return
+            try:
+                with self.__connect() as con:
+                    con.executemany(
+                        f'insert into `{ACCESS_TABLE}` (key, hits, last_access) values (?, ?, ?) '
+                        'on conflict(key) do update set hits = hits + excluded.hits, last_access = max(last_access, excluded.last_access)',
+                        [(key, hits, last_access) for key, (hits, last_access) in pending.items()]
+                    )
+            except sqlite3.Error as e:
+                # statistics are not important enough to fail requests
+                _logger.warning(f'Failed to write cache access stats: {e}')
+
+    @contextlib.contextmanager
+    def __connect(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.db_path, timeout=self.timeout)
+        try:
+            with con:  # commits on success
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def __flush_ref(ref: 'weakref.ReferenceType[CacheAccessTracker]') -> None:
+        tracker = ref()
+        if tracker is not None:
+            tracker.flush()
@@ -0,0 +1,136 @@
+import os
+import re
+import sys
+import argparse
+from typing import Callable, Dict, List, Optional, TextIO
+
+from . import maintenance
+from ..config import Configuration
+
+
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_duration(value: str) -> float:
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*', value)
+    if match is None:
+        raise argparse.ArgumentTypeError(f'invalid duration: {value!r} (expected e.g. 30m, 12h, 7d)')
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2) or 's']
+
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = 'TiB'
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+
+
+# same resolution as the sqlite backend
+def default_db_path() -> str:
+    path = os.path.abspath(os.path.expanduser(Configuration.cache_name))
+    if '.' not in os.path.basename(path):
+        path += '.sqlite'
+    return path
+
+
+def _print_groups(out: TextIO, title: str, groups: Dict[str, maintenance.CacheGroupStats], sort: bool = True) -> None:
+    print(f'\n{title}:', file=out)
+    items = sorted(groups.items(), key=lambda item: item[1].size, reverse=True) if sort else groups.items()
+    for name, group in items:
+        print(f'  {name:<40} {group.entries:>8} {format_size(group.size):>12}', file=out)
+
+
+def _stats(args: argparse.Namespace, path: str, out: TextIO) -> None:
+    stats = maintenance.get_stats(path, top=args.top)
+    print(f'entries:   {stats.entries} ({stats.redirects} redirects, {stats.invalid} invalid)', file=out)
+    print(f'size:      {format_size(stats.size)}', file=out)
+    print(f'file size: {format_size(stats.file_size)} ({format_size(stats.free_size)} free)', file=out)
+    _print_groups(out, 'by host', stats.by_host)
+    _print_groups(out, 'by status', {str(status): group for status, group in stats.by_status.items()})
+    _print_groups(out, 'by age', stats.by_age, sort=False)
+    if stats.largest:
+        print('\nlargest:', file=out)
+        for entry in stats.largest:
+            print(f'  {format_size(entry.size):>12} {entry.status} {entry.url}', file=out)
+
+
+def _prune(args: argparse.Namespace, path: str, out: TextIO) -> None:
+    count = maintenance.prune(
+        path,
+        older_than=args.older_than,
+        hosts=args.host,
+        statuses=args.status,
+        expired=args.expired,
+        invalid=args.invalid,
+        dry_run=args.dry_run,
+        chunk_size=args.chunk_size
+    )
+    print(f'{"would delete" if args.dry_run else "deleted"} {count} entries', file=out)
+
+
+def _vacuum(args: argparse.Namespace, path: str, out: TextIO) -> None:
+    freed = maintenance.vacuum(path, full=args.full, chunk_pages=args.chunk_pages)
+    print(f'freed {format_size(freed)}', file=out)
+
+
+def _hot(args: argparse.Namespace, path: str, out: TextIO) -> None:
+    keys = maintenance.get_hot_keys(path, top=args.top)
+    if not keys:
+        print('no access stats found (see `SourceConfig.cache_access_tracking`)', file=out)
+    for entry in keys:
+        last_access = entry.last_access.isoformat(' ', 'seconds')
+        print(f'  {entry.hits:>8} {last_access} {entry.url or f"<deleted: {entry.key}>"}', file=out)
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m reqcli.cache', description='Inspect and maintain sqlite response caches')
+    parser.add_argument('--db', action='append', help='path of cache database or shard, can be repeated (default: `Configuration.cache_name`)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stats = subparsers.add_parser('stats', help='show entry counts and sizes by host/status/age')
+    stats.add_argument('--top', type=int, default=10, help='number of largest entries to show')
+    stats.set_defaults(func=_stats)
+
+    prune = subparsers.add_parser('prune', help='delete entries matching all given criteria')
+    prune.add_argument('--older-than', type=parse_duration, help='e.g. 30m, 12h, 7d')
+    prune.add_argument('--host', action='append', help='can be repeated')
+    prune.add_argument('--status', action='append', type=int, help='can be repeated')
+    prune.add_argument('--expired', action='store_true')
+    prune.add_argument('--invalid', action='store_true', help='entries that cannot be deserialized')
+    prune.add_argument('--dry-run', action='store_true')
+    prune.add_argument('--chunk-size', type=int, default=500, help='entries deleted per transaction')
+    prune.set_defaults(func=_prune)
+
+    vacuum = subparsers.add_parser('vacuum', help='reclaim unused space')
+    vacuum.add_argument('--full', action='store_true', help='rebuild the entire database at once, instead of incrementally')
+    vacuum.add_argument('--chunk-pages', type=int, default=1000, help='pages freed per step')
+    vacuum.set_defaults(func=_vacuum)
+
+    hot = subparsers.add_parser('hot', help='show the most frequently read entries (requires access tracking)')
+    hot.add_argument('--top', type=int, default=20)
+    hot.set_defaults(func=_hot)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, out: Optional[TextIO] = None) -> int:
+    out = out or sys.stdout
+    parser = _create_parser()
+    args = parser.parse_args(argv)
+    paths: List[str] = args.db or [default_db_path()]
+    func: Callable[[argparse.Namespace, str, TextIO], None] = args.func
+
+    if args.command == 'prune' and args.older_than is None and not (args.host or args.status or args.expired or args.invalid):
+        parser.error('prune requires at least one of --older-than, --host, --status, --expired or --invalid')
+
+    for path in paths:
+        if len(paths) > 1:
+            print(f'== {path}', file=out)
+        try:
+            func(args, path, out)
+        except FileNotFoundError as e:
+            print(f'error: {e}', file=sys.stderr)
+            return 1
+    return 0
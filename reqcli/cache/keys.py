@@ -0,0 +1,72 @@
+import threading
+import urllib.parse
+import requests
+from dataclasses import dataclass
+from requests.structures import CaseInsensitiveDict
+from typing import AbstractSet, Dict, List, Optional, Set, Tuple
+
+
+@dataclass(frozen=True)
+class CacheKeyRules:
+    ignored_params: AbstractSet[str] = frozenset()  # e.g. timestamps, nonces or tracking tokens
+    ignored_headers: AbstractSet[str] = frozenset()  # case-insensitive
+    included_headers: Optional[AbstractSet[str]] = None  # case-insensitive; if set, all other headers are ignored
+    sort_params: bool = True
+    casefold_params: bool = False  # applies to names and values
+
+    def normalize(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        normalized = request.copy()
+        normalized.url = self.__normalize_url(str(request.url))
+
+        ignored_headers = {h.lower() for h in self.ignored_headers}
+        included_headers = {h.lower() for h in self.included_headers} if self.included_headers is not None else None
+        normalized.headers = CaseInsensitiveDict({
+            k: v for k, v in request.headers.items()
+            if k.lower() not in ignored_headers and (included_headers is None or k.lower() in included_headers)
+        })
+        return normalized
+
+    def __normalize_url(self, url: str) -> str:
+        parts = urllib.parse.urlsplit(url)
+        query: List[Tuple[str, str]] = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if self.casefold_params:
+            query = [(k.casefold(), v.casefold()) for k, v in query]
+            ignored = {p.casefold() for p in self.ignored_params}
+        else:
+            ignored = set(self.ignored_params)
+        query = [(k, v) for k, v in query if k not in ignored]
+        if self.sort_params:
+            query.sort()
+        return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+@dataclass(frozen=True)
+class CacheKeyStats:
+    requests: int
+    distinct_raw_keys: int  # keys without normalization
+    distinct_keys: int
+    collapsed_keys: int  # raw keys that map to the same key as another raw key
+
+
+class CacheKeyStatsRecorder:
+    # note: stores all keys, intended for analyzing the effectiveness of rules
+    def __init__(self):
+        self._keys: Dict[str, Set[str]] = {}
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    def record(self, raw_key: str, key: str) -> None:
+        with self._lock:
+            self._requests += 1
+            self._keys.setdefault(key, set()).add(raw_key)
+
+    @property
+    def stats(self) -> CacheKeyStats:
+        with self._lock:
+            distinct_raw = sum(len(raw_keys) for raw_keys in self._keys.values())
+            return CacheKeyStats(
+                requests=self._requests,
+                distinct_raw_keys=distinct_raw,
+                distinct_keys=len(self._keys),
+                collapsed_keys=distinct_raw - len(self._keys)
+            )
@@ -0,0 +1,242 @@
+import os
+import heapq
+import sqlite3
+import logging
+import datetime
+import contextlib
+import collections
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Any, Collection, Dict, Iterator, List, Optional, Tuple
+
+from . import serializer
+from .access import ACCESS_TABLE
+
+
+# operates on sqlite cache databases directly (i.e. files created by the sqlite backend, or the individual
+#  shards of `ShardedDbCache`), responses are expected to be serialized using plain pickle or the compact format
+_RESPONSES_TABLE = 'responses'
+_REDIRECTS_TABLE = 'redirects'
+
+# upper bounds of age buckets, in seconds
+AGE_BUCKETS: List[Tuple[str, float]] = [
+    ('<1h', 3600),
+    ('<1d', 86400),
+    ('<7d', 7 * 86400),
+    ('<30d', 30 * 86400),
+    ('>=30d', float('inf'))
+]
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheGroupStats:
+    entries: int = 0
+    size: int = 0  # bytes
+
+
+@dataclass(frozen=True)
+class CacheEntryInfo:
+    key: str
+    url: str
+    status: int
+    size: int  # bytes
+    created_at: datetime.datetime  # utc
+
+
+@dataclass
+class CacheStats:
+    entries: int = 0
+    redirects: int = 0
+    invalid: int = 0  # entries that couldn't be deserialized
+    size: int = 0  # total size of serialized responses
+    file_size: int = 0
+    free_size: int = 0  # unused space in database file, can be reclaimed using `vacuum`
+    by_host: Dict[str, CacheGroupStats] = field(default_factory=lambda: collections.defaultdict(CacheGroupStats))
+    by_status: Dict[int, CacheGroupStats] = field(default_factory=lambda: collections.defaultdict(CacheGroupStats))
+    by_age: Dict[str, CacheGroupStats] = field(default_factory=lambda: {name: CacheGroupStats() for name, _ in AGE_BUCKETS})
+    largest: List[CacheEntryInfo] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class CacheKeyAccess:
+    key: str
+    url: Optional[str]  # `None` if the entry doesn't exist anymore
+    hits: int
+    last_access: datetime.datetime  # local time
+
+
+@contextlib.contextmanager
+def _connect(path: str) -> Iterator[sqlite3.Connection]:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'cache database not found: {path!r}')
+    # autocommit mode, transactions are managed explicitly
+    con = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        yield con
+    finally:
+        con.close()
+
+
+def _has_table(con: sqlite3.Connection, table: str) -> bool:
+    return con.execute("select 1 from sqlite_master where type = 'table' and name = ?", (table,)).fetchone() is not None
+
+
+# yields responses one by one, without loading the entire table into memory
+def _iter_responses(con: sqlite3.Connection) -> Iterator[Tuple[str, int, Any]]:
+    for key, value in con.execute(f'select key, value from `{_RESPONSES_TABLE}`'):
+        try:
+            response = serializer.loads(value)
+        except Exception as e:
+            _logger.debug(f'Skipping invalid cache entry {key}: {e}')
+            response = None
+        yield key, len(value), response
+
+
+def _get_age(response: Any, now: datetime.datetime) -> float:
+    return (now - response.created_at).total_seconds()
+
+
+def get_stats(path: str, *, top: int = 10) -> CacheStats:
+    stats = CacheStats()
+    now = datetime.datetime.utcnow()
+    largest: List[Tuple[int, str, Any]] = []  # heap
+
+    with _connect(path) as con:
+        page_size = con.execute('PRAGMA page_size').fetchone()[0]
+        stats.file_size = page_size * con.execute('PRAGMA page_count').fetchone()[0]
+        stats.free_size = page_size * con.execute('PRAGMA freelist_count').fetchone()[0]
+        if _has_table(con, _REDIRECTS_TABLE):
+            stats.redirects = con.execute(f'select count(key) from `{_REDIRECTS_TABLE}`').fetchone()[0]
+
+        for key, size, response in _iter_responses(con):
+            if response is None:
+                stats.invalid += 1
+                continue
+            stats.entries += 1
+            stats.size += size
+
+            groups = [
+                stats.by_host[urllib.parse.urlparse(response.url).netloc],
+                stats.by_status[response.status_code]
+            ]
+            age = _get_age(response, now)
+            groups.append(stats.by_age[next(name for name, limit in AGE_BUCKETS if age < limit)])
+            for group in groups:
+                group.entries += 1
+                group.size += size
+
+            if top > 0:
+                item = (size, key, response)
+                if len(largest) < top:
+                    heapq.heappush(largest, item)
+                elif size > largest[0][0]:
+                    heapq.heapreplace(largest, item)
+
+    stats.by_host = dict(stats.by_host)
+    stats.by_status = dict(stats.by_status)
+    stats.largest = [
+        CacheEntryInfo(key, response.url, response.status_code, size, response.created_at)
+        for size, key, response in sorted(largest, key=lambda item: item[0], reverse=True)
+    ]
+    return stats
+
+
+# deletes entries matching all given criteria, returns the number of deleted entries.
+#  entries are deleted in small transactions, allowing concurrent access to the cache in the meantime
+def prune(
+    path: str,
+    *,
+    older_than: Optional[float] = None,  # seconds
+    hosts: Optional[Collection[str]] = None,
+    statuses: Optional[Collection[int]] = None,
+    expired: bool = False,
+    invalid: bool = False,
+    dry_run: bool = False,
+    chunk_size: int = 500
+) -> int:
+    if older_than is None and not hosts and not statuses and not expired and not invalid:
+        raise ValueError('at least one criterion is required')
+    assert chunk_size > 0
+    now = datetime.datetime.utcnow()
+
+    def matches(response: Any) -> bool:
+        if response is None:
+            return invalid
+        if older_than is not None and _get_age(response, now) < older_than:
+            return False
+        if hosts and urllib.parse.urlparse(response.url).netloc not in hosts:
+            return False
+        if statuses and response.status_code not in statuses:
+            return False
+        if expired and not response.is_expired:
+            return False
+        return True
+
+    with _connect(path) as con:
+        keys = [key for key, _, response in _iter_responses(con) if matches(response)]
+        if dry_run or not keys:
+            return len(keys)
+
+        has_redirects = _has_table(con, _REDIRECTS_TABLE)
+        has_access = _has_table(con, ACCESS_TABLE)
+        for i in range(0, len(keys), chunk_size):
+            chunk = [(key,) for key in keys[i:i + chunk_size]]
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                con.executemany(f'delete from `{_RESPONSES_TABLE}` where key = ?', chunk)
+                if has_redirects:
+                    con.executemany(f'delete from `{_REDIRECTS_TABLE}` where value = ?', chunk)
+                if has_access:
+                    con.executemany(f'delete from `{ACCESS_TABLE}` where key = ?', chunk)
+                con.execute('COMMIT')
+            except BaseException:
+                con.execute('ROLLBACK')
+                raise
+
+    _logger.info(f'Deleted {len(keys)} entries from {path!r}')
+    return len(keys)
+
+
+# reclaims unused space, returns the number of freed bytes.
+#  unless `full` is set, space is freed incrementally in chunks of `chunk_pages` pages, which only locks
+#  the database briefly for each chunk; this requires a one-time full vacuum if the database wasn't
+#  created with `auto_vacuum=INCREMENTAL`
+def vacuum(path: str, *, full: bool = False, chunk_pages: int = 1000) -> int:
+    assert chunk_pages > 0
+    size_before = os.path.getsize(path)
+    with _connect(path) as con:
+        if full:
+            con.execute('VACUUM')
+        else:
+            if con.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                _logger.info(f'Enabling incremental vacuum for {path!r}, this requires a full vacuum once')
+                con.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                con.execute('VACUUM')
+            while con.execute('PRAGMA freelist_count').fetchone()[0] > 0:
+                con.execute(f'PRAGMA incremental_vacuum({chunk_pages})').fetchall()
+    freed = size_before - os.path.getsize(path)
+    _logger.info(f'Freed {freed} bytes in {path!r}')
+    return freed
+
+
+# requires access tracking (see `SourceConfig.cache_access_tracking`)
+def get_hot_keys(path: str, *, top: int = 20) -> List[CacheKeyAccess]:
+    with _connect(path) as con:
+        if not _has_table(con, ACCESS_TABLE):
+            return []
+        rows = con.execute(
+            f'select a.key, a.hits, a.last_access, r.value from `{ACCESS_TABLE}` a '
+            f'left join `{_RESPONSES_TABLE}` r on r.key = a.key order by a.hits desc limit ?',
+            (top,)
+        ).fetchall()
+
+    result = []
+    for key, hits, last_access, value in rows:
+        url = None
+        if value is not None:
+            with contextlib.suppress(Exception):
+                url = serializer.loads(value).url
+        result.append(CacheKeyAccess(key, url, hits, datetime.datetime.fromtimestamp(last_access)))
+    return result
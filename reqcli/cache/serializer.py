@@ -0,0 +1,203 @@
+import io
+import pickle
+import struct
+import datetime
+import requests
+import requests.cookies
+from requests.structures import CaseInsensitiveDict
+from requests_cache import CachedResponse
+from requests_cache.backends import BaseCache
+from requests_cache.backends.base import BaseStorage
+from typing import Any, Iterator, Optional
+
+
+# compact binary format for cached responses, which only stores what's needed for serving cache hits
+#  (status, headers, URL and body). other values (e.g. redirect keys) and entries written by other
+#  serializers are (de)serialized using pickle, so existing caches stay readable
+#
+# layout: header (see `_HEADER`), followed by url, reason, encoding, headers, request method, request url
+#  and body; all strings are utf-8 encoded, headers are separated by '\r\n'
+_MAGIC = b'RQC\x01'
+_HEADER = struct.Struct('<4sHqqq7I')
+_NONE = -2 ** 63
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+# not applicable to stored responses; bodies are stored decoded, so `Content-Length` is replaced as well
+_EXCLUDED_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer', 'trailers',
+    'transfer-encoding', 'upgrade', 'content-encoding', 'content-length'
+})
+
+
+# minimal stand-in for `urllib3.HTTPResponse`, which is all `ResponseReader` needs for streaming the body
+class _CachedBody(io.BytesIO):
+    def read(self, amt: Optional[int] = None, decode_content: Optional[bool] = None, **kwargs: Any) -> bytes:  # type: ignore[override]
+        return super().read(-1 if amt is None else amt)
+
+    def isclosed(self) -> bool:
+        return self.closed
+
+    def release_conn(self) -> None:
+        pass
+
+    def stream(self, amt: int = 2 ** 16, decode_content: Optional[bool] = None) -> Iterator[bytes]:
+        while True:
+            data = self.read(amt)
+            if not data:
+                return
+            yield data
+
+
+# created by `loads` without calling `__init__` (which copies an existing response); rarely used attributes
+#  (the original request and cookies) are only created when accessed
+class CompactCachedResponse(CachedResponse):
+    _raw_body: Optional[_CachedBody]
+    _request_method: str
+    _request_url: str
+
+    def __getstate__(self) -> Any:
+        state = dict(self.__dict__)
+        state.pop('_raw_body', None)
+        return state
+
+    @property
+    def raw(self) -> _CachedBody:  # type: ignore[override]
+        raw = self.__dict__.get('_raw_body')
+        if raw is None:
+            raw = self._raw_body = _CachedBody(self._content)
+        return raw
+
+    @raw.setter
+    def raw(self, value: Any) -> None:
+        pass
+
+    def reset(self) -> None:
+        self._raw_body = None
+
+    @property
+    def request(self) -> requests.PreparedRequest:  # type: ignore[override]
+        request = self.__dict__.get('_request')
+        if request is None:
+            request = self._request = requests.PreparedRequest()
+            request.method = self._request_method
+            request.url = self._request_url
+            request.headers = CaseInsensitiveDict()
+            request.hooks = []  # type: ignore[assignment]  # same as `CachedResponse`
+        return request
+
+    @request.setter
+    def request(self, value: requests.PreparedRequest) -> None:
+        self._request = value
+
+    @property
+    def cookies(self) -> requests.cookies.RequestsCookieJar:  # type: ignore[override]
+        cookies = self.__dict__.get('_cookies')
+        if cookies is None:
+            cookies = self._cookies = requests.cookies.RequestsCookieJar()
+        return cookies
+
+    @cookies.setter
+    def cookies(self, value: requests.cookies.RequestsCookieJar) -> None:
+        self._cookies = value
+
+
+def _encode(value: Optional[str]) -> bytes:
+    return value.encode('utf-8', 'surrogatepass') if value else b''
+
+
+def _to_micros(value: Optional[datetime.datetime]) -> int:
+    return (value - _EPOCH) // _MICROSECOND if value is not None else _NONE
+
+
+def _from_micros(value: int) -> Optional[datetime.datetime]:
+    return _EPOCH + datetime.timedelta(microseconds=value) if value != _NONE else None
+
+
+def dumps(obj: Any) -> bytes:
+    if not isinstance(obj, requests.Response):
+        return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    body = obj.content or b''
+    headers = [f'{name}: {value}' for name, value in obj.headers.items() if name.lower() not in _EXCLUDED_HEADERS]
+    headers.append(f'Content-Length: {len(body)}')
+    request = obj.request
+    fields = (
+        _encode(obj.url),
+        _encode(obj.reason),
+        _encode(obj.encoding),
+        _encode('\r\n'.join(headers)),
+        _encode(request.method if request is not None else None),
+        _encode(request.url if request is not None else None),
+        body
+    )
+    elapsed = obj.elapsed // _MICROSECOND if obj.elapsed is not None else 0
+    header = _HEADER.pack(
+        _MAGIC,
+        obj.status_code,
+        _to_micros(getattr(obj, 'created_at', None) or datetime.datetime.utcnow()),
+        _to_micros(getattr(obj, 'expires', None)),
+        elapsed,
+        *(len(field) for field in fields)
+    )
+    return b''.join((header, *fields))
+
+
+def loads(data: bytes) -> Any:
+    if data[:4] != _MAGIC:
+        return pickle.loads(data)
+
+    _, status, created_at, expires, elapsed, *lengths = _HEADER.unpack_from(data)
+    fields = []
+    pos = _HEADER.size
+    for length in lengths:
+        fields.append(data[pos:pos + length])
+        pos += length
+    if pos != len(data):
+        raise ValueError(f'invalid cache entry, expected {pos} bytes, got {len(data)} bytes')
+    url, reason, encoding, header_data, request_method, request_url, body = fields
+
+    headers: CaseInsensitiveDict = CaseInsensitiveDict()
+    if header_data:
+        for line in header_data.decode('utf-8', 'surrogatepass').split('\r\n'):
+            name, _, value = line.partition(': ')
+            headers[name] = value
+
+    res = CompactCachedResponse.__new__(CompactCachedResponse)
+    res.__dict__.update(
+        _content=body,
+        _content_consumed=True,
+        _next=None,
+        _raw_body=None,
+        status_code=status,
+        headers=headers,
+        url=url.decode('utf-8', 'surrogatepass'),
+        reason=reason.decode('utf-8', 'surrogatepass'),
+        encoding=encoding.decode('utf-8', 'surrogatepass') or None,
+        history=[],
+        elapsed=datetime.timedelta(microseconds=elapsed),
+        connection=None,
+        created_at=_from_micros(created_at),
+        expires=_from_micros(expires),
+        from_cache=True,
+        _request_method=request_method.decode('utf-8', 'surrogatepass'),
+        _request_url=request_url.decode('utf-8', 'surrogatepass')
+    )
+    return res
+
+
+# same interface as the `pickle` module, which is the default serializer of requests-cache
+class _Serializer:
+    dumps = staticmethod(dumps)
+    loads = staticmethod(loads)
+
+
+# switches serialization of cached responses to the compact format (see above), returns false if
+#  the cache doesn't serialize responses (e.g. the memory backend)
+def install(cache: BaseCache) -> bool:
+    if not isinstance(cache.responses, BaseStorage):
+        return False
+    # same attribute that's set from the `serializer` argument, which can't be passed through `CachedSession`
+    cache.responses._serializer = _Serializer
+    return True
@@ -0,0 +1,214 @@
+import os
+import zlib
+import atexit
+import sqlite3
+import logging
+import weakref
+import threading
+from requests_cache.backends import BaseCache
+from requests_cache.backends.base import BaseStorage
+from typing import Any, Dict, Iterator, List, Optional
+
+
+_logger = logging.getLogger(__name__)
+
+# marks pending deletions
+_DELETED = object()
+
+
+class ShardedDbDict(BaseStorage):
+    # keys are distributed across multiple sqlite files (in WAL mode, so readers never block), each thread
+    #  uses its own connections. writes are buffered and committed in batches by a background thread,
+    #  similar to `fast_save` this trades durability for throughput
+    def __init__(
+        self,
+        db_path: str,
+        table_name: str,
+        *,
+        shards: int = 8,
+        flush_interval: float = 0.5,  # seconds
+        batch_size: int = 1000,  # pending writes that trigger an immediate flush
+        timeout: float = 30.0,
+        pickle_values: bool = False,
+        **kwargs: Any
+    ):
+        kwargs.pop('fast_save', None)
+        kwargs.setdefault('suppress_warnings', True)
+        super().__init__(**kwargs)
+        assert shards > 0 and flush_interval > 0 and batch_size > 0
+        self.table_name = table_name
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pickle_values = pickle_values
+
+        root, ext = os.path.splitext(os.path.abspath(os.path.expanduser(db_path)))
+        os.makedirs(os.path.dirname(root), exist_ok=True)
+        self.shard_paths = [f'{root}.shard{i}{ext or ".sqlite"}' for i in range(shards)]
+
+        self._local = threading.local()
+        self._pending: List[Dict[str, Any]] = [{} for _ in range(shards)]
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        for con in self._connections():
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute(f'create table if not exists `{self.table_name}` (key PRIMARY KEY, value)')
+
+        # the thread only keeps a weak reference, allowing the storage to be garbage collected
+        ref = weakref.ref(self)
+        self._thread = threading.Thread(target=ShardedDbDict.__flush_loop, args=(ref, self._wakeup, flush_interval), name=f'ShardedDbDict-{table_name}', daemon=True)
+        self._thread.start()
+        atexit.register(ShardedDbDict.__flush_ref, ref)
+
+    def _connections(self) -> List[sqlite3.Connection]:
+        cons: Optional[List[sqlite3.Connection]] = getattr(self._local, 'connections', None)
+        if cons is None:
+            cons = []
+            for path in self.shard_paths:
+                con = sqlite3.connect(path, timeout=self.timeout, isolation_level=None)
+                con.execute('PRAGMA synchronous=NORMAL')
+                cons.append(con)
+            self._local.connections = cons
+        return cons
+
+    def _shard(self, key: str) -> int:
+        # stable across processes, unlike `hash()`
+        return zlib.crc32(str(key).encode()) % len(self.shard_paths)
+
+    def __getitem__(self, key: str) -> Any:
+        shard = self._shard(key)
+        with self._lock:
+            value = self._pending[shard].get(key)
+        if value is None:
+            row = self._connections()[shard].execute(f'select value from `{self.table_name}` where key=?', (key,)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            value = row[0]
+        elif value is _DELETED:
+            raise KeyError(key)
+        return self.deserialize(value) if self.pickle_values else value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        # serialize in the calling thread, the background thread only writes
+        stored = sqlite3.Binary(self.serialize(value)) if self.pickle_values else value
+        self.__add_pending(key, stored)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self.__add_pending(key, _DELETED)
+
+    def __contains__(self, key: object) -> bool:
+        shard = self._shard(str(key))
+        with self._lock:
+            value = self._pending[shard].get(key)  # type: ignore
+        if value is not None:
+            return value is not _DELETED
+        return self._connections()[shard].execute(f'select 1 from `{self.table_name}` where key=?', (key,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        self.flush()
+        for con in self._connections():
+            for row in con.execute(f'select key from `{self.table_name}`').fetchall():
+                yield row[0]
+
+    def __len__(self) -> int:
+        self.flush()
+        return sum(con.execute(f'select count(key) from `{self.table_name}`').fetchone()[0] for con in self._connections())
+
+    def clear(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                for pending in self._pending:
+                    pending.clear()
+                self._pending_count = 0
+            for con in self._connections():
+                con.execute(f'delete from `{self.table_name}`')
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batches = [dict(pending) for pending in self._pending]
+            if not any(batches):
+                return
+
+            for con, batch in zip(self._connections(), batches):
+                if not batch:
+                    continue
+                con.execute('BEGIN IMMEDIATE')
+                try:
+                    con.executemany(
+                        f'insert or replace into `{self.table_name}` (key, value) values (?, ?)',
+                        [(k, v) for k, v in batch.items() if v is not _DELETED]
+                    )
+                    con.executemany(
+                        f'delete from `{self.table_name}` where key=?',
+                        [(k,) for k, v in batch.items() if v is _DELETED]
+                    )
+                    con.execute('COMMIT')
+                except BaseException:
+                    con.execute('ROLLBACK')
+                    raise
+
+            # remove written entries, unless they were modified again in the meantime
+            with self._lock:
+                for pending, batch in zip(self._pending, batches):
+                    for k, v in batch.items():
+                        if pending.get(k) is v:
+                            del pending[k]
+                self._pending_count = sum(len(pending) for pending in self._pending)
+
+    def close(self) -> None:
+        self.flush()
+        self._closed = True
+        self._wakeup.set()
+
+    def __add_pending(self, key: str, value: Any) -> None:
+        with self._lock:
+            pending = self._pending[self._shard(key)]
+            if key not in pending:
+                self._pending_count += 1
+            pending[key] = value
+            full = self._pending_count >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    @staticmethod
+    def __flush_ref(ref: 'weakref.ReferenceType[ShardedDbDict]') -> None:
+        storage = ref()
+        if storage is not None and not storage._closed:
+            storage.flush()
+
+    @staticmethod
+    def __flush_loop(ref: 'weakref.ReferenceType[ShardedDbDict]', wakeup: threading.Event, interval: float) -> None:
+        while True:
+            wakeup.wait(interval)
+            wakeup.clear()
+            storage = ref()
+            if storage is None or storage._closed:
+                return
+            try:
+                storage.flush()
+            except Exception:
+                _logger.exception('Failed to write cache entries')
+            del storage
+
+
+class ShardedDbCache(BaseCache):
+    def __init__(self, db_path: str = 'http_cache', **kwargs: Any):
+        super().__init__(**kwargs)
+        storage_kwargs = {k: v for k, v in kwargs.items() if k not in ('include_get_headers', 'ignored_parameters')}
+        self.responses = ShardedDbDict(db_path, 'responses', pickle_values=True, **storage_kwargs)
+        self.redirects = ShardedDbDict(db_path, 'redirects', **storage_kwargs)
+
+    def flush(self) -> None:
+        self.responses.flush()
+        self.redirects.flush()
+
+    def close(self) -> None:
+        self.responses.close()
+        self.redirects.close()
@@ -0,0 +1,109 @@
+import os
+import pickle
+import sqlite3
+import logging
+import tempfile
+from requests_cache.backends import BaseCache
+from requests_cache.backends.sqlite import DbDict, DbPickleDict
+from typing import Any, Iterator, List, MutableMapping, Tuple
+
+
+# snapshots are sqlite databases with the same layout as the sqlite cache backend, but always use plain
+#  pickle as serializer (regardless of the serializer used by the cache) to keep them portable
+_TABLES = ('responses', 'redirects')
+
+_logger = logging.getLogger(__name__)
+
+
+def _iter_items(storage: MutableMapping[str, Any]) -> Iterator[Tuple[str, Any]]:
+    if isinstance(storage, DbDict):
+        # read all rows using a single query instead of one query (and connection) per key
+        with storage.connection() as con:
+            rows = con.execute(f'select key, value from `{storage.table_name}`').fetchall()
+        deserialize = storage.deserialize if isinstance(storage, DbPickleDict) else None
+        for key, value in rows:
+            try:
+                yield key, deserialize(value) if deserialize else value
+            except Exception as e:
+                _logger.debug(f'Skipping invalid cache entry {key}: {e}')
+    else:
+        for key in list(storage):
+            try:
+                yield key, storage[key]
+            except Exception as e:
+                _logger.debug(f'Skipping invalid cache entry {key}: {e}')
+
+
+# inserts all items in a single transaction
+def _bulk_insert(storage: MutableMapping[str, Any], items: List[Tuple[str, Any]]) -> None:
+    if isinstance(storage, DbDict):
+        # not using `DbDict.bulk_commit`, which fails with `fast_save` enabled
+        serialize = storage.serialize if isinstance(storage, DbPickleDict) else None
+        rows = [(key, sqlite3.Binary(serialize(value)) if serialize else value) for key, value in items]
+        with storage.connection(commit_on_success=True) as con:
+            con.executemany(f'insert or replace into `{storage.table_name}` (key, value) values (?, ?)', rows)
+    else:
+        for key, value in items:
+            storage[key] = value
+
+
+# returns the number of exported responses
+def export_snapshot(cache: BaseCache, path: str, *, include_expired: bool = False) -> int:
+    count = 0
+    # write to temporary file first to avoid leaving behind partial snapshots
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.snapshot-')
+    os.close(fd)
+    try:
+        con = sqlite3.connect(temp_path)
+        try:
+            with con:
+                for table in _TABLES:
+                    con.execute(f'create table `{table}` (key PRIMARY KEY, value)')
+
+                responses = []
+                for key, response in _iter_items(cache.responses):
+                    if not include_expired and response.is_expired:
+                        continue
+                    responses.append((key, pickle.dumps(response, pickle.HIGHEST_PROTOCOL)))
+                con.executemany('insert into `responses` (key, value) values (?, ?)', responses)
+                count = len(responses)
+
+                # redirect values are plain keys, but are pickled as well for consistency
+                redirects = [(key, pickle.dumps(value)) for key, value in _iter_items(cache.redirects)]
+                con.executemany('insert into `redirects` (key, value) values (?, ?)', redirects)
+        finally:
+            con.close()
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    _logger.info(f'Exported {count} responses to {path!r}')
+    return count
+
+
+# returns the number of imported responses
+def import_snapshot(cache: BaseCache, path: str, *, overwrite: bool = False, include_expired: bool = False) -> int:
+    con = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        tables = {}
+        for table in _TABLES:
+            tables[table] = con.execute(f'select key, value from `{table}`').fetchall()
+    finally:
+        con.close()
+
+    existing = set() if overwrite else set(cache.responses)
+    responses = []
+    for key, value in tables['responses']:
+        if key in existing:
+            continue
+        response = pickle.loads(value)
+        if not include_expired and response.is_expired:
+            continue
+        responses.append((key, response))
+    _bulk_insert(cache.responses, responses)
+    _bulk_insert(cache.redirects, [(key, pickle.loads(value)) for key, value in tables['redirects']])
+    count = len(responses)
+
+    _logger.info(f'Imported {count} responses from {path!r}')
+    return count
@@ -27,3 +27,22 @@ class ReaderError(Exception):
 
 class TypeAlreadyLoadedError(Exception):
     pass
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ResponseTooLargeError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    host: str
+
+    def __init__(self, message: str, host: str):
+        super().__init__(message)
+        self.host = host
+
+    def __reduce__(self):  # pragma: no cover
+        return (type(self), (*self.args, self.host))
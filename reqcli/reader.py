@@ -1,10 +1,18 @@
 import io
 import os
+import mmap
+import time
+import logging
+import tempfile
 import requests
 import functools
-from typing import Optional, BinaryIO, TYPE_CHECKING
+from typing import List, Optional, BinaryIO, Union, TYPE_CHECKING, cast
 
-from .errors import ReaderError
+from .errors import ReaderError, ResponseTooLargeError
+from .utils import decoding
+
+
+_logger = logging.getLogger(__name__)
 
 
 class Reader(io.BufferedReader):
@@ -35,13 +43,22 @@ class IOReader(Reader):
 
 
 class ResponseReader(Reader):
-    def __init__(self, response: requests.Response):
+    # amount of compressed data read at once
+    decode_chunk_size = 16 * 1024
+
+    def __init__(self, response: requests.Response, *, buffer_size: int = 64 * 1024, max_size: Optional[int] = None):
         if response.raw.isclosed():
             raise ReaderError('response stream is already closed; ResponseReader requires `stream=True`')
+        assert buffer_size > 0
+
+        content_length = int(response.headers['content-length']) if 'content-length' in response.headers else None
+        encoding = response.headers.get('content-encoding')
+        # cached responses are already decoded
+        from_cache = getattr(response, 'from_cache', False)
 
         size: Optional[int]
-        if 'content-length' in response.headers and 'content-encoding' not in response.headers:
-            size = int(response.headers['content-length'])
+        if encoding is None or from_cache:
+            size = content_length
         else:
             size = None
 
@@ -50,16 +67,252 @@ class ResponseReader(Reader):
             size
         )
 
+        # size of the (possibly encoded) response body, if known
+        self.wire_size = content_length if not from_cache else size
+        self.buffer_size = buffer_size
+        # max. number of (decoded) bytes
+        self.max_size = max_size
+        if max_size is not None and size is not None and size > max_size:
+            raise ResponseTooLargeError(f'response size of {size} bytes exceeds limit of {max_size} bytes')
+
+        self.__raw = response.raw
+        self.__decoder: Optional[decoding.Decoder] = None
+        if encoding is not None and not from_cache:
+            try:
+                self.__decoder = decoding.get_decoder(encoding)
+            except ValueError as e:
+                # let urllib3 handle it (which will most likely return the data as-is)
+                _logger.warning(f'Not decoding response: {e}')
         self.__read = functools.partial(response.raw.read, decode_content=True)
 
+        # read-ahead buffer, data before `__pos` was already consumed
+        self.__buffer = bytearray()
+        self.__pos = 0
+        self.__eof = False
+        self.__received = 0
+
         assert response.raw.tell() == 0
         self._read_bytes = 0
+        self._wire_bytes = 0
+        self._read_time = 0.0
 
     def tell(self) -> int:
         # note: no need to consider calls to seek(), since responses are not seekable
         return self._read_bytes
 
+    # number of (possibly encoded) bytes received so far, including buffered data
+    @property
+    def wire_bytes(self) -> int:
+        return self._wire_bytes
+
+    # seconds spent receiving (and decoding) data, i.e. excluding time spent processing it
+    @property
+    def read_time(self) -> float:
+        return self._read_time
+
+    # only supports seeking forward (by discarding data), which allows skipping over unneeded parts of the body
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._read_bytes
+        elif whence != os.SEEK_SET:
+            raise io.UnsupportedOperation('response streams only support SEEK_SET and SEEK_CUR')
+        if offset < self._read_bytes:
+            raise io.UnsupportedOperation('cannot seek backwards in response stream')
+
+        remaining = offset - self._read_bytes
+        while remaining > 0:
+            data = self.read(min(remaining, 64 * 1024))
+            if not data:
+                break
+            remaining -= len(data)
+        return self._read_bytes
+
+    # unlike urllib3, this returns exactly `n` bytes unless the end of the stream was reached
     def read(self, n: Optional[int] = None) -> bytes:
-        data = self.__read(n)
+        if n is None or n < 0:
+            while self.__fill():
+                pass
+            return self.__consume(len(self.__buffer) - self.__pos)
+
+        available = len(self.__buffer) - self.__pos
+        if n > available and n - available >= self.buffer_size and self.__decoder is None:
+            # large reads bypass the buffer
+            parts = [self.__consume(available)]
+            remaining = n - available
+            while remaining > 0 and not self.__eof:
+                chunk = self.__read_chunk(remaining)
+                parts.append(chunk)
+                remaining -= len(chunk)
+            data = b''.join(parts)
+            self._read_bytes += len(data) - available
+            return data
+
+        while len(self.__buffer) - self.__pos < n and self.__fill():
+            pass
+        return self.__consume(n)
+
+    # returns buffered data without consuming it, reads more data only if the buffer is empty
+    def peek(self, n: int = 0) -> bytes:
+        if self.__pos == len(self.__buffer):
+            self.__fill()
+        return bytes(self.__buffer[self.__pos:])
+
+    # returns at most `n` bytes, with at most one read from the underlying stream
+    def read1(self, n: int = -1) -> bytes:
+        if self.__pos == len(self.__buffer):
+            self.__fill()
+        available = len(self.__buffer) - self.__pos
+        return self.__consume(available if n < 0 else min(n, available))
+
+    def readline(self, limit: Optional[int] = -1) -> bytes:
+        if limit is None:
+            limit = -1
+        # relative to `__pos`, since filling the buffer may move data
+        scanned = 0
+        while True:
+            index = self.__buffer.find(b'\n', self.__pos + scanned)
+            if index >= 0:
+                length = index + 1 - self.__pos
+                break
+            scanned = len(self.__buffer) - self.__pos
+            if 0 <= limit <= scanned or not self.__fill():
+                length = scanned
+                break
+        if limit >= 0:
+            length = min(length, limit)
+        return self.__consume(length)
+
+    # `io.BufferedReader` implementations would use its own (uninitialized) buffer
+    def readlines(self, hint: Optional[int] = -1) -> List[bytes]:
+        lines = []
+        total = 0
+        for line in self:
+            lines.append(line)
+            total += len(line)
+            if hint is not None and 0 < hint <= total:
+                break
+        return lines
+
+    def __iter__(self) -> 'ResponseReader':
+        return self
+
+    def __next__(self) -> bytes:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def __consume(self, n: int) -> bytes:
+        data = bytes(self.__buffer[self.__pos:self.__pos + n])
+        self.__pos += len(data)
         self._read_bytes += len(data)
+        if self.__pos == len(self.__buffer):
+            self.__buffer.clear()
+            self.__pos = 0
+        return data
+
+    # reads the next chunk into the buffer, returns false at the end of the stream
+    def __fill(self) -> bool:
+        if self.__eof:
+            return False
+        # drop consumed data before growing the buffer
+        if self.__pos > 0:
+            del self.__buffer[:self.__pos]
+            self.__pos = 0
+        chunk = self.__read_chunk(self.buffer_size)
+        self.__buffer += chunk
+        return bool(chunk)
+
+    # returns up to `n` bytes (but not necessarily that many), an empty result means the end of the stream was reached
+    def __read_chunk(self, n: int) -> bytes:
+        start = time.perf_counter()
+        data = self.__read_chunk_internal(n)
+        self._read_time += time.perf_counter() - start
+        self.__received += len(data)
+        if self.max_size is not None and self.__received > self.max_size:
+            raise ResponseTooLargeError(f'response exceeds size limit of {self.max_size} bytes')
         return data
+
+    def __read_chunk_internal(self, n: int) -> bytes:
+        if self.__decoder is None:
+            data = self.__read(n)
+            self._wire_bytes += len(data)
+            if not data:
+                self.__eof = True
+            return data
+
+        # one more byte than allowed is enough to detect exceeding the size limit, without decoding the rest
+        limit = n if self.max_size is None else max(min(n, self.max_size - self.__received + 1), 1)
+        while True:
+            try:
+                # decoded data is limited as well, since compressed chunks can expand to many times their size;
+                #  remaining output of previously read data is returned first
+                data = self.__decoder.decompress(b'', limit)
+                if not data:
+                    chunk = self.__raw.read(self.decode_chunk_size, decode_content=False)
+                    self._wire_bytes += len(chunk)
+                    if chunk:
+                        data = self.__decoder.decompress(chunk, limit)
+                    else:
+                        data = self.__decoder.flush()
+                        self.__eof = True
+            except Exception as e:
+                raise ReaderError(f'failed to decode response: {e}') from e
+            if data or self.__eof:
+                return data
+
+    def readinto(self, b: Union[bytearray, memoryview]) -> int:  # type: ignore[override]
+        data = self.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def readinto1(self, b: Union[bytearray, memoryview]) -> int:  # type: ignore[override]
+        data = self.read1(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+
+# reads the entire body of the given reader, keeping it in memory up to `spill_threshold` bytes
+#  and writing it to a temporary file otherwise, which is then also exposed through `getbuffer()`
+class SpooledReader(IOReader):
+    def __init__(self, source: Reader, spill_threshold: int, *, chunk_size: int = 1024 * 1024):
+        file: BinaryIO = io.BytesIO()
+        self.spilled = False
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            if not self.spilled and file.tell() + len(data) > spill_threshold:
+                # copy data to temporary file
+                disk_file = cast(BinaryIO, tempfile.TemporaryFile(prefix='reqcli-'))
+                disk_file.write(cast(io.BytesIO, file).getbuffer())
+                file = disk_file
+                self.spilled = True
+            file.write(data)
+        file.seek(0)
+
+        self.__file = file
+        self.__mmap: Optional[mmap.mmap] = None
+        super().__init__(file)
+
+    def readinto(self, b: Union[bytearray, memoryview]) -> int:  # type: ignore[override]
+        return self.__file.readinto(b)  # type: ignore
+
+    # returns a view of the body without copying it (using `mmap` if the body was spilled to disk);
+    #  the view must be released before closing the reader
+    def getbuffer(self) -> memoryview:
+        if not self.spilled:
+            return cast(io.BytesIO, self.__file).getbuffer()
+        if self.__mmap is None:
+            if self.size == 0:  # pragma: no cover  # can't mmap empty files, but empty bodies don't spill
+                return memoryview(b'')
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self.__mmap)
+
+    def close(self) -> None:
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+        self.__file.close()
@@ -1,5 +1,7 @@
-from .basesource import BaseSource
+from .basesource import BaseSource, CacheWarmResult, ConnectionReleaseStats
+from .breaker import CircuitBreakerStats, CircuitState
 from .config import SourceConfig
 from .reqdata import CertType, ReqData
+from .scheduler import RequestScheduler, SchedulerStats
 from .status import StatusCheckMode
 from .unloadable import UnloadableType
@@ -1,26 +1,51 @@
+import os
+import ssl
+import time
+import copy
+import uuid
+import weakref
 import urllib3
+import hashlib
 import logging
+import tempfile
+import threading
+import datetime
+import dataclasses
 import requests
 import requests.hooks
 import contextlib
+import collections
+import urllib.parse
 import requests_cache.backends
 from requests.adapters import HTTPAdapter
-from typing import Any, Callable, Iterator, TypeVar, Union, Optional, overload
+from requests.structures import CaseInsensitiveDict
+from requests_cache.backends.sqlite import DbDict
+from requests_cache.cache_keys import normalize_dict
+from concurrent.futures import Future
+from typing import Any, Callable, ContextManager, Deque, Dict, Iterable, Iterator, Set, Tuple, Type, TypeVar, Union, Optional, cast, overload
 from typing_extensions import Literal
 
 from .config import SourceConfig
 from .reqdata import ReqData
+from .retry import RETRY_EXCEPTIONS, RetryHandler
+from .breaker import CircuitBreakerHandler, CircuitBreakerStats, get_outcome, is_failure
 from .unloadable import UnloadableType
-from .ratelimit import RateLimitedSession, CachedRateLimitedSession
+from .ratelimit import RateLimitedSession, RateLimitingMixin, CachedRateLimitedSession
+from .scheduler import RequestScheduler, RetryLater
 
 from .. import reader
 from ..config import Configuration
-from ..type import BaseTypeLoadable
-from ..errors import ResponseStatusError
+from ..cache import CacheAccessTracker, CacheKeyRules, CacheKeyStats, CacheKeyStatsRecorder, export_snapshot, import_snapshot, serializer
+from ..type import BaseTypeLoadable, offload
+from ..errors import CircuitOpenError, DownloadError, ResponseStatusError, ResponseTooLargeError
+from .. import tracing
+from ..utils import decoding, dns, pools, tls
 from ..utils.fingerprint_adapter import FingerprintAdapter
 
 
 _TBaseTypeLoadable = TypeVar('_TBaseTypeLoadable', bound=BaseTypeLoadable)
+_TItem = TypeVar('_TItem')
+_TSource = TypeVar('_TSource', bound='BaseSource')
 
 RequestHook = Union[bool, Callable[[requests.PreparedRequest], bool]]
 ResponseHook = Union[bool, Callable[[requests.Response], bool]]
@@ -29,11 +54,65 @@ _cache_disabled_hook = 'get_cache_disabled'
 _cache_read_disabled_hook = 'get_read_cache_disabled'
 _cache_write_disabled_hook = 'get_write_cache_disabled'
 
+_download_chunk_size = 1024 * 1024
+_drain_chunk_size = 16 * 1024
+
 _logger = logging.getLogger(__name__)
 
 
+@dataclasses.dataclass(frozen=True)
+class CacheWarmResult:
+    requested: int  # distinct requests
+    skipped: int  # already cached and not expired
+    fetched: int
+    failed: int
+
+
+@dataclasses.dataclass(frozen=True)
+class ConnectionReleaseStats:
+    reused: int  # error responses that were drained, returning the connection to the pool
+    discarded: int  # connections closed instead, since draining would've been too expensive
+    drained_bytes: int
+
+
+# `os.umask` can only be read by setting it, so serialize that between threads
+_umask_lock = threading.Lock()
+
+
+def _get_umask() -> int:
+    with _umask_lock:
+        mask = os.umask(0o22)
+        os.umask(mask)
+    return mask
+
+
+def _restore_source(cls: Type['BaseSource'], spec_id: str, init_kwargs: Dict[str, Any], state: Dict[str, Any], origin_pid: Optional[int] = None) -> 'BaseSource':
+    return BaseSource._restore(cls, spec_id, init_kwargs, state, origin_pid)
+
+
 class BaseSource:
-    def __init__(self, base_reqdata: ReqData, config: Optional[SourceConfig], *, verify_tls: bool = True, require_fingerprint: Optional[str] = None):
+    # sources that were created or unpickled in this process, keyed by spec id and pid (see `__reduce__`);
+    #  sources restored in other processes than the one they were created in are kept alive, to be reused
+    #  by subsequent tasks in worker processes
+    __registry: 'weakref.WeakValueDictionary[Tuple[str, int], BaseSource]' = weakref.WeakValueDictionary()
+    __restored: Dict[Tuple[str, int], 'BaseSource'] = {}
+    __registry_lock = threading.Lock()
+
+    def __init__(
+        self,
+        base_reqdata: ReqData,
+        config: Optional[SourceConfig],
+        *,
+        verify_tls: bool = True,
+        require_fingerprint: Optional[str] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        # set when restoring, see `_restore`
+        spec_id = self.__dict__.pop('_BaseSource__spec_id', None)
+        origin_pid = self.__dict__.pop('_BaseSource__origin_pid', None)
+        # attributes set by subclasses are pickled as-is, see `__reduce__`
+        attrs_before = set(self.__dict__)
+
         # use supplied config or default
         if config is None:
             self._config = SourceConfig()
@@ -51,6 +130,11 @@ class BaseSource:
         )
         self._base_reqdata += base_reqdata
 
+        # created on first use if not provided, and shut down by `close` in that case
+        self._scheduler = scheduler
+        self.__owns_scheduler = False
+        self.__scheduler_lock = threading.Lock()
+
         # always register hooks, even if they might not be used
         for name in (_cache_disabled_hook, _cache_read_disabled_hook, _cache_write_disabled_hook):
             if name not in requests.hooks.HOOKS:
@@ -81,22 +165,36 @@ class BaseSource:
                 fast_save=True,
                 requests_per_second=self._config.requests_per_second
             )
-            CachePatcher.patch(self._session.cache)
+            if self._config.cache_compact_entries and not serializer.install(self._session.cache):
+                _logger.debug(f'{type(self._session.cache).__name__} does not serialize responses, not using compact cache entries')
+            self._cache_key_stats = CacheKeyStatsRecorder() if self._config.cache_key_stats else None
+            self._cache_access_tracker = self.__create_access_tracker(self._session.cache) if self._config.cache_access_tracking else None
+            CachePatcher.patch(
+                self._session.cache,
+                self._config.cache_key_rules,
+                self._cache_key_stats,
+                self._config.max_response_bytes,
+                self._cache_access_tracker
+            )
         else:
+            self._cache_key_stats = None
+            self._cache_access_tracker = None
             # create non-cached session
             self._session = RateLimitedSession(
                 requests_per_second=self._config.requests_per_second
             )
 
         self._session.verify = verify_tls
+        self._session.headers['Accept-Encoding'] = decoding.ACCEPT_ENCODING
 
-        # set up retries
+        # retries are handled in `__get_internal` instead of urllib3, which would block the calling thread
+        #  without taking into account `Retry-After` headers or the overall retry rate
+        self._retry_handler = RetryHandler(self._config)
+        self._breaker_handler = CircuitBreakerHandler(self._config)
         retry = urllib3.util.retry.Retry(
-            total=self._config.http_retries,
-            backoff_factor=0.5,
+            total=0,
             redirect=False,
             raise_on_redirect=False,
-            status_forcelist={420, 429, *range(500, 520)},
             raise_on_status=False
         )
         self._session.mount('http://', HTTPAdapter(max_retries=retry))
@@ -108,6 +206,117 @@ class BaseSource:
         else:
             self._session.mount('https://', HTTPAdapter(max_retries=retry))
 
+        self._tls_session_cache: Optional[tls.TlsSessionCache] = None
+        if self._config.tls_session_resumption:
+            self._tls_session_cache = tls.TlsSessionCache()
+            https_adapter = cast(HTTPAdapter, self._session.adapters['https://'])
+            tls.use_resuming_contexts(https_adapter.poolmanager, self._tls_session_cache)
+
+        traced = self._config.tracer is not None
+        if self._config.dns_cache_ttl is not None or traced:
+            dns_cache = dns.get_dns_cache(self._config.dns_cache_ttl) if self._config.dns_cache_ttl is not None else None
+            pool_classes = pools.get_pool_classes(dns_cache, traced)
+            for adapter in self._session.adapters.values():
+                cast(HTTPAdapter, adapter).poolmanager.pool_classes_by_scheme = pool_classes
+
+        self.__refreshing: Set[str] = set()  # fingerprints of requests being refreshed in the background
+        self.__refresh_lock = threading.Lock()
+
+        self.__release_counts = collections.Counter({'reused': 0, 'discarded': 0, 'drained_bytes': 0})
+        self.__release_lock = threading.Lock()
+
+        # sessions are not thread-safe, each thread uses its own (see `_get_session`)
+        self.__local = threading.local()
+        self.__local.session = self._session
+
+        self.__init_kwargs = {
+            'base_reqdata': self._base_reqdata,
+            # executors can't be pickled, workers load types in their own process; exporters can't be pickled either
+            'config': dataclasses.replace(self._config, load_executor=None, tracer=None),
+            'verify_tls': verify_tls,
+            'require_fingerprint': require_fingerprint
+        }
+        self.__spec_id = spec_id or uuid.uuid4().hex
+        # process the spec was created in
+        self.__origin_pid = origin_pid or os.getpid()
+        self.__base_attrs = frozenset(set(self.__dict__) - attrs_before)
+        with BaseSource.__registry_lock:
+            BaseSource.__registry[(self.__spec_id, os.getpid())] = self
+
+    @staticmethod
+    def __create_access_tracker(cache: requests_cache.backends.BaseCache) -> Optional[CacheAccessTracker]:
+        # hits are stored next to the responses, so other backends are not supported
+        if not isinstance(cache.responses, DbDict):
+            _logger.warning(f'Cache access tracking is not supported by {type(cache).__name__}, ignoring')
+            return None
+        return CacheAccessTracker(cache.responses.db_path)
+
+    # sources are pickled by spec (i.e. config, base reqdata and TLS options) instead of their state,
+    #  sessions/pools/caches are rebuilt once per process when unpickling and reused afterwards
+    def __reduce__(self) -> Any:
+        return (_restore_source, (type(self), self.__spec_id, self.__init_kwargs, self.__get_state(), self.__origin_pid))
+
+    # copies are new sources with the same spec and their own sessions/pools, sharing the original
+    #  config (including executors and tracer) and scheduler
+    def __copy__(self: _TSource) -> _TSource:
+        return BaseSource.__create(type(self), None, None, self.__get_copy_kwargs(), self.__get_state())
+
+    def __deepcopy__(self: _TSource, memo: Dict[int, Any]) -> _TSource:
+        state = copy.deepcopy(self.__get_state(), memo)
+        return BaseSource.__create(type(self), None, None, self.__get_copy_kwargs(), state)
+
+    def __get_state(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items() if k not in self.__base_attrs}
+
+    def __get_copy_kwargs(self) -> Dict[str, Any]:
+        scheduler = self._scheduler if not self.__owns_scheduler else None
+        return dict(self.__init_kwargs, config=self._config, scheduler=scheduler)
+
+    @staticmethod
+    def __create(cls: Type[_TSource], spec_id: Optional[str], origin_pid: Optional[int], init_kwargs: Dict[str, Any], state: Dict[str, Any]) -> _TSource:
+        source = cast(_TSource, object.__new__(cls))
+        source.__dict__.update(state)
+        source.__spec_id = spec_id
+        source.__origin_pid = origin_pid
+        BaseSource.__init__(source, **init_kwargs)
+        return source
+
+    @staticmethod
+    def _restore(cls: Type[_TSource], spec_id: str, init_kwargs: Dict[str, Any], state: Dict[str, Any], origin_pid: Optional[int] = None) -> _TSource:
+        key = (spec_id, os.getpid())
+        with BaseSource.__registry_lock:
+            source = BaseSource.__registry.get(key)
+        if source is not None:
+            return cast(_TSource, source)
+
+        _logger.debug(f'Restoring source {cls.__name__} in process {os.getpid()}')
+        source = BaseSource.__create(cls, spec_id, origin_pid, init_kwargs, state)
+        with BaseSource.__registry_lock:
+            # another thread might have restored the same source in the meantime
+            source = BaseSource.__registry.setdefault(key, source)
+            if origin_pid != os.getpid():
+                # e.g. worker processes, where each task unpickles the source again
+                BaseSource.__restored[key] = source
+        return cast(_TSource, source)
+
+    @property
+    def cache_key_stats(self) -> Optional[CacheKeyStats]:
+        return self._cache_key_stats.stats if self._cache_key_stats is not None else None
+
+    @property
+    def connection_release_stats(self) -> ConnectionReleaseStats:
+        with self.__release_lock:
+            return ConnectionReleaseStats(**self.__release_counts)
+
+    @property
+    def tls_session_stats(self) -> Optional[tls.TlsSessionStats]:
+        return self._tls_session_cache.stats if self._tls_session_cache is not None else None
+
+    # by host, includes breakers shared with other sources using the same settings
+    @property
+    def circuit_breaker_stats(self) -> Dict[str, CircuitBreakerStats]:
+        return self._breaker_handler.stats
+
     @overload
     def _create_type(self, reqdata: ReqData, loadable: _TBaseTypeLoadable, *, force_unloadable: Literal[False] = False, **kwargs: Any) -> _TBaseTypeLoadable:  # type: ignore
         ...
@@ -125,43 +334,498 @@ class BaseSource:
         ...
 
     def _create_type(self, reqdata: ReqData, loadable: Optional[_TBaseTypeLoadable] = None, *, force_unloadable: bool = False, **kwargs: Any) -> Union[_TBaseTypeLoadable, UnloadableType]:
+        """
+        Loads `loadable` from the response to `reqdata` and returns it, or returns an `UnloadableType` if no
+        loadable is given (or `force_unloadable` is set).
+
+        Note: if `SourceConfig.load_executor` is set, the loadable is loaded in the executor and the returned
+        instance is a loaded copy; the passed instance is not modified and stays unloaded.
+        """
         if loadable is not None and not force_unloadable:
             # first overload
-            with self.get_reader(reqdata, **kwargs) as reader:
-                return loadable.load(reader, self._config.type_load_config)
+            with self._trace('reqcli.create_type', type=type(loadable).__name__):
+                with self.get_reader(reqdata, **kwargs) as reader:
+                    return self._load(loadable, reader)
         else:
             # second overload
             return UnloadableType(self, reqdata, kwargs)
 
     def get(self, reqdata: ReqData, *, skip_cache: RequestHook = False, skip_cache_read: RequestHook = False, skip_cache_write: ResponseHook = False) -> requests.Response:
-        res = self.__get_internal(reqdata, skip_cache, skip_cache_read, skip_cache_write)
-        try:
-            self.__check_status(res)
-        except ResponseStatusError:
-            if self._config.finish_read_on_error:  # pragma: no cover
-                res.raw.read()  # read response to allow reusing connection
-
-            # always release connection back to pool if an error occurred,
-            # enables connection reuse for failed requests (since connections are
-            #  only released back to the pool once the stream is closed)
-            # (note: using res.raw.release_conn() as res.close() would also terminate the connection)
-            res.raw.release_conn()
-            raise
-        return res
+        with self._trace('reqcli.get') as span:
+            res = self.__get_internal(reqdata, skip_cache, skip_cache_read, skip_cache_write)
+            if span is not None:
+                span.attributes.update(url=res.url, status=res.status_code, from_cache=getattr(res, 'from_cache', False))
+            try:
+                self.__check_status(res)
+            except ResponseStatusError:
+                self.__release(res)
+                raise
+            self.__check_size(res)
+            return res
 
     @contextlib.contextmanager
-    def get_reader(self, reqdata: ReqData, *, skip_cache: RequestHook = False, skip_cache_read: RequestHook = False, skip_cache_write: ResponseHook = False) -> Iterator[reader.ResponseReader]:
+    def get_reader(self, reqdata: ReqData, *, skip_cache: RequestHook = False, skip_cache_read: RequestHook = False, skip_cache_write: ResponseHook = False) -> Iterator[reader.Reader]:
         with self.get(reqdata, skip_cache=skip_cache, skip_cache_read=skip_cache_read, skip_cache_write=skip_cache_write) as res:
-            yield reader.ResponseReader(res)
+            with self.__create_reader(res) as r:
+                yield r
+
+    def _paginate(
+        self,
+        page_reqdata: Callable[[int], ReqData],
+        loadable: Callable[[], _TBaseTypeLoadable],
+        get_items: Callable[[_TBaseTypeLoadable], Iterable[_TItem]],
+        has_next: Callable[[_TBaseTypeLoadable], bool],
+        *,
+        prefetch: int = 2,
+        priority: int = 0,
+        **kwargs: Any
+    ) -> Iterator[_TItem]:
+        assert prefetch >= 0
+        pending: Deque['Future[_TBaseTypeLoadable]'] = collections.deque()
+        next_index = 0
+
+        def schedule() -> None:
+            nonlocal next_index
+            pending.append(self.submit(page_reqdata(next_index), loadable(), priority=priority, **kwargs))
+            next_index += 1
+
+        try:
+            schedule()
+            while pending:
+                page = pending.popleft().result()
+                if not has_next(page):
+                    yield from get_items(page)
+                    break
+
+                # keep the next pages in flight while the consumer processes the current one
+                while len(pending) < prefetch:
+                    schedule()
+                yield from get_items(page)
+                if not pending:
+                    # no prefetching, the next page is only requested once the current one was consumed
+                    schedule()
+        finally:
+            # runs once all pages were consumed or the consumer stopped iterating;
+            #  in-flight requests finish in the background, queued (or re-queued) ones are cancelled
+            for future in pending:
+                future.cancel()
+
+    def submit(self, reqdata: ReqData, loadable: Optional[_TBaseTypeLoadable] = None, *, priority: int = 0, **kwargs: Any) -> 'Future[Any]':
+        reqdata = self._base_reqdata + reqdata
+        host = urllib.parse.urlparse(reqdata.path).netloc
+
+        scheduler = self._get_scheduler()
+        self._retry_handler.record_request(host)
+
+        attempt = 0
+        # workers don't inherit the current span
+        parent = tracing.current_span()
+        submitted = time.monotonic()
+
+        def run() -> Any:
+            with self._trace('reqcli.submit', parent=parent, queued=time.monotonic() - submitted):
+                return run_attempt()
+
+        def run_attempt() -> Any:
+            nonlocal attempt
+            # re-queue instead of blocking the worker while ratelimited
+            wait_time = self.__try_reserve(reqdata, host, kwargs.get('skip_cache', False), kwargs.get('skip_cache_read', False))
+            if wait_time:
+                raise RetryLater(time.monotonic() + wait_time)
+            with RateLimitingMixin.reserved(host) if wait_time == 0 else contextlib.nullcontext():
+                res, deadline = self.__attempt(reqdata, host, attempt, **kwargs)
+            if res is None:
+                # re-queue retry instead of blocking the worker
+                attempt += 1
+                raise RetryLater(cast(float, deadline))
+
+            with res:
+                try:
+                    self.__check_status(res)
+                except ResponseStatusError:
+                    self.__release(res)
+                    raise
+                self.__check_size(res)
+                if loadable is None:
+                    # read entire response, since the connection can't be kept open
+                    with tracing.span('reqcli.read_body'):
+                        if self._config.max_response_bytes is not None and not getattr(res, 'from_cache', False):
+                            res._content = reader.ResponseReader(res, max_size=self._config.max_response_bytes).read()
+                            res._content_consumed = True  # type: ignore
+                        res.content
+                    return res
+                with self.__create_reader(res) as r:
+                    return self._load(loadable, r)
+
+        return scheduler.submit(host, run, priority=priority)
+
+    # opens connections to the base host ahead of time (including TLS handshakes and fingerprint checks),
+    #  can be called again after idle periods, since dropped connections are reopened as well
+    def prewarm(self, n_connections: int = 1) -> int:
+        assert n_connections > 0
+        url = self._base_reqdata.path
+        adapter = cast(HTTPAdapter, self._session.get_adapter(url))
+        pool = cast(urllib3.HTTPConnectionPool, adapter.get_connection(url))
+        # apply the same TLS settings as `HTTPAdapter.send` would
+        settings = self._session.merge_environment_settings(url, {}, None, None, self._base_reqdata.cert)
+        adapter.cert_verify(pool, url, settings['verify'], settings['cert'])
+        # can't keep more connections than the pool size
+        n_connections = min(n_connections, pool.pool.maxsize)  # type: ignore
+
+        # take connections out of the pool first, otherwise the same connection would be returned every time
+        conns = []
+        try:
+            for _ in range(n_connections):
+                conn = pool._get_conn()  # type: ignore[attr-defined]
+                conns.append(conn)
+                # closed connections (e.g. dropped after being idle) are reopened as well
+                if conn.sock is None:
+                    # same connect timeout as `HTTPAdapter.send` would use (the pool default is the global socket timeout)
+                    conn.timeout = self._config.timeout
+                    self.__connect(conn)
+                    if isinstance(conn.sock, ssl.SSLSocket) and not tls.process_post_handshake_messages(conn.sock):
+                        conn.close()
+        except BaseException:
+            for conn in conns:
+                conn.close()
+            raise
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)  # type: ignore[attr-defined]
+
+        _logger.debug(f'Prewarmed {n_connections} connections to {pool.host}')
+        return n_connections
+
+    # wraps urllib3 errors into the requests exceptions `HTTPAdapter.send` would raise
+    @staticmethod
+    def __connect(conn: urllib3.connection.HTTPConnection) -> None:
+        try:
+            conn.connect()
+        except urllib3.exceptions.NewConnectionError as e:
+            raise requests.ConnectionError(e) from e
+        except urllib3.exceptions.ConnectTimeoutError as e:
+            raise requests.ConnectTimeout(e) from e
+        except (urllib3.exceptions.SSLError, ssl.SSLError) as e:
+            raise requests.exceptions.SSLError(e) from e
+        except (urllib3.exceptions.ProtocolError, OSError) as e:
+            raise requests.ConnectionError(e) from e
+
+    # fetches responses for all given requests into the cache, using the scheduler's concurrency and rate limits
+    def warm_cache(self, reqdatas: Iterable[ReqData], *, priority: int = -1) -> CacheWarmResult:
+        assert self._config.enable_cache, 'cache is disabled'
+        requests_unique = list(dict.fromkeys(reqdatas))
+
+        futures = []
+        for reqdata in requests_unique:
+            if not self.__is_cached(reqdata):
+                futures.append(self.submit(reqdata, priority=priority))
+
+        failed = 0
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                _logger.warning(f'Failed to warm cache: {e}')
+                failed += 1
+
+        result = CacheWarmResult(
+            requested=len(requests_unique),
+            skipped=len(requests_unique) - len(futures),
+            fetched=len(futures) - failed,
+            failed=failed
+        )
+        _logger.info(f'Warmed cache: {result}')
+        return result
+
+    def export_cache(self, path: str, *, include_expired: bool = False) -> int:
+        assert self._config.enable_cache, 'cache is disabled'
+        return export_snapshot(cast(CachedRateLimitedSession, self._session).cache, path, include_expired=include_expired)
+
+    def import_cache(self, path: str, *, overwrite: bool = False, include_expired: bool = False) -> int:
+        assert self._config.enable_cache, 'cache is disabled'
+        return import_snapshot(cast(CachedRateLimitedSession, self._session).cache, path, overwrite=overwrite, include_expired=include_expired)
+
+    def __is_cached(self, reqdata: ReqData) -> bool:
+        response = self.__get_cached(reqdata)
+        return response is not None and not response.is_expired
+
+    # returns the cached response (which might be expired) without sending a request
+    def __get_cached(self, reqdata: ReqData, skip_cache: RequestHook = False, skip_cache_read: RequestHook = False) -> Optional[requests_cache.CachedResponse]:
+        key = self.__get_cache_key(reqdata, skip_cache, skip_cache_read)
+        return cast(CachedRateLimitedSession, self._session).cache.get_response(key) if key is not None else None
+
+    # returns `None` if the cache must not be read; lookups using the key are not recorded (see `CachePatcher.CacheKey`)
+    def __get_cache_key(self, reqdata: ReqData, skip_cache: RequestHook, skip_cache_read: RequestHook) -> Optional['CachePatcher.CacheKey']:
+        session = cast(CachedRateLimitedSession, self._session)
+        reqdata = self._base_reqdata + reqdata
+        # prepare request the same way as `session.get` in `__send` would
+        request = session.prepare_request(requests.Request(
+            'GET',
+            url=reqdata.path,
+            headers=reqdata.headers,
+            params=normalize_dict(reqdata.params),
+            hooks={_cache_read_disabled_hook: lambda r: False}
+        ))
+        for hook in (skip_cache, skip_cache_read):
+            if hook(request) if callable(hook) else hook:
+                return None
+        settings = session.merge_environment_settings(request.url, {}, None, None, reqdata.cert)
+        return session.cache.create_key(request, verify=settings['verify'], track=False)
+
+    # returns the session for the current thread; the thread that created the source uses `_session` directly
+    def _get_session(self) -> Union[requests.Session, CachedRateLimitedSession]:
+        session = getattr(self.__local, 'session', None)
+        if session is None:
+            template = self._session
+            session = object.__new__(type(template))
+            # shares connection pools (adapters), cookie jar (which is thread-safe) and cache backend,
+            #  mutable per-request state is not shared
+            session.__dict__.update(template.__dict__)
+            session.headers = CaseInsensitiveDict(template.headers)
+            session.params = copy.copy(template.params)
+            session.hooks = {k: list(v) for k, v in template.hooks.items()}
+            session.proxies = dict(template.proxies)
+            self.__local.session = session
+        return session
+
+    def _load(self, loadable: _TBaseTypeLoadable, reader: reader.Reader) -> _TBaseTypeLoadable:
+        with tracing.span('reqcli.load', type=type(loadable).__name__, offloaded=self._config.load_executor is not None):
+            if self._config.load_executor is not None:
+                # blocks the current thread, but parsing happens outside of this process
+                return offload.load_offloaded(self._config.load_executor, loadable, reader, self._config.type_load_config).result()
+            return loadable.load(reader, self._config.type_load_config)
+
+    # starts a span using the configured tracer, or a child span if a span of another tracer is active
+    def _trace(self, name: str, *, parent: Optional[tracing.Span] = None, **attributes: Any) -> ContextManager[Optional[tracing.Span]]:
+        if self._config.tracer is not None:
+            return self._config.tracer.span(name, parent=parent, **attributes)
+        return tracing.span(name, **attributes)
+
+    def _get_scheduler(self) -> RequestScheduler:
+        with self.__scheduler_lock:
+            if self._scheduler is None:
+                self._scheduler = RequestScheduler()
+                self.__owns_scheduler = True
+            return self._scheduler
+
+    # reserves a ratelimit slot for requests sent from scheduler workers; returns `None` if no slot is needed
+    #  (i.e. for cache hits), 0 if a slot was reserved, or the time to wait until one is available
+    def __try_reserve(self, reqdata: ReqData, host: str, skip_cache: RequestHook, skip_cache_read: RequestHook) -> Optional[float]:
+        interval = 1.0 / self._config.requests_per_second
+        if interval == 0:
+            return None
+        if self._config.enable_cache:
+            res = self.__get_cached(reqdata, skip_cache, skip_cache_read)
+            if res is not None and not res.is_expired:
+                return None
+        return RateLimitingMixin.try_reserve(host, interval)
+
+    # shuts down the scheduler (unless it was passed to `__init__`) once queued requests are done, and closes
+    #  all connections; the source can still be used afterwards, connections and scheduler are recreated as needed
+    def close(self) -> None:
+        with self.__scheduler_lock:
+            scheduler = self._scheduler if self.__owns_scheduler else None
+            self._scheduler = None
+            self.__owns_scheduler = False
+        if scheduler is not None:
+            scheduler.shutdown()
+        self._session.close()
+
+    def __enter__(self: _TSource) -> _TSource:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def download(self, reqdata: ReqData, path: str, *, hash_algorithms: Iterable[str] = ('sha256',), expected_size: Optional[int] = None, **kwargs: Any) -> Dict[str, str]:
+        hashes = {name: hashlib.new(name) for name in hash_algorithms}
+
+        with self.get_reader(reqdata, **kwargs) as reader:
+            if expected_size is not None and reader.size is not None and reader.size != expected_size:
+                raise DownloadError(f'expected {expected_size} bytes, server reported {reader.size} bytes for {path!r}')
+
+            # write to temporary file in same directory first, then atomically move it to the target path
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+            try:
+                size = 0
+                with os.fdopen(fd, 'wb') as f:
+                    # reuse the same buffer for all chunks to keep memory usage constant
+                    view = memoryview(bytearray(_download_chunk_size))
+                    while True:
+                        n = reader.readinto(view)
+                        if not n:
+                            break
+                        chunk = view[:n]
+                        for h in hashes.values():
+                            h.update(chunk)
+                        f.write(chunk)
+                        size += n
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                if expected_size is not None and size != expected_size:
+                    raise DownloadError(f'expected {expected_size} bytes, got {size} bytes for {path!r}')
+                # `mkstemp` creates the file with 0600, use the mode `open` would've used instead
+                os.chmod(temp_path, 0o666 & ~_get_umask())
+                os.replace(temp_path, path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+                raise
+
+        _logger.debug(f'Downloaded {size} bytes to {path!r}')
+        return {name: h.hexdigest() for name, h in hashes.items()}
 
     def __get_internal(self, reqdata: ReqData, skip_cache: RequestHook, skip_cache_read: RequestHook, skip_cache_write: ResponseHook) -> requests.Response:
+        stale: Optional[requests_cache.CachedResponse] = None
+        soft_ttl, hard_ttl = self._config.cache_soft_ttl, self._config.cache_hard_ttl
+        if self._config.enable_cache and (soft_ttl is not None or hard_ttl is not None):
+            key = self.__get_cache_key(reqdata, skip_cache, skip_cache_read)
+            cached = cast(CachedRateLimitedSession, self._session).cache.get_response(key) if key is not None else None
+            if key is not None and cached is not None and not cached.is_expired:
+                age = (datetime.datetime.utcnow() - cached.created_at).total_seconds()
+                if hard_ttl is None or age < hard_ttl:
+                    if soft_ttl is not None and age >= soft_ttl:
+                        # stale-while-revalidate
+                        self.__refresh(reqdata, skip_cache, skip_cache_write)
+                    # the lookup wasn't recorded, unlike lookups by `__fetch`
+                    CachePatcher.record_lookup(key, cached, self._cache_key_stats, self._cache_access_tracker)
+                    return cached
+                # past hard ttl, refresh synchronously
+                stale = cached
+                skip_cache_read = True
+
+        if stale is None or not self._config.cache_stale_if_error:
+            return self.__fetch(reqdata, skip_cache, skip_cache_read, skip_cache_write)
+
+        try:
+            res = self.__fetch(reqdata, skip_cache, skip_cache_read, skip_cache_write)
+        except (requests.RequestException, CircuitOpenError) as e:
+            _logger.info(f'Using stale cached response for {reqdata.path}, request failed: {e}')
+            return stale
+        if is_failure(res):
+            _logger.info(f'Using stale cached response for {reqdata.path}, request failed with status {res.status_code}')
+            self.__release(res)
+            return stale
+        return res
+
+    # refreshes a cached response in the background, unless a refresh for the same request is already in progress
+    def __refresh(self, reqdata: ReqData, skip_cache: RequestHook, skip_cache_write: ResponseHook) -> None:
+        key = (self._base_reqdata + reqdata).fingerprint
+        with self.__refresh_lock:
+            if key in self.__refreshing:
+                return
+            self.__refreshing.add(key)
+
+        def done(future: 'Future[Any]') -> None:
+            with self.__refresh_lock:
+                self.__refreshing.discard(key)
+            if not future.cancelled() and future.exception() is not None:
+                _logger.info(f'Failed to refresh cached response for {reqdata.path}: {future.exception()}')
+
+        _logger.debug(f'Refreshing cached response for {reqdata.path} in background')
+        try:
+            future = self.submit(reqdata, priority=-1, skip_cache=skip_cache, skip_cache_read=True, skip_cache_write=skip_cache_write)
+        except RuntimeError as e:  # scheduler was shut down
+            _logger.info(f'Failed to refresh cached response for {reqdata.path}: {e}')
+            with self.__refresh_lock:
+                self.__refreshing.discard(key)
+            return
+        future.add_done_callback(done)
+
+    def __fetch(self, reqdata: ReqData, skip_cache: RequestHook, skip_cache_read: RequestHook, skip_cache_write: ResponseHook) -> requests.Response:
         reqdata = self._base_reqdata + reqdata
+        host = urllib.parse.urlparse(reqdata.path).netloc
+        self._retry_handler.record_request(host)
+
+        attempt = 0
+        while True:
+            res, deadline = self.__attempt(reqdata, host, attempt, skip_cache=skip_cache, skip_cache_read=skip_cache_read, skip_cache_write=skip_cache_write)
+            if res is not None:
+                return res
+            self._retry_handler.wait(cast(float, deadline))
+            attempt += 1
+
+    # sends a single request, returns either the final response or the deadline for the next attempt
+    def __attempt(
+        self,
+        reqdata: ReqData,
+        host: str,
+        attempt: int,
+        *,
+        skip_cache: RequestHook = False,
+        skip_cache_read: RequestHook = False,
+        skip_cache_write: ResponseHook = False
+    ) -> Tuple[Optional[requests.Response], Optional[float]]:
+        with tracing.span('reqcli.attempt', url=reqdata.path, host=host, attempt=attempt) as span:
+            res, deadline = self.__attempt_internal(reqdata, host, attempt, skip_cache, skip_cache_read, skip_cache_write)
+            if span is not None and res is not None:
+                span.attributes.update(status=res.status_code, from_cache=getattr(res, 'from_cache', False))
+            return res, deadline
+
+    def __attempt_internal(
+        self,
+        reqdata: ReqData,
+        host: str,
+        attempt: int,
+        skip_cache: RequestHook,
+        skip_cache_read: RequestHook,
+        skip_cache_write: ResponseHook
+    ) -> Tuple[Optional[requests.Response], Optional[float]]:
+        ticket = self._breaker_handler.try_acquire(host)
+        if ticket is None:
+            tracing.set_attributes(circuit_open=True)
+            return self.__reject(reqdata, host, skip_cache, skip_cache_read), None
+
+        res: Optional[requests.Response] = None
+        success: Optional[bool] = None
+        try:
+            res = self.__send(reqdata, skip_cache, skip_cache_read, skip_cache_write)
+            success = get_outcome(res)
+            error = None
+        except RETRY_EXCEPTIONS as e:
+            success = False
+            res, error = None, e
+        finally:
+            self._breaker_handler.record(host, ticket, success)
+
+        if error is None and not self._retry_handler.is_retryable(res):
+            return res, None
+        deadline = self._retry_handler.get_retry_deadline(host, attempt, res)
+        if deadline is None:
+            if error is not None:
+                raise error
+            return res, None
+
+        if res is not None:
+            tracing.set_attributes(status=res.status_code, retry=True)
+            self.__release(res)
+            reason = f'status {res.status_code}'
+        else:
+            tracing.set_attributes(error=f'{type(error).__name__}: {error}', retry=True)
+            reason = f'error: {error}'
+        _logger.info(f'Retrying request to {reqdata.path} (attempt {attempt + 1}/{self._config.http_retries}), {reason}')
+        return None, deadline
+
+    # fails fast while the circuit breaker of a host is open, unless there's a cached response
+    def __reject(self, reqdata: ReqData, host: str, skip_cache: RequestHook, skip_cache_read: RequestHook) -> requests.Response:
+        if self._config.enable_cache:
+            res = self.__get_cached(reqdata, skip_cache, skip_cache_read)
+            if res is not None and (not res.is_expired or self._config.breaker_serve_stale):
+                _logger.info(f'Circuit breaker for {host} is open, using {"expired " if res.is_expired else ""}cached response for {reqdata.path}')
+                return res
+        raise CircuitOpenError(f'circuit breaker for {host} is open, not sending request to {reqdata.path}', host)
 
+    def __send(self, reqdata: ReqData, skip_cache: RequestHook, skip_cache_read: RequestHook, skip_cache_write: ResponseHook) -> requests.Response:
         _logger.debug(f'Sending request {reqdata}' + (' [cache disabled]' if self._config.enable_cache and skip_cache else ''))
 
+        # resumed sessions keep the client certificate they were established with
+        if self._tls_session_cache is not None and reqdata.cert != self._base_reqdata.cert:
+            raise ValueError('per-request client certificates are not supported with `tls_session_resumption`')
+
         exec_hook = lambda hook, *args: hook(*args) if callable(hook) else hook  # noqa
 
-        res = self._session.get(
+        res = self._get_session().get(
             url=reqdata.path,
             headers=reqdata.headers,
             params=reqdata.params,
@@ -187,20 +851,137 @@ class BaseSource:
     def __check_status(self, obj: requests.Response) -> None:
         self._config.response_status_checking.check(obj)
 
+    # only checks the declared size, actual sizes are enforced while reading
+    def __check_size(self, res: requests.Response) -> None:
+        max_size = self._config.max_response_bytes
+        if max_size is None or 'content-length' not in res.headers:
+            return
+        size = int(res.headers['content-length'])
+        if size > max_size:
+            # close connection instead of reading the entire body
+            res.close()
+            raise ResponseTooLargeError(f'response size of {size} bytes exceeds limit of {max_size} bytes')
+
+    @contextlib.contextmanager
+    def __create_reader(self, res: requests.Response) -> Iterator[reader.Reader]:
+        try:
+            response_reader = reader.ResponseReader(res, max_size=self._config.max_response_bytes)
+            if self._config.spill_threshold is None:
+                try:
+                    yield response_reader
+                finally:
+                    # the body is received while it's being processed, so only the time spent waiting is recorded
+                    tracing.set_attributes(body_bytes=response_reader.wire_bytes, body_read_time=response_reader.read_time)
+                return
+            # read entire body, releasing the connection before the data is processed
+            with tracing.span('reqcli.read_body') as span:
+                spooled = reader.SpooledReader(response_reader, self._config.spill_threshold)
+                if span is not None:
+                    span.attributes.update(body_bytes=response_reader.wire_bytes, spilled=spooled.spilled)
+        except ResponseTooLargeError:
+            res.close()
+            raise
+        try:
+            yield spooled
+        finally:
+            spooled.close()
+
+    def __release(self, res: requests.Response) -> None:
+        # draining error responses enables connection reuse (since connections are only released back
+        #  to the pool once the stream is closed), but must not cost more than opening a new connection
+        if getattr(res, 'from_cache', False):
+            return
+        reused, drained = self.__drain(res)
+        if reused:
+            res.raw.release_conn()
+        else:
+            # closes the connection as well
+            res.close()
+        with self.__release_lock:
+            self.__release_counts['reused' if reused else 'discarded'] += 1
+            self.__release_counts['drained_bytes'] += drained
+
+    # returns whether the response was read completely, and the number of bytes read
+    def __drain(self, res: requests.Response) -> Tuple[bool, int]:
+        max_bytes = self._config.drain_max_bytes
+        if not self._config.finish_read_on_error:
+            return False, 0
+        if 'content-length' in res.headers and int(res.headers['content-length']) > max_bytes:
+            return False, 0
+
+        deadline = time.monotonic() + self._config.drain_timeout
+        connection = getattr(res.raw, 'connection', None)
+        sock = getattr(connection, 'sock', None)
+        drained = 0
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, drained
+                if sock is not None:
+                    # urllib3 resets the timeout for the next request
+                    sock.settimeout(remaining)
+                data = res.raw.read(min(_drain_chunk_size, max_bytes - drained + 1), decode_content=False)
+                if not data:
+                    return True, drained
+                drained += len(data)
+                if drained > max_bytes:
+                    return False, drained
+        except (OSError, urllib3.exceptions.HTTPError) as e:
+            _logger.debug(f'Failed to drain response: {e}')
+            return False, drained
+
 
 class CachePatcher:
-    class ReadDisabledCacheKey(str):
+    # keys returned by the patched `create_key`; key stats and access tracking only count lookups using keys
+    #  with `track` set, i.e. once per request (`create_key` is called multiple times per request by requests-cache)
+    class CacheKey(str):
+        raw_key: Optional[str] = None  # key without `CacheKeyRules` applied, only set if key stats are enabled
+        track = True  # false for internal lookups (see `BaseSource.__get_cached`)
+
+        # keys are also stored as values (e.g. for redirects), which should be plain strings
+        def __reduce__(self) -> Any:
+            return (str, (str(self),))
+
+    class ReadDisabledCacheKey(CacheKey):
         pass
 
     @staticmethod
-    def patch(cache: requests_cache.backends.BaseCache) -> None:
+    def record_lookup(cache_key: CacheKey, response: Any, key_stats: Optional[CacheKeyStatsRecorder], access_tracker: Optional[CacheAccessTracker]) -> None:
+        if key_stats is not None and cache_key.raw_key is not None:
+            key_stats.record(cache_key.raw_key, str(cache_key))
+        if access_tracker is not None and response is not None and not getattr(response, 'is_expired', False):
+            access_tracker.record(str(cache_key))
+
+    @staticmethod
+    def patch(
+        cache: requests_cache.backends.BaseCache,
+        key_rules: Optional[CacheKeyRules] = None,
+        key_stats: Optional[CacheKeyStatsRecorder] = None,
+        max_response_bytes: Optional[int] = None,
+        access_tracker: Optional[CacheAccessTracker] = None
+    ) -> None:
         # patch cache.create_key
         orig_create_key = cache.create_key
-        def patched_create_key(request, *args, **kwargs):  # noqa
-            cache_key = orig_create_key(request, *args, **kwargs)
+        def patched_create_key(request, *args, track=True, **kwargs):  # noqa
+            # keys don't depend on which decoders are available, see `decoding.CACHE_KEY_ACCEPT_ENCODING`
+            if request.headers.get('Accept-Encoding') == decoding.ACCEPT_ENCODING != decoding.CACHE_KEY_ACCEPT_ENCODING:
+                request = request.copy()
+                request.headers['Accept-Encoding'] = decoding.CACHE_KEY_ACCEPT_ENCODING
+            if key_rules is not None:
+                cache_key = orig_create_key(key_rules.normalize(request), *args, **kwargs)
+            else:
+                cache_key = orig_create_key(request, *args, **kwargs)
+            raw_key = None
+            if key_stats is not None:
+                raw_key = orig_create_key(request, *args, **kwargs) if key_rules is not None else cache_key
             # wrap cache key if hook returns true
             if requests.hooks.dispatch_hook(_cache_read_disabled_hook, request.hooks, request):
                 cache_key = CachePatcher.ReadDisabledCacheKey(cache_key)
+            else:
+                cache_key = CachePatcher.CacheKey(cache_key)
+            cache_key.raw_key = raw_key
+            cache_key.track = track
             return cache_key
         cache.create_key = patched_create_key
 
@@ -209,6 +990,32 @@ class CachePatcher:
         def patched_get_response(cache_key):  # noqa
             # return None if hook returned true (see above)
             if isinstance(cache_key, CachePatcher.ReadDisabledCacheKey):
-                return None
-            return orig_get_response(cache_key)
+                response = None
+            else:
+                with tracing.span('reqcli.cache_lookup') as span:
+                    response = orig_get_response(cache_key)
+                    if span is not None:
+                        span.set_attribute('hit', response is not None and not getattr(response, 'is_expired', False))
+            if isinstance(cache_key, CachePatcher.CacheKey) and cache_key.track:
+                CachePatcher.record_lookup(cache_key, response, key_stats, access_tracker)
+            return response
         cache.get_response = patched_get_response
+
+        # patch cache.save_response
+        if max_response_bytes is not None:
+            orig_save_response = cache.save_response
+            def patched_save_response(cache_key, response, *args, **kwargs):  # noqa
+                # responses are read entirely when caching them, so the size has to be checked beforehand
+                if 'content-length' not in response.headers:
+                    _logger.debug(f'Not caching response of unknown size for {response.url}')
+                    return
+                size = int(response.headers['content-length'])
+                if size > max_response_bytes:
+                    response.close()
+                    raise ResponseTooLargeError(f'response size of {size} bytes exceeds limit of {max_response_bytes} bytes')
+                orig_save_response(cache_key, response, *args, **kwargs)
+                # decoded bodies might still be larger
+                if len(response.content) > max_response_bytes:
+                    cache.delete(cache_key)
+                    raise ResponseTooLargeError(f'decoded response size of {len(response.content)} bytes exceeds limit of {max_response_bytes} bytes')
+            cache.save_response = patched_save_response
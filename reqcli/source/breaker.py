@@ -0,0 +1,226 @@
+import enum
+import time
+import logging
+import requests
+import threading
+import collections
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+
+from .config import SourceConfig
+
+
+_logger = logging.getLogger(__name__)
+
+
+class CircuitState(enum.Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+@dataclass(frozen=True)
+class CircuitBreakerStats:
+    state: CircuitState
+    consecutive_failures: int
+    error_rate: float  # within the current window
+    opened: int  # number of times the breaker was opened
+    rejected: int  # requests rejected while open
+    last_state_change: float  # unix timestamp
+
+
+# responses from the cache never count, only server errors and connection errors/timeouts are failures
+def is_failure(response: Optional[requests.Response]) -> bool:
+    if response is None:
+        return True
+    if getattr(response, 'from_cache', False):
+        return False
+    return response.status_code >= 500
+
+
+# value passed to `CircuitBreaker.record`; cache hits say nothing about the server's health, so they release
+#  the ticket without affecting the breaker (otherwise they would reset failure counts or close a half-open breaker)
+def get_outcome(response: Optional[requests.Response]) -> Optional[bool]:
+    if getattr(response, 'from_cache', False):
+        return None
+    return not is_failure(response)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: Optional[int],
+        error_rate: Optional[float],
+        *,
+        min_requests: int = 10,
+        window: float = 30.0,
+        open_duration: float = 30.0,
+        half_open_probes: int = 1,
+        name: str = ''
+    ):
+        assert half_open_probes > 0
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+        self.name = name
+
+        self._state = CircuitState.CLOSED
+        # incremented on every state change, outcomes of requests started in a previous state are ignored
+        self._generation = 0
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._results: Deque[Tuple[float, bool]] = collections.deque()  # (time, failed)
+        self._probes = 0  # probes started in half-open state
+        self._probe_successes = 0
+        self._opened = 0
+        self._rejected = 0
+        self._last_state_change = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self.__update(time.monotonic())
+            return self._state
+
+    @property
+    def stats(self) -> CircuitBreakerStats:
+        with self._lock:
+            now = time.monotonic()
+            self.__update(now)
+            self.__prune(now)
+            return CircuitBreakerStats(
+                state=self._state,
+                consecutive_failures=self._consecutive_failures,
+                error_rate=self.__error_rate(),
+                opened=self._opened,
+                rejected=self._rejected,
+                last_state_change=self._last_state_change
+            )
+
+    # returns a ticket which has to be passed to `record`, or `None` if the request should be rejected
+    def try_acquire(self) -> Optional[int]:
+        with self._lock:
+            self.__update(time.monotonic())
+            if self._state is CircuitState.OPEN:
+                self._rejected += 1
+                return None
+            if self._state is CircuitState.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self._rejected += 1
+                    return None
+                self._probes += 1
+            return self._generation
+
+    # `success=None` releases the ticket without affecting the breaker (e.g. for unrelated errors)
+    def record(self, ticket: int, success: Optional[bool]) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if ticket != self._generation:
+                return
+            if self._state is CircuitState.HALF_OPEN:
+                if success is None:
+                    self._probes -= 1
+                elif not success:
+                    self.__transition(CircuitState.OPEN, now)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self.__transition(CircuitState.CLOSED, now)
+                return
+
+            if success is None:
+                return
+            self._results.append((now, not success))
+            self.__prune(now)
+            if success:
+                self._consecutive_failures = 0
+                return
+
+            self._consecutive_failures += 1
+            if self.failure_threshold is not None and self._consecutive_failures >= self.failure_threshold:
+                self.__transition(CircuitState.OPEN, now)
+            elif self.error_rate is not None and len(self._results) >= self.min_requests and self.__error_rate() >= self.error_rate:
+                self.__transition(CircuitState.OPEN, now)
+
+    def __update(self, now: float) -> None:
+        if self._state is CircuitState.OPEN and now - self._opened_at >= self.open_duration:
+            self.__transition(CircuitState.HALF_OPEN, now)
+
+    def __transition(self, state: CircuitState, now: float) -> None:
+        log = _logger.warning if state is CircuitState.OPEN else _logger.info
+        log(f'Circuit breaker for {self.name or "<unnamed>"} changed from {self._state.value} to {state.value}')
+        self._state = state
+        self._generation += 1
+        self._last_state_change = time.time()
+        self._probes = 0
+        self._probe_successes = 0
+        if state is CircuitState.OPEN:
+            self._opened += 1
+            self._opened_at = now
+        elif state is CircuitState.CLOSED:
+            self._consecutive_failures = 0
+            self._results.clear()
+
+    def __error_rate(self) -> float:
+        if not self._results:
+            return 0.0
+        return sum(failed for _, failed in self._results) / len(self._results)
+
+    def __prune(self, now: float) -> None:
+        cutoff = now - self.window
+        while self._results and self._results[0][0] < cutoff:
+            self._results.popleft()
+
+
+class CircuitBreakerHandler:
+    # breakers are shared between all sources (per host), similar to retry budgets
+    __breakers: Dict[Tuple[str, Tuple[object, ...]], CircuitBreaker] = {}
+    __lock = threading.Lock()
+
+    def __init__(self, config: SourceConfig):
+        self._config = config
+        self.enabled = config.breaker_failure_threshold is not None or config.breaker_error_rate is not None
+
+    def try_acquire(self, host: str) -> Optional[int]:
+        if not self.enabled:
+            return 0
+        return self.__get_breaker(host).try_acquire()
+
+    def record(self, host: str, ticket: int, success: Optional[bool]) -> None:
+        if self.enabled:
+            self.__get_breaker(host).record(ticket, success)
+
+    # stats of all breakers using the same settings, by host
+    @property
+    def stats(self) -> Dict[str, CircuitBreakerStats]:
+        cls = type(self)
+        params = self.__params()
+        with cls.__lock:
+            breakers = [(host, breaker) for (host, p), breaker in cls.__breakers.items() if p == params]
+        return {host: breaker.stats for host, breaker in breakers}
+
+    def __params(self) -> Tuple[object, ...]:
+        c = self._config
+        return (c.breaker_failure_threshold, c.breaker_error_rate, c.breaker_min_requests, c.breaker_window, c.breaker_open_duration, c.breaker_half_open_probes)
+
+    def __get_breaker(self, host: str) -> CircuitBreaker:
+        cls = type(self)
+        key = (host, self.__params())
+        with cls.__lock:
+            breaker = cls.__breakers.get(key)
+            if breaker is None:
+                c = self._config
+                breaker = cls.__breakers[key] = CircuitBreaker(
+                    c.breaker_failure_threshold,
+                    c.breaker_error_rate,
+                    min_requests=c.breaker_min_requests,
+                    window=c.breaker_window,
+                    open_duration=c.breaker_open_duration,
+                    half_open_probes=c.breaker_half_open_probes,
+                    name=host
+                )
+            return breaker
@@ -1,8 +1,11 @@
 from dataclasses import dataclass, field
+from concurrent.futures import Executor
 from typing import Iterable, Optional
 
 from .status import StatusCheckMode
 from ..type import TypeLoadConfig
+from ..cache import CacheKeyRules
+from ..tracing import Tracer
 from ..config import Configuration
 
 
@@ -10,9 +13,35 @@ from ..config import Configuration
 class SourceConfig:
     enable_cache: bool = True
     cache_response_codes: Iterable[int] = frozenset({200, 204, 301, 302, 303, 304, 307, 308, 401, 403, 404})
+    cache_key_rules: Optional[CacheKeyRules] = None  # normalization of requests before computing cache keys
+    cache_key_stats: bool = False  # track how many keys were collapsed by `cache_key_rules`, see `BaseSource.cache_key_stats`
+    cache_soft_ttl: Optional[float] = None  # seconds; older cached responses are returned immediately and refreshed in the background
+    cache_hard_ttl: Optional[float] = None  # seconds; older cached responses are refreshed synchronously
+    cache_stale_if_error: bool = False  # return cached responses past `cache_hard_ttl` if refreshing them fails
+    cache_compact_entries: bool = False  # store cached responses in a compact binary format instead of pickle, see `reqcli.cache.serializer`
+    cache_access_tracking: bool = False  # count cache hits per key in the cache database (sqlite backend only), see `python -m reqcli.cache hot`
     response_status_checking: StatusCheckMode = StatusCheckMode.REQUIRE_200
     http_retries: int = 3
+    retry_backoff_factor: float = 0.5
+    retry_max_delay: float = 30.0  # seconds; retries with longer delays (e.g. through `Retry-After`) are not attempted
+    retry_budget_ratio: float = 0.1  # max. ratio of retries to requests per host
+    retry_budget_min_per_second: float = 1.0  # retries per host that are always allowed, regardless of ratio
+    breaker_failure_threshold: Optional[int] = None  # consecutive failures that open the circuit breaker of a host
+    breaker_error_rate: Optional[float] = None  # ratio of failed requests within `breaker_window` that opens the circuit breaker
+    breaker_min_requests: int = 10  # min. requests within `breaker_window` before `breaker_error_rate` is considered
+    breaker_window: float = 30.0  # seconds
+    breaker_open_duration: float = 30.0  # seconds until probe requests are let through again
+    breaker_half_open_probes: int = 1  # successful probes required for closing the circuit breaker
+    breaker_serve_stale: bool = False  # serve cached responses while the circuit breaker is open, even if expired
     timeout: Optional[int] = None  # seconds
-    finish_read_on_error: bool = True
+    tls_session_resumption: bool = False  # reuse TLS sessions for new connections to the same host, see `BaseSource.tls_session_stats`
+    dns_cache_ttl: Optional[float] = None  # seconds; caches resolved addresses in-process (shared between sources) if set
+    finish_read_on_error: bool = True  # drain error responses to reuse the connection, instead of closing it
+    drain_max_bytes: int = 64 * 1024  # larger error responses are not drained
+    drain_timeout: float = 1.0  # seconds
     requests_per_second: float = 5.0  # set to `float('inf')` to disable ratelimiting
     type_load_config: TypeLoadConfig = field(default_factory=lambda: Configuration.type_load_config_type())
+    max_response_bytes: Optional[int] = None  # larger (decoded) bodies raise `ResponseTooLargeError`; responses of unknown size are not cached if set
+    spill_threshold: Optional[int] = None  # bodies are read entirely before loading, and written to a temporary file if larger
+    load_executor: Optional[Executor] = None  # e.g. `ProcessPoolExecutor`, for loading types outside of the current process; loaded types are copies, see `BaseSource._create_type`
+    tracer: Optional[Tracer] = None  # records spans for each phase of a request (see `reqcli.tracing`), not used by other processes
@@ -3,11 +3,14 @@ import time
 import logging
 import requests
 import threading
+import contextlib
 import collections
 import urllib.parse
 import requests_cache
 import requests_cache.backends
-from typing import Dict, Any, cast
+from typing import Dict, Any, Iterator, cast
+
+from .. import tracing
 
 
 # suppress warnings about unrecognized arguments due to CachedRateLimitedSession
@@ -19,6 +22,7 @@ _logger = logging.getLogger(__name__)
 class RateLimitingMixin:
     __last_call: Dict[str, float] = collections.defaultdict(lambda: 0)
     __lock = threading.RLock()
+    __local = threading.local()
 
     def __init__(self, requests_per_second: float, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)  # type: ignore
@@ -28,13 +32,23 @@ class RateLimitingMixin:
     def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
         if self._ratelimit_interval != 0:
             host = urllib.parse.urlparse(cast(str, request.url)).netloc
-            wait_time = self.__get_wait_time(host)
+            if getattr(RateLimitingMixin.__local, 'reserved', None) == host:
+                # slot was already reserved beforehand (see `reserved` below), only applies to one request
+                RateLimitingMixin.__local.reserved = None
+            else:
+                wait_time = self.__get_wait_time(host)
 
-            if wait_time > 0:
-                _logger.info(f'Ratelimiting request to {host}, waiting {wait_time:.2f}s')
-                time.sleep(wait_time)
+                if wait_time > 0:
+                    _logger.info(f'Ratelimiting request to {host}, waiting {wait_time:.2f}s')
+                    with tracing.span('reqcli.ratelimit_wait', host=host, wait=wait_time):
+                        time.sleep(wait_time)
 
-        return super().send(request, **kwargs)  # type: ignore
+        # time until response headers were received (including connection setup), cache hits don't get here
+        with tracing.span('reqcli.http') as span:
+            res = super().send(request, **kwargs)  # type: ignore
+            if span is not None:
+                span.set_attribute('status', res.status_code)
+            return res
 
     def __get_wait_time(self, key: str) -> float:
         cls = type(self)
@@ -49,6 +63,26 @@ class RateLimitingMixin:
             cls.__last_call[key] = now + wait_time
             return wait_time
 
+    # reserves a slot and returns 0 if a request can be sent immediately, otherwise returns the time to wait
+    @classmethod
+    def try_reserve(cls, key: str, interval: float, *, dry_run: bool = False) -> float:
+        with cls.__lock:
+            now = time.time()
+            wait_time = max(0, interval - (now - cls.__last_call[key]))
+            if wait_time == 0 and not dry_run:
+                cls.__last_call[key] = now
+            return wait_time
+
+    # marks the next request to the host on the current thread as already reserved through `try_reserve`
+    @classmethod
+    @contextlib.contextmanager
+    def reserved(cls, key: str) -> Iterator[None]:
+        cls.__local.reserved = key
+        try:
+            yield
+        finally:
+            cls.__local.reserved = None
+
 
 class RateLimitedSession(RateLimitingMixin, requests.Session):
     pass
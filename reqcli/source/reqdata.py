@@ -1,25 +1,110 @@
+import hashlib
+import weakref
+import threading
 import urllib.parse
-from dataclasses import dataclass, field
-from typing import Optional, Union, Tuple
+from dataclasses import dataclass
+from typing import Any, ClassVar, Optional, Union, Tuple, TYPE_CHECKING
 
+from ..utils.dicts import FrozenDict
 from ..utils.typing import RequestDict
 
 
 # ref: cert parameter for https://requests.readthedocs.io/en/master/api/#requests.request
 CertType = Union[str, Tuple[str, str]]
 
+_EMPTY: FrozenDict[str, Union[int, str, bytes]] = FrozenDict()
 
-@dataclass(frozen=True)
+
+def _freeze(d: Optional[RequestDict]) -> 'FrozenDict[str, Union[int, str, bytes]]':
+    if not d:
+        return _EMPTY
+    if isinstance(d, FrozenDict):
+        return d
+    return FrozenDict(d)
+
+
+# immutable and hashable; fields don't have defaults (see `__init__` instead), since they would conflict with `__slots__`
+@dataclass(frozen=True, init=False, repr=False, eq=False)
 class ReqData:
+    __slots__ = ('path', 'params', 'headers', 'cert', '_hash', '_fingerprint', '__weakref__')
+
     path: str
-    params: RequestDict = field(default_factory=lambda: {})
-    headers: RequestDict = field(default_factory=lambda: {})
-    cert: Optional[CertType] = None
+    params: RequestDict
+    headers: RequestDict
+    cert: Optional[CertType]
+
+    # cached values, not fields (`field(init=False)` would conflict with `__slots__` as well)
+    if TYPE_CHECKING:
+        _hash: Optional[int]
+        _fingerprint: Optional[str]
+
+    # keyed by field values, since the instances themselves must not be referenced strongly
+    __intern_table: ClassVar['weakref.WeakValueDictionary[Tuple[Any, ...], ReqData]'] = weakref.WeakValueDictionary()
+    __intern_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, path: str, params: Optional[RequestDict] = None, headers: Optional[RequestDict] = None, cert: Optional[CertType] = None):
+        set_attr = object.__setattr__
+        set_attr(self, 'path', path)
+        set_attr(self, 'params', _freeze(params))
+        set_attr(self, 'headers', _freeze(headers))
+        set_attr(self, 'cert', tuple(cert) if isinstance(cert, list) else cert)
+        set_attr(self, '_hash', None)
+        set_attr(self, '_fingerprint', None)
+
+    def __key(self) -> Tuple[Any, ...]:
+        return (self.path, self.params, self.headers, self.cert)
+
+    def __reduce__(self) -> Any:
+        return (type(self), self.__key())
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        assert isinstance(other, ReqData)
+        return self.__key() == other.__key()
+
+    def __hash__(self) -> int:
+        h = self._hash
+        if h is None:
+            h = hash(self.__key())
+            object.__setattr__(self, '_hash', h)
+        return h
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(path={self.path!r}, params={self.params!r}, headers={self.headers!r}, cert={self.cert!r})'
+
+    # stable across processes, unlike `hash()`; header names are case-insensitive
+    @property
+    def fingerprint(self) -> str:
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            canonical = repr((
+                self.path,
+                sorted(self.params.items()),
+                # names might only differ in case, values of those are compared by their repr
+                sorted(((k.lower(), v) for k, v in self.headers.items()), key=lambda item: (item[0], repr(item[1]))),
+                self.cert
+            ))
+            fingerprint = hashlib.sha1(canonical.encode()).hexdigest()
+            object.__setattr__(self, '_fingerprint', fingerprint)
+        return fingerprint
+
+    # returns a canonical instance equal to this one, allowing large numbers of
+    #  identical requests to share memory. entries are removed once they're not referenced anymore
+    def intern(self) -> 'ReqData':
+        cls = type(self)
+        key = self.__key()
+        with cls.__intern_lock:
+            inst = cls.__intern_table.get(key)
+            if inst is None:
+                cls.__intern_table[key] = inst = self
+            return inst
 
     def __add__(self, other: 'ReqData') -> 'ReqData':
+        # reuse existing mappings if possible
         return ReqData(
             urllib.parse.urljoin(self.path, other.path),
-            {**self.params, **other.params},
-            {**self.headers, **other.headers},
+            {**self.params, **other.params} if self.params and other.params else (other.params or self.params),
+            {**self.headers, **other.headers} if self.headers and other.headers else (other.headers or self.headers),
             self.cert or other.cert
         )
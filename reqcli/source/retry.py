@@ -0,0 +1,119 @@
+import time
+import logging
+import requests
+import threading
+import collections
+import email.utils
+from typing import Deque, Dict, Optional, Tuple
+
+from .config import SourceConfig
+
+
+RETRY_STATUS_CODES = frozenset({420, 429, *range(500, 520)})
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+
+_logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:  # pragma: no cover  # returned instead of raising in some python versions
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class RetryBudget:
+    def __init__(self, ratio: float, min_per_second: float, window: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+
+        self._requests: Deque[float] = collections.deque()
+        self._retries: Deque[float] = collections.deque()
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.__prune(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.__prune(now)
+            allowed = self.min_per_second * self.window + self.ratio * len(self._requests)
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+    def __prune(self, now: float) -> None:
+        cutoff = now - self.window
+        for q in (self._requests, self._retries):
+            while q and q[0] < cutoff:
+                q.popleft()
+
+
+class RetryHandler:
+    # budgets are shared between all sources (per host), similar to ratelimits
+    __budgets: Dict[Tuple[str, float, float], RetryBudget] = {}
+    __lock = threading.Lock()
+
+    def __init__(self, config: SourceConfig):
+        self._config = config
+
+    def record_request(self, host: str) -> None:
+        self.__get_budget(host).record_request()
+
+    @staticmethod
+    def is_retryable(response: Optional[requests.Response]) -> bool:
+        if response is None:
+            return True  # request raised a retryable exception
+        if getattr(response, 'from_cache', False):
+            return False
+        return response.status_code in RETRY_STATUS_CODES
+
+    # returns the (monotonic) time at which the request should be retried, or `None` if it should not be retried
+    def get_retry_deadline(self, host: str, attempt: int, response: Optional[requests.Response]) -> Optional[float]:
+        if attempt >= self._config.http_retries:
+            return None
+
+        delay = self._config.retry_backoff_factor * (2 ** attempt)
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                delay = retry_after
+
+        # fail fast instead of tying up the caller if the server wants us to wait for too long
+        if delay > self._config.retry_max_delay:
+            _logger.info(f'Not retrying request to {host}, delay of {delay:.2f}s exceeds limit')
+            return None
+        if not self.__get_budget(host).try_acquire():
+            _logger.info(f'Not retrying request to {host}, retry budget exhausted')
+            return None
+
+        return time.monotonic() + delay
+
+    @staticmethod
+    def wait(deadline: float) -> None:
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def __get_budget(self, host: str) -> RetryBudget:
+        cls = type(self)
+        key = (host, self._config.retry_budget_ratio, self._config.retry_budget_min_per_second)
+        with cls.__lock:
+            budget = cls.__budgets.get(key)
+            if budget is None:
+                budget = cls.__budgets[key] = RetryBudget(self._config.retry_budget_ratio, self._config.retry_budget_min_per_second)
+            return budget
@@ -0,0 +1,297 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from .ratelimit import RateLimitingMixin
+
+
+_T = TypeVar('_T')
+
+_logger = logging.getLogger(__name__)
+
+
+class RetryLater(Exception):
+    # raised by scheduled functions to be re-queued instead of blocking the worker thread
+    def __init__(self, not_before: float):
+        super().__init__(not_before)
+        self.not_before = not_before  # monotonic time
+
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    queue_depth: int
+    queue_depth_by_host: Dict[str, int]
+    delayed: int
+    in_flight: int
+    completed: int
+    rescheduled: int
+    max_wait_time: float  # seconds
+    mean_wait_time: float  # seconds
+
+
+class _Task:
+    __slots__ = ('sort_key', 'host', 'fn', 'future', 'not_before', 'enqueued', 'reserved', 'requeued', 'cancelled')
+
+    def __init__(self, sort_key: Tuple[int, int], host: str, fn: Callable[[], Any], future: '_TaskFuture[Any]', not_before: float):
+        self.sort_key = sort_key
+        self.host = host
+        self.fn = fn
+        self.future = future
+        self.not_before = not_before
+        self.enqueued = time.monotonic()
+        self.reserved = False  # ratelimit slot was reserved by the scheduler
+        self.requeued = False  # queued again after raising `RetryLater`, the future is already running
+        self.cancelled = False
+
+    def __lt__(self, other: '_Task') -> bool:
+        return self.sort_key < other.sort_key
+
+
+class _TaskFuture(Future, Generic[_T]):
+    _task: _Task
+    _scheduler: 'RequestScheduler'
+
+    # futures of re-queued tasks are already running, but can still be cancelled until the task runs again;
+    #  they are resolved with `CancelledError` then, i.e. `cancelled()` returns false
+    def cancel(self) -> bool:
+        return super().cancel() or self._scheduler._cancel_requeued(self._task)
+
+
+@dataclass
+class _HostState:
+    max_concurrency: int
+    ratelimit_interval: float = 0.0
+    in_flight: int = 0
+    queue: List[_Task] = field(default_factory=list)  # heap
+
+
+class RequestScheduler:
+    def __init__(self, max_workers: int = 8, *, max_concurrency_per_host: int = 2, idle_timeout: float = 30.0):
+        assert max_workers > 0 and max_concurrency_per_host > 0 and idle_timeout > 0
+        self._max_workers = max_workers
+        self._default_concurrency = max_concurrency_per_host
+        self._idle_timeout = idle_timeout  # seconds until idle workers exit, they are restarted on demand
+
+        self._hosts: Dict[str, _HostState] = {}
+        self._delayed: List[Tuple[float, int, _Task]] = []  # heap of tasks with `not_before` in the future
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._thread_ids = itertools.count()
+        self._idle_threads = 0
+        self._shutdown = False
+
+        # stats
+        self._completed = 0
+        self._rescheduled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_count = 0
+
+    # `requests_per_second` limits how often tasks for the host are started, regardless of what they do;
+    #  sources don't set it, they reserve ratelimit slots themselves once it's known that a request isn't a cache hit
+    def set_host_limits(self, host: str, *, max_concurrency: Optional[int] = None, requests_per_second: Optional[float] = None, overwrite: bool = True) -> None:
+        with self._cond:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self._default_concurrency)
+            elif not overwrite:
+                return
+            if max_concurrency is not None:
+                assert max_concurrency > 0
+                state.max_concurrency = max_concurrency
+            if requests_per_second is not None:
+                assert requests_per_second > 0
+                state.ratelimit_interval = 1.0 / requests_per_second
+            self._cond.notify_all()
+
+    # higher values for `priority` are scheduled first; tasks with equal priority are scheduled in FIFO order
+    def submit(self, host: str, fn: Callable[[], _T], *, priority: int = 0, not_before: Optional[float] = None) -> 'Future[_T]':
+        future: '_TaskFuture[_T]' = _TaskFuture()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new tasks after shutdown')
+            if host not in self._hosts:
+                self._hosts[host] = _HostState(self._default_concurrency)
+            task = _Task((-priority, next(self._seq)), host, fn, future, not_before or 0.0)
+            future._task = task
+            future._scheduler = self
+            self.__enqueue(task)
+            self.__ensure_workers()
+            self._cond.notify()
+        return future
+
+    @property
+    def stats(self) -> SchedulerStats:
+        with self._cond:
+            by_host = {host: len(state.queue) for host, state in self._hosts.items() if state.queue}
+            return SchedulerStats(
+                queue_depth=sum(by_host.values()),
+                queue_depth_by_host=by_host,
+                delayed=len(self._delayed),
+                in_flight=sum(state.in_flight for state in self._hosts.values()),
+                completed=self._completed,
+                rescheduled=self._rescheduled,
+                max_wait_time=self._wait_max,
+                mean_wait_time=self._wait_total / self._wait_count if self._wait_count else 0.0
+            )
+
+    def shutdown(self, wait: bool = True, *, cancel_pending: bool = False) -> None:
+        cancelled: List[_Task] = []
+        with self._cond:
+            self._shutdown = True
+            if cancel_pending:
+                for state in self._hosts.values():
+                    cancelled.extend(state.queue)
+                    state.queue.clear()
+                cancelled.extend(task for _, _, task in self._delayed)
+                self._delayed.clear()
+            self._cond.notify_all()
+            threads = list(self._threads)
+        # outside of the lock, since callbacks of futures might use the scheduler
+        for task in cancelled:
+            task.future.cancel()
+        if wait:
+            for t in threads:
+                t.join()
+
+    def __enter__(self) -> 'RequestScheduler':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+
+    # see `_TaskFuture.cancel`
+    def _cancel_requeued(self, task: _Task) -> bool:
+        with self._cond:
+            if not task.requeued or task.cancelled:
+                return False
+            task.cancelled = True
+            # might have been removed by `shutdown` already
+            state = self._hosts[task.host]
+            state.queue = [t for t in state.queue if t is not task]
+            heapq.heapify(state.queue)
+            self._delayed = [item for item in self._delayed if item[2] is not task]
+            heapq.heapify(self._delayed)
+        task.future.set_exception(CancelledError())
+        return True
+
+    def __enqueue(self, task: _Task) -> None:
+        if task.not_before > time.monotonic():
+            heapq.heappush(self._delayed, (task.not_before, next(self._seq), task))
+        else:
+            heapq.heappush(self._hosts[task.host].queue, task)
+
+    def __ensure_workers(self) -> None:
+        if len(self._threads) >= self._max_workers:
+            return
+        # only start new workers if there are more queued tasks than idle workers
+        queued = sum(len(state.queue) for state in self._hosts.values())
+        if queued <= self._idle_threads:
+            return
+        t = threading.Thread(target=self.__worker, name=f'RequestScheduler-{next(self._thread_ids)}', daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def __has_pending(self) -> bool:
+        return bool(self._delayed) or any(state.queue for state in self._hosts.values())
+
+    # returns the next task that can be run right now, or the time to wait until the next one might be ready
+    def __pop_ready(self) -> Tuple[Optional[_Task], Optional[float]]:
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, task = heapq.heappop(self._delayed)
+            heapq.heappush(self._hosts[task.host].queue, task)
+
+        best: Optional[Tuple[_Task, _HostState]] = None
+        timeout = self._delayed[0][0] - now if self._delayed else None
+        for host, state in self._hosts.items():
+            if not state.queue or state.in_flight >= state.max_concurrency:
+                continue  # workers will be notified once a task for this host finishes
+            if best is not None and not state.queue[0] < best[0]:
+                continue
+            if state.ratelimit_interval:
+                wait_time = RateLimitingMixin.try_reserve(host, state.ratelimit_interval, dry_run=True)
+                if wait_time > 0:
+                    timeout = wait_time if timeout is None else min(timeout, wait_time)
+                    continue
+            best = (state.queue[0], state)
+
+        if best is None:
+            return None, timeout
+        task, state = best
+        heapq.heappop(state.queue)
+        task.requeued = False
+        task.reserved = bool(state.ratelimit_interval)
+        if task.reserved:
+            RateLimitingMixin.try_reserve(task.host, state.ratelimit_interval)
+        state.in_flight += 1
+        return task, None
+
+    def __worker(self) -> None:
+        while True:
+            with self._cond:
+                idle_since = time.monotonic()
+                while True:
+                    task, timeout = self.__pop_ready()
+                    if task is not None:
+                        break
+                    if self._shutdown and not self.__has_pending():
+                        self._threads.remove(threading.current_thread())
+                        return
+                    if timeout is None and not self.__has_pending():
+                        idle = time.monotonic() - idle_since
+                        if idle >= self._idle_timeout:
+                            self._threads.remove(threading.current_thread())
+                            return
+                        timeout = self._idle_timeout - idle
+                    self._idle_threads += 1
+                    self._cond.wait(timeout)
+                    self._idle_threads -= 1
+
+                wait_time = time.monotonic() - task.enqueued
+                self._wait_total += wait_time
+                self._wait_max = max(self._wait_max, wait_time)
+                self._wait_count += 1
+
+            self.__run(task)
+
+            with self._cond:
+                self._hosts[task.host].in_flight -= 1
+                self._cond.notify_all()
+
+    def __run(self, task: _Task) -> None:
+        if task.cancelled:
+            return
+        # future may already be running if the task was rescheduled
+        if not task.future.running() and not task.future.set_running_or_notify_cancel():
+            return
+
+        try:
+            if task.reserved:
+                # the slot was already reserved by the scheduler, don't wait again
+                with RateLimitingMixin.reserved(task.host):
+                    result = task.fn()
+            else:
+                result = task.fn()
+        except RetryLater as e:
+            _logger.debug(f'Rescheduling task for {task.host}, {max(0, e.not_before - time.monotonic()):.2f}s from now')
+            with self._cond:
+                self._rescheduled += 1
+                task.not_before = e.not_before
+                task.enqueued = time.monotonic()
+                task.requeued = True
+                self.__enqueue(task)
+        except BaseException as e:
+            task.future.set_exception(e)
+            with self._cond:
+                self._completed += 1
+        else:
+            task.future.set_result(result)
+            with self._cond:
+                self._completed += 1
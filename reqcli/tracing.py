@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+import contextlib
+import contextvars
+import dataclasses
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_time: float  # unix timestamp
+    duration: Optional[float] = None  # seconds, set once the span is finished
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    sampled: ClassVar[bool] = True  # false for placeholders of traces that were not sampled, see `Tracer.span`
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+# current span of traces that were not sampled, so that their child spans (including ones in other threads,
+#  through `parent`) are not sampled either
+class _UnsampledSpan(Span):
+    sampled = False
+
+
+# receives finished spans, e.g. for forwarding them to a tracing backend; called from the thread that finished the span
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+# writes one JSON object per span
+class JsonLinesExporter(SpanExporter):
+    def __init__(self, file: Union[str, TextIO]):
+        if isinstance(file, str):
+            self._file: TextIO = open(file, 'a', encoding='utf-8')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        # non-serializable attributes are written as strings
+        line = json.dumps(dataclasses.asdict(span), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._owns_file:
+                self._file.close()
+
+
+# active tracer and span of the current thread/task
+_current: 'contextvars.ContextVar[Optional[Tuple[Tracer, Span]]]' = contextvars.ContextVar('reqcli_current_span', default=None)
+
+
+class Tracer:
+    def __init__(self, *exporters: SpanExporter, sample_rate: float = 1.0):
+        assert 0 <= sample_rate <= 1
+        self.exporters: List[SpanExporter] = list(exporters)
+        self.sample_rate = sample_rate
+
+    # starts a new span, which is a child of the current span unless `parent` is given; the span becomes
+    #  the current span until it finishes. yields `None` for traces that were not sampled
+    @contextlib.contextmanager
+    def span(self, name: str, *, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+        if parent is None:
+            current = _current.get()
+            if current is not None:
+                parent = current[1]
+        if parent is None and self.sample_rate < 1 and random.random() >= self.sample_rate:
+            # sampling is decided once per trace
+            parent = _UnsampledSpan(name, '', '', None, time.time())
+        if parent is not None and not parent.sampled:
+            token = _current.set((self, parent))
+            try:
+                yield None
+            finally:
+                _current.reset(token)
+            return
+
+        span = Span(
+            name,
+            parent.trace_id if parent is not None else os.urandom(16).hex(),
+            os.urandom(8).hex(),
+            parent.span_id if parent is not None else None,
+            time.time(),
+            attributes=attributes
+        )
+        token = _current.set((self, span))
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current.reset(token)
+            self.__export(span)
+
+    def close(self) -> None:
+        for exporter in self.exporters:
+            exporter.close()
+
+    def __export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                # tracing must not break requests
+                _logger.exception(f'Failed to export span {span.name}')
+
+
+# for traces that were not sampled, this returns a placeholder that is never exported (see `Span.sampled`),
+#  which can still be passed as `parent`
+def current_span() -> Optional[Span]:
+    current = _current.get()
+    return current[1] if current is not None else None
+
+
+# starts a child span of the current span (using the same tracer), does nothing if there is no active span;
+#  used for instrumenting code that doesn't have access to the tracer
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+    with current[0].span(name, **attributes) as s:
+        yield s
+
+
+def set_attributes(**attributes: Any) -> None:
+    current = _current.get()
+    if current is not None and current[1].sampled:
+        current[1].attributes.update(attributes)
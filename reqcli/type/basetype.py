@@ -1,8 +1,11 @@
 import io
+import copy
+import threading
+import dataclasses
 import lxml.objectify
 from abc import ABC, abstractmethod
 from construct import Construct
-from typing import Optional, Tuple, Type, TypeVar, Dict, Any, BinaryIO
+from typing import Callable, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple, Type, TypeVar, Dict, Any, BinaryIO
 
 from .config import TypeLoadConfig
 from .. import reader, utils
@@ -60,6 +63,16 @@ class BaseTypeLoadableConstruct(BaseTypeLoadable):
             **config.construct_kwargs
         )
 
+    # parses directly from the reader without reading the entire body into memory first.
+    # note: `Lazy` fields seek back into the stream when evaluated, which requires a seekable
+    #  reader that is still open (i.e. they must be evaluated inside `_read`); non-seekable readers
+    #  only support skipping over them
+    def _parse_construct_stream(self, reader: reader.Reader, config: TypeLoadConfig) -> Construct:
+        return self.__struct.parse_stream(
+            reader,
+            **config.construct_kwargs
+        )
+
 
 _TXml = TypeVar('_TXml', bound='XmlBaseType')
 
@@ -74,11 +87,229 @@ class XmlBaseType(ABC):
     def _get_schema(cls) -> Optional[Tuple[utils.xml.SchemaType, bool]]:
         return None
 
+    # optional, enables parsing individual fields in lazy mode (see `_parse`)
+    @classmethod
+    def _get_field_parsers(cls) -> Optional[Dict[str, Callable[[lxml.objectify.ObjectifiedElement], Any]]]:
+        return None
+
+    # if `lazy` is true, fields are only parsed when they're first accessed (using `_get_field_parsers`,
+    #  or `_parse_internal` for all fields at once otherwise), and the element is dropped afterwards;
+    #  lazy instances are instances of a generated subclass until all fields are materialized.
+    # if `detach` is true, lazy instances keep a copy of their element instead of a reference
+    #  into the source document, which allows freeing the document at the cost of copying
     @classmethod
-    def _parse(cls: Type[_TXml], xml: lxml.objectify.ObjectifiedElement) -> _TXml:
+    def _parse(cls: Type[_TXml], xml: lxml.objectify.ObjectifiedElement, *, lazy: bool = False, detach: bool = False) -> _TXml:
         schema_tup = cls._get_schema()
         if schema_tup is not None:
             schema, superset = schema_tup
             utils.xml.validate_schema(xml, schema, superset)
 
+        if lazy:
+            return _create_lazy(cls, xml, detach)
         return cls(**cls._parse_internal(xml))  # type: ignore  # https://github.com/python/mypy/issues/5374
+
+    @classmethod
+    def _parse_many(cls: Type[_TXml], elements: Iterable[lxml.objectify.ObjectifiedElement], *, lazy: bool = False, detach: bool = False) -> List[_TXml]:
+        schema_tup = cls._get_schema()
+        validated: Set[Optional[Hashable]] = set()
+        if lazy:
+            construct = lambda xml: _create_lazy(cls, xml, detach)  # noqa: E731
+        else:
+            construct_fast = _get_constructor(cls)
+            construct = lambda xml: construct_fast(cls._parse_internal(xml))  # noqa: E731
+
+        result = []
+        for xml in elements:
+            # only validate each distinct structure once
+            if schema_tup is not None:
+                signature = utils.xml.get_tag_signature(xml)
+                if signature not in validated:
+                    utils.xml.validate_schema(xml, *schema_tup)
+                    validated.add(signature)
+            result.append(construct(xml))
+        return result
+
+
+def _get_constructor(cls: Type[_TXml]) -> Callable[[Dict[str, Any]], _TXml]:
+    # stored on the class itself, ignoring inherited values
+    constructor = cls.__dict__.get('_xml_constructor')
+    if constructor is not None:
+        return constructor
+
+    constructor = lambda kwargs: cls(**kwargs)  # type: ignore  # noqa: E731
+    # dataclasses with generated `__init__` (and without any additional initialization) can be
+    #  created by setting attributes directly, which is significantly faster for frozen dataclasses;
+    #  not applicable if there are fields with `init=False`, which are set by `__init__` as well.
+    # note: dataclasses that define their own `__init__` have to use `@dataclass(init=False)`
+    if dataclasses.is_dataclass(cls) \
+            and _has_generated_init(cls) \
+            and not hasattr(cls, '__post_init__') \
+            and '__slots__' not in cls.__dict__ \
+            and all(f.init for f in dataclasses.fields(cls)):
+        field_names = {f.name for f in dataclasses.fields(cls)}
+        new = object.__new__
+
+        def fast_constructor(kwargs: Dict[str, Any]) -> _TXml:
+            # fall back to regular constructor if not all fields were provided, to handle defaults/errors correctly
+            if kwargs.keys() != field_names:
+                return cls(**kwargs)  # type: ignore
+            inst = new(cls)
+            inst.__dict__.update(kwargs)
+            return inst
+        constructor = fast_constructor
+
+    setattr(cls, '_xml_constructor', constructor)
+    return constructor
+
+
+# true if `__init__` was generated by `dataclasses`, i.e. it's defined by a dataclass with `init=True`
+#  instead of a subclass
+def _has_generated_init(cls: type) -> bool:
+    owner = next(c for c in cls.__mro__ if '__init__' in c.__dict__)
+    params = owner.__dict__.get('__dataclass_params__')
+    return params is not None and params.init
+
+
+def _constant(value: Any) -> Callable[[], Any]:
+    return lambda: value
+
+
+class _LazyField:
+    __slots__ = ('name', 'default')
+
+    def __init__(self, name: str, default: Any):
+        self.name = name
+        self.default = default
+
+    # non-data descriptor, i.e. only called if the value isn't in the instance's `__dict__` yet
+    def __get__(self, inst: Any, owner: type) -> Any:
+        if inst is None:
+            if self.default is dataclasses.MISSING:
+                raise AttributeError(self.name)
+            return self.default
+        return _materialize(inst, self.name, owner._xml_lazy_info)  # type: ignore
+
+
+class _LazyInfo:
+    __slots__ = ('cls', 'fields', 'parsers', 'defaults', 'lock')
+
+    def __init__(self, cls: type, fields: FrozenSet[str], parsers: Optional[Dict[str, Callable[[Any], Any]]], defaults: Dict[str, Callable[[], Any]]):
+        self.cls = cls
+        self.fields = fields
+        self.parsers = parsers
+        self.defaults = defaults
+        self.lock = threading.Lock()
+
+
+# lazy instances are created as instances of a subclass which contains the descriptors for lazy fields, leaving
+#  the original class untouched; instances are switched to the original class once all fields are materialized
+def _get_lazy_class(cls: type) -> type:
+    lazy_cls = cls.__dict__.get('_xml_lazy_class')
+    if lazy_cls is not None:
+        return lazy_cls
+    assert '__slots__' not in cls.__dict__, 'lazy parsing requires instances with `__dict__`'
+
+    parsers = cls._get_field_parsers()  # type: ignore
+    defaults: Dict[str, Callable[[], Any]] = {}
+    if dataclasses.is_dataclass(cls):
+        names = []
+        for f in dataclasses.fields(cls):
+            if not f.init:
+                continue
+            names.append(f.name)
+            if f.default is not dataclasses.MISSING:
+                defaults[f.name] = _constant(f.default)
+            elif f.default_factory is not dataclasses.MISSING:  # type: ignore
+                defaults[f.name] = f.default_factory  # type: ignore
+    else:
+        assert parsers is not None, 'lazy parsing of non-dataclass types requires `_get_field_parsers`'
+        names = list(parsers)
+    if parsers is not None:
+        # fields without parser only use their default values
+        missing = [n for n in names if n not in parsers and n not in defaults]
+        if missing:
+            raise TypeError(f'{cls.__name__} has no parser or default value for required fields {missing}')
+        names = [n for n in names if n in parsers]
+
+    attrs: Dict[str, Any] = {name: _LazyField(name, getattr(cls, name, dataclasses.MISSING)) for name in names}
+    attrs.update(
+        __module__=cls.__module__,
+        __qualname__=cls.__qualname__,
+        __eq__=_lazy_eq,
+        __hash__=cls.__hash__,
+        __reduce_ex__=_lazy_reduce_ex,
+        _xml_lazy_info=_LazyInfo(cls, frozenset(names), parsers, defaults)
+    )
+    lazy_cls = type(cls)(cls.__name__, (cls,), attrs)
+    setattr(cls, '_xml_lazy_class', lazy_cls)
+    return lazy_cls
+
+
+def _create_lazy(cls: Type[_TXml], xml: lxml.objectify.ObjectifiedElement, detach: bool) -> _TXml:
+    lazy_cls = _get_lazy_class(cls)
+    info: _LazyInfo = lazy_cls._xml_lazy_info  # type: ignore
+    inst: _TXml = object.__new__(lazy_cls if info.fields else cls)
+    d = inst.__dict__
+    # set defaults of fields that aren't parsed lazily
+    for name, default in info.defaults.items():
+        if name not in info.fields:
+            d[name] = default()
+    if not info.fields:
+        return inst
+    d['_xml_element'] = copy.copy(xml) if detach else xml
+    d['_xml_pending'] = set(info.fields)
+    return inst
+
+
+def _materialize(inst: Any, name: str, info: _LazyInfo) -> Any:
+    d = inst.__dict__
+    with info.lock:
+        if name in d:
+            # materialized by another thread in the meantime
+            return d[name]
+        pending: Optional[Set[str]] = d.get('_xml_pending')
+        if not pending or name not in pending:
+            raise AttributeError(name)
+
+        xml = d['_xml_element']
+        if info.parsers is not None:
+            d[name] = info.parsers[name](xml)
+            pending.discard(name)
+        else:
+            # parse all fields at once, use defaults for missing ones
+            values = info.cls._parse_internal(xml)  # type: ignore
+            for n in pending:
+                if n in values:
+                    d[n] = values[n]
+                elif n in info.defaults:
+                    d[n] = info.defaults[n]()
+                else:
+                    raise TypeError(f'{info.cls.__name__}._parse_internal did not return a value for required field {n!r}')
+            pending.clear()
+
+        if not pending:
+            # fully materialized, drop reference to element
+            del d['_xml_element'], d['_xml_pending']
+            object.__setattr__(inst, '__class__', info.cls)
+        return d[name]
+
+
+def _materialize_all(inst: Any) -> None:
+    info: Optional[_LazyInfo] = getattr(type(inst), '_xml_lazy_info', None)
+    if info is None:
+        return  # materialized by another thread in the meantime
+    with info.lock:
+        names = list(inst.__dict__.get('_xml_pending', ()))
+    for name in names:
+        getattr(inst, name)
+
+
+# compared (and pickled/copied) as instances of the original class
+def _lazy_eq(self: Any, other: Any) -> Any:
+    _materialize_all(self)
+    return self == other
+
+
+def _lazy_reduce_ex(self: Any, protocol: Any) -> Any:
+    _materialize_all(self)
+    return self.__reduce_ex__(protocol)
@@ -0,0 +1,51 @@
+import os
+import shutil
+import logging
+import tempfile
+from concurrent.futures import Executor, Future
+from typing import Optional, TypeVar
+
+from .basetype import BaseTypeLoadable
+from .config import TypeLoadConfig
+from .. import reader
+
+
+_T = TypeVar('_T', bound=BaseTypeLoadable)
+
+# bodies larger than this are passed to workers through a temporary file instead of being pickled
+INLINE_MAX_SIZE = 256 * 1024
+# use in-memory filesystem if available
+_temp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+_logger = logging.getLogger(__name__)
+
+
+def _load(loadable: _T, data: Optional[bytes], path: Optional[str], config: TypeLoadConfig) -> _T:
+    if path is not None:
+        return loadable.load_file(path, config)
+    assert data is not None
+    return loadable.load_bytes(data, config)
+
+
+# note: the future's result is a copy of `loadable` that was loaded in the executor,
+#  the original instance is not modified
+def load_offloaded(executor: Executor, loadable: _T, reader: reader.Reader, config: TypeLoadConfig) -> 'Future[_T]':
+    data = reader.read(INLINE_MAX_SIZE + 1)
+    if len(data) <= INLINE_MAX_SIZE:
+        return executor.submit(_load, loadable, data, None, config)
+
+    # write remaining data to temporary file without buffering the entire body in memory
+    fd, path = tempfile.mkstemp(dir=_temp_dir, prefix='reqcli-', suffix='.body')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            del data
+            shutil.copyfileobj(reader, f)  # type: ignore  # `Reader` implements `read`
+        _logger.debug(f'Passing body to executor through {path!r}')
+        future = executor.submit(_load, loadable, None, path, config)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    future.add_done_callback(lambda _: os.remove(path))
+    return future
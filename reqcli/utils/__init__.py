@@ -1 +1 @@
-from . import dicts, typing, xml
+from . import decoding, dicts, dns, pools, tls, typing, xml
@@ -0,0 +1,221 @@
+import zlib
+import urllib3.response
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Callable, List, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None  # type: ignore[assignment]
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+
+class Decoder(ABC):
+    # returns at most `max_length` decoded bytes (unlimited if 0); input that couldn't be decoded within
+    #  the limit is kept and decoded by subsequent calls, which can pass empty data for that
+    @abstractmethod
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        pass
+
+    # returns remaining output at the end of the stream, after `decompress` returned empty data
+    def flush(self) -> bytes:
+        return b''
+
+
+class _GzipDecoder(Decoder):
+    def __init__(self):
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        result = b''
+        while True:
+            obj = self._obj
+            if obj.eof:
+                # handle concatenated members, same as urllib3
+                data = obj.unused_data + data
+                if not data:
+                    return result
+                obj = self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            result += obj.decompress(obj.unconsumed_tail + data, max_length - len(result) if max_length else 0)
+            data = b''
+            if not obj.eof or (max_length and len(result) >= max_length):
+                return result
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _DeflateDecoder(Decoder):
+    def __init__(self):
+        self._obj = zlib.decompressobj()
+        self._first = True
+        self._data = b''  # input until the first output, for retrying as raw deflate stream
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        if not self._first:
+            return self._obj.decompress(self._obj.unconsumed_tail + data, max_length)
+        # some servers send raw deflate streams without zlib header; same as urllib3, previous
+        #  input is already buffered by the decompressor, so only new data is passed to it
+        self._data += data
+        try:
+            result = self._obj.decompress(data, max_length)
+            if result:
+                self._first = False
+                self._data = b''
+            return result
+        except zlib.error:
+            self._first = False
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            data, self._data = self._data, b''
+            return self._obj.decompress(data, max_length)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliDecoder(Decoder):
+    def __init__(self):
+        self._obj = brotli.Decompressor()
+        self._input = b''  # input that wasn't passed to the decompressor yet
+        self._output = b''  # output beyond the limit, the decompressor doesn't stop exactly at the limit
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        self._input += data
+        result = self._output
+        if not result:
+            # remaining output of previous input has to be returned before passing more input
+            if not self._obj.can_accept_more_data():
+                result = self.__process(b'', max_length)
+            if not result and self._input:
+                data, self._input = self._input, b''
+                result = self.__process(data, max_length)
+        if max_length:
+            result, self._output = result[:max_length], result[max_length:]
+        else:
+            self._output = b''
+        return result
+
+    def __process(self, data: bytes, max_length: int) -> bytes:
+        return self._obj.process(data, output_buffer_limit=max_length) if max_length else self._obj.process(data)
+
+
+class _ZstdNeedsInput(Exception):
+    pass
+
+
+class _ZstdInput:
+    def __init__(self):
+        self.data = bytearray()
+        self.eof = False
+
+    def read(self, n: int) -> bytes:
+        if not self.data:
+            if self.eof:
+                return b''
+            # an empty result would end the stream
+            raise _ZstdNeedsInput
+        result = bytes(self.data[:n])
+        del self.data[:n]
+        return result
+
+
+# zstandard's decompression objects can't limit their output, so its stream reader is used instead, pulling
+#  input from `_ZstdInput`; reads are interrupted once the input runs out, which only happens before any output was produced
+class _ZstdDecoder(Decoder):
+    def __init__(self):
+        self._input = _ZstdInput()
+        self._reader = zstandard.ZstdDecompressor().stream_reader(self._input, read_across_frames=True)
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        self._input.data += data
+        parts = []
+        try:
+            while True:
+                parts.append(self._reader.read1(max_length or -1))
+                if not parts[-1] or max_length:
+                    break
+        except _ZstdNeedsInput:
+            pass
+        return b''.join(parts)
+
+    def flush(self) -> bytes:
+        # output of the last block might still be buffered
+        self._input.eof = True
+        return self._reader.read()
+
+
+class _MultiDecoder(Decoder):
+    # size of intermediate chunks passed between decoders
+    chunk_size = 64 * 1024
+
+    # encodings are applied in order, decoding happens in reverse order
+    def __init__(self, decoders: List[Decoder]):
+        self._decoders = decoders
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        return self.__decompress(len(self._decoders) - 1, data, max_length)
+
+    # returns output of the decoder at `index`, `data` is passed to the first decoder
+    def __decompress(self, index: int, data: bytes, max_length: int) -> bytes:
+        decoder = self._decoders[index]
+        if index == 0:
+            return decoder.decompress(data, max_length)
+        while True:
+            result = decoder.decompress(b'', max_length)
+            if result:
+                return result
+            inner = self.__decompress(index - 1, data, self.chunk_size)
+            data = b''
+            if not inner:
+                return b''
+            result = decoder.decompress(inner, max_length)
+            if result:
+                return result
+
+    def flush(self) -> bytes:
+        data = b''
+        for decoder in self._decoders:
+            data = decoder.decompress(data) + decoder.flush()
+        return data
+
+
+_DECODERS: Dict[str, Callable[[], Decoder]] = {
+    'gzip': _GzipDecoder,
+    'x-gzip': _GzipDecoder,
+    'deflate': _DeflateDecoder,
+}
+if brotli is not None:
+    _DECODERS['br'] = _BrotliDecoder
+if zstandard is not None:
+    _DECODERS['zstd'] = _ZstdDecoder
+
+
+def _get_urllib3_encodings() -> List[str]:
+    encodings: Any = urllib3.response.HTTPResponse.CONTENT_DECODERS
+    return list(encodings)
+
+
+# encodings are only advertised if urllib3 supports them as well, since responses are
+#  also decoded by urllib3 when they're not read through a `ResponseReader` (e.g. `Response.content`, or when caching)
+ACCEPT_ENCODING = ', '.join(e for e in ('gzip', 'deflate', 'br', 'zstd') if e in _DECODERS and e in _get_urllib3_encodings())
+
+# used instead of `ACCEPT_ENCODING` for cache keys, since the latter depends on installed packages; cached
+#  bodies are stored decoded, so cache entries (and snapshots) are valid regardless of the negotiated encoding
+CACHE_KEY_ACCEPT_ENCODING = 'gzip, deflate'
+
+
+# returns `None` if there's nothing to decode, raises `ValueError` if an encoding is not supported
+def get_decoder(content_encoding: Optional[str]) -> Optional[Decoder]:
+    encodings = [e.strip() for e in (content_encoding or '').lower().split(',')]
+    encodings = [e for e in encodings if e and e != 'identity']
+    if not encodings:
+        return None
+    for e in encodings:
+        if e not in _DECODERS:
+            raise ValueError(f'unsupported content encoding: {e!r}')
+    decoders = [_DECODERS[e]() for e in reversed(encodings)]
+    return decoders[0] if len(decoders) == 1 else _MultiDecoder(decoders)
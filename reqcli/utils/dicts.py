@@ -1,4 +1,8 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Mapping, Optional, TypeVar
+
+
+_KT = TypeVar('_KT')
+_VT = TypeVar('_VT')
 
 
 def is_dict_subset_deep(a: Optional[Dict[Any, Any]], b: Optional[Dict[Any, Any]]) -> bool:
@@ -21,3 +25,39 @@ def is_dict_subset_deep(a: Optional[Dict[Any, Any]], b: Optional[Dict[Any, Any]]
     except KeyError:
         return False
     return True
+
+
+class FrozenDict(Mapping[_KT, _VT]):
+    __slots__ = ('_dict', '_hash')
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._dict: Dict[_KT, _VT] = dict(*args, **kwargs)
+        self._hash: Optional[int] = None
+
+    def __getitem__(self, key: _KT) -> _VT:
+        return self._dict[key]
+
+    def __iter__(self) -> Iterator[_KT]:
+        return iter(self._dict)
+
+    def __len__(self) -> int:
+        return len(self._dict)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._dict
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, FrozenDict):
+            other = other._dict
+        return self._dict == other
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            self._hash = hash(frozenset(self._dict.items()))
+        return self._hash
+
+    def __repr__(self) -> str:
+        return repr(self._dict)
+
+    def __reduce__(self) -> Any:
+        return (type(self), (self._dict,))
@@ -0,0 +1,118 @@
+import time
+import socket
+import threading
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family, _set_socket_options  # type: ignore
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+_AddrInfo = Tuple[Any, ...]
+_SocketOptions = List[Tuple[int, int, Union[int, bytes]]]
+
+
+class DnsCache:
+    def __init__(self, ttl: float, *, max_entries: int = 1024):
+        assert ttl > 0 and max_entries > 0
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, int, int], Tuple[float, List[_AddrInfo]]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int, family: int = socket.AF_UNSPEC) -> List[_AddrInfo]:
+        key = (host, port, family)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        # resolve without holding the lock, concurrent lookups for the same host are harmless
+        result = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self.__prune(now)
+            self._entries[key] = (now + self.ttl, result)
+        return result
+
+    def invalidate(self, host: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == host]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    # same as `urllib3.util.connection.create_connection`, but using cached addresses
+    def create_connection(
+        self,
+        address: Tuple[str, int],
+        timeout: Any = socket._GLOBAL_DEFAULT_TIMEOUT,  # type: ignore
+        source_address: Optional[Tuple[str, int]] = None,
+        socket_options: Optional[_SocketOptions] = None
+    ) -> socket.socket:
+        host, port = address
+        if host.startswith('['):
+            host = host.strip('[]')
+
+        err: Optional[OSError] = None
+        for af, socktype, proto, _, sa in self.resolve(host, port, allowed_gai_family()):
+            sock = None
+            try:
+                sock = socket.socket(af, socktype, proto)
+                _set_socket_options(sock, socket_options)
+                if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:  # type: ignore
+                    sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sa)
+                return sock
+            except OSError as e:
+                err = e
+                if sock is not None:
+                    sock.close()
+
+        # addresses might have changed
+        self.invalidate(host)
+        if err is not None:
+            raise err
+        raise OSError('getaddrinfo returns an empty list')
+
+    def __prune(self, now: float) -> None:
+        for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        # still full, drop oldest entries
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+
+class _DnsCacheConnectionMixin:
+    dns_cache: DnsCache
+
+    _dns_host: str
+    host: str
+    port: int
+    timeout: Any
+    source_address: Optional[Tuple[str, int]]
+    socket_options: Optional[_SocketOptions]
+
+    # same as `urllib3.connection.HTTPConnection._new_conn`
+    def _new_conn(self) -> socket.socket:
+        try:
+            return self.dns_cache.create_connection((self._dns_host, self.port), self.timeout, self.source_address, self.socket_options)
+        except socket.timeout:
+            raise ConnectTimeoutError(self, f'Connection to {self.host} timed out. (connect timeout={self.timeout})')
+        except OSError as e:
+            raise NewConnectionError(self, f'Failed to establish a new connection: {e}')  # type: ignore[arg-type]  # always mixed into `HTTPConnection`
+
+
+# caches are shared per TTL, similar to ratelimits
+_caches: Dict[float, DnsCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_dns_cache(ttl: float) -> DnsCache:
+    with _caches_lock:
+        cache = _caches.get(ttl)
+        if cache is None:
+            cache = _caches[ttl] = DnsCache(ttl)
+        return cache
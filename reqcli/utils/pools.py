@@ -0,0 +1,39 @@
+import functools
+import urllib3.connection
+import urllib3.connectionpool
+from typing import Dict, List, Optional
+
+from .dns import DnsCache, _DnsCacheConnectionMixin
+from .. import tracing
+
+
+class _TracedConnectionMixin:
+    host: str
+    port: int
+
+    # includes the TLS handshake for HTTPS connections
+    def connect(self) -> None:
+        with tracing.span('reqcli.connect', host=self.host, port=self.port, tls=isinstance(self, urllib3.connection.HTTPSConnection)):
+            super().connect()  # type: ignore
+
+    def _new_conn(self) -> object:
+        with tracing.span('reqcli.tcp_connect'):
+            return super()._new_conn()  # type: ignore
+
+
+# returns connection pool classes (by scheme) for `PoolManager.pool_classes_by_scheme`
+@functools.lru_cache(maxsize=None)
+def get_pool_classes(dns_cache: Optional[DnsCache] = None, traced: bool = False) -> Dict[str, type]:
+    mixins: List[type] = []
+    attrs = {}
+    if traced:
+        mixins.append(_TracedConnectionMixin)
+    if dns_cache is not None:
+        mixins.append(_DnsCacheConnectionMixin)
+        attrs['dns_cache'] = dns_cache
+    http_conn = type('HTTPConnection', (*mixins, urllib3.connection.HTTPConnection), attrs)
+    https_conn = type('HTTPSConnection', (*mixins, urllib3.connection.HTTPSConnection), attrs)
+    return {
+        'http': type('HTTPConnectionPool', (urllib3.connectionpool.HTTPConnectionPool,), {'ConnectionCls': http_conn}),
+        'https': type('HTTPSConnectionPool', (urllib3.connectionpool.HTTPSConnectionPool,), {'ConnectionCls': https_conn})
+    }
@@ -0,0 +1,158 @@
+import ssl
+import socket
+import threading
+import urllib3
+import collections
+from dataclasses import dataclass
+from urllib3.util.ssl_ import create_urllib3_context
+from urllib3.util.wait import wait_for_read
+from typing import Any, Dict, Optional, Tuple
+
+
+_SessionKey = Tuple[str, int, ssl.VerifyMode]
+
+
+@dataclass(frozen=True)
+class TlsSessionStats:
+    full_handshakes: int
+    resumed_handshakes: int
+    cached_sessions: int
+
+
+class TlsSessionCache:
+    def __init__(self, max_sessions: int = 256):
+        assert max_sessions > 0
+        self.max_sessions = max_sessions
+        self._sessions: 'collections.OrderedDict[_SessionKey, ssl.SSLSession]' = collections.OrderedDict()
+        self._full = 0
+        self._resumed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> TlsSessionStats:
+        with self._lock:
+            return TlsSessionStats(self._full, self._resumed, len(self._sessions))
+
+    def get(self, key: _SessionKey) -> Optional[ssl.SSLSession]:
+        with self._lock:
+            return self._sessions.get(key)
+
+    def put(self, key: _SessionKey, session: ssl.SSLSession) -> None:
+        with self._lock:
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def _record_handshake(self, resumed: bool) -> None:
+        with self._lock:
+            if resumed:
+                self._resumed += 1
+            else:
+                self._full += 1
+
+
+class _ResumingSSLSocket(ssl.SSLSocket):
+    _session_cache: Optional[TlsSessionCache]
+    _session_key: Optional[_SessionKey]
+
+    # called by `SSLContext.wrap_socket`
+    @classmethod
+    def _create(  # type: ignore[override]
+        cls,
+        sock: socket.socket,
+        server_side: bool = False,
+        *args: Any,
+        server_hostname: Optional[str] = None,
+        context: Optional[ssl.SSLContext] = None,
+        session: Optional[ssl.SSLSession] = None,
+        **kwargs: Any
+    ) -> '_ResumingSSLSocket':
+        cache: Optional[TlsSessionCache] = getattr(context, 'session_cache', None)
+        key = None
+        if cache is not None and not server_side and server_hostname:
+            try:
+                # sessions established without verification must not be used for verified connections
+                key = (server_hostname, sock.getpeername()[1], context.verify_mode)  # type: ignore
+            except OSError:  # pragma: no cover
+                pass
+            if session is None and key is not None:
+                session = cache.get(key)
+
+        self = super()._create(sock, server_side, *args, server_hostname=server_hostname, context=context, session=session, **kwargs)  # type: ignore
+        self._session_cache = cache if key is not None else None
+        self._session_key = key
+        if self._session_cache is not None:
+            self._session_cache._record_handshake(self.session_reused)
+        return self
+
+    # sessions are stored after the first read, i.e. once the certificate was checked (e.g. by `assert_fingerprint`)
+    #  and TLS 1.3 session tickets (which are sent after the handshake) were received
+    def recv_into(self, buffer: Any, nbytes: Optional[int] = None, flags: int = 0) -> int:
+        n = super().recv_into(buffer, nbytes, flags)  # type: ignore
+        if self._session_key is not None:
+            session = self.session
+            if session is not None and (session.has_ticket or self.version() != 'TLSv1.3'):
+                self._session_cache.put(self._session_key, session)  # type: ignore
+                self._session_key = None
+        return n
+
+
+# returns a context that reuses TLS sessions across connections to the same host, same settings as urllib3 otherwise;
+#  sessions can only be resumed using the context that created them, so it must be shared between connections
+def create_resuming_context(cache: Optional[TlsSessionCache] = None) -> ssl.SSLContext:
+    context = create_urllib3_context()
+    # urllib3 disables session tickets by default
+    context.options &= ~ssl.OP_NO_TICKET
+    context.sslsocket_class = _ResumingSSLSocket
+    context.session_cache = cache or TlsSessionCache()  # type: ignore
+    return context
+
+
+# makes HTTPS pools of the pool manager use resuming contexts (see above), one per host, all using the same cache;
+#  contexts are modified by connections (e.g. CA certs, client certificates), so sharing one between hosts would
+#  apply settings of one host to the others. contexts are kept when pools are recreated, to resume their sessions
+def use_resuming_contexts(poolmanager: urllib3.PoolManager, cache: TlsSessionCache) -> None:
+    orig_new_pool = poolmanager._new_pool  # type: ignore[attr-defined]
+    contexts: Dict[Tuple[str, int], ssl.SSLContext] = {}
+    lock = threading.Lock()
+
+    def new_pool(scheme: str, host: str, port: int, request_context: Optional[Dict[str, Any]] = None) -> Any:
+        if scheme == 'https':
+            with lock:
+                context = contexts.get((host, port))
+                if context is None:
+                    context = contexts[(host, port)] = create_resuming_context(cache)
+            request_context = dict(request_context if request_context is not None else poolmanager.connection_pool_kw)
+            request_context['ssl_context'] = context
+        return orig_new_pool(scheme, host, port, request_context)
+    poolmanager._new_pool = new_pool  # type: ignore[attr-defined]
+
+
+# TLS 1.3 session tickets are sent after the handshake, which makes idle connections readable and causes urllib3 to
+#  consider them dropped. this processes pending messages without blocking on application data, returns `False`
+#  if the connection was closed or unexpected data was received
+def process_post_handshake_messages(sock: ssl.SSLSocket, timeout: float = 0.1) -> bool:
+    if sock.version() != 'TLSv1.3':
+        return True
+    orig_timeout = sock.gettimeout()
+    buf = bytearray(1)
+    try:
+        wait_timeout = timeout
+        while wait_for_read(sock, timeout=wait_timeout):
+            sock.setblocking(False)
+            try:
+                sock.recv_into(buf)
+                # connection was closed, or unexpected data was received before sending a request
+                return False
+            except ssl.SSLWantReadError:
+                pass
+            # remaining tickets are usually sent at the same time
+            wait_timeout = 0.01
+    finally:
+        sock.settimeout(orig_timeout)
+    return True
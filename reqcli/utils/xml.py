@@ -1,5 +1,7 @@
+import threading
+import lxml.etree
 import lxml.objectify
-from typing import Any, BinaryIO, Tuple, Set, Dict, Optional, Iterator
+from typing import Any, BinaryIO, Hashable, Tuple, Set, Dict, Optional, Iterator
 
 from . import dicts
 from ..errors import XmlLoadError, XmlSchemaError
@@ -8,12 +10,28 @@ from ..errors import XmlLoadError, XmlSchemaError
 SchemaType = Dict[str, Any]  # needs `Any` type since there's no support for self-recursive types (yet)
 
 
-def read_object(stream: BinaryIO) -> lxml.objectify.ObjectifiedElement:
-    return lxml.objectify.parse(stream).getroot()
+_local = threading.local()
 
 
-def load_root(stream: BinaryIO, root_tag: Optional[str] = None) -> lxml.objectify.ObjectifiedElement:
-    tree = read_object(stream)
+# returns a reusable parser for the current thread (parsers can't be shared between threads),
+#  which is significantly faster than the default objectify parser for large documents.
+# note: this skips objectify's type guessing, i.e. leaf elements are not converted to
+#  data elements (`IntElement`, `StringElement`, ...); use `.text` to get their values
+def get_parser() -> lxml.etree.XMLParser:
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = lxml.etree.XMLParser(remove_blank_text=True, remove_comments=True)
+        parser.set_element_class_lookup(lxml.etree.ElementDefaultClassLookup(element=lxml.objectify.ObjectifiedElement))
+        _local.parser = parser
+    return parser
+
+
+def read_object(stream: BinaryIO, parser: Optional[lxml.etree.XMLParser] = None) -> lxml.objectify.ObjectifiedElement:
+    return lxml.objectify.parse(stream, parser).getroot()
+
+
+def load_root(stream: BinaryIO, root_tag: Optional[str] = None, parser: Optional[lxml.etree.XMLParser] = None) -> lxml.objectify.ObjectifiedElement:
+    tree = read_object(stream, parser)
     children = tree.getchildren()
     if len(children) != 1:
         raise XmlLoadError(f'expected xml to have 1 child, found {len(children)}')
@@ -43,6 +61,14 @@ def get_tag_schema(xml: lxml.objectify.ObjectifiedElement) -> Optional[SchemaTyp
     return d
 
 
+# similar to `get_tag_schema`, but hashable and without merging repeated tags
+def get_tag_signature(xml: lxml.objectify.ObjectifiedElement) -> Optional[Hashable]:
+    children = xml.getchildren()
+    if not children:
+        return None
+    return tuple([(c.tag, get_tag_signature(c)) for c in children])
+
+
 def validate_schema(xml: lxml.objectify.ObjectifiedElement, target_hierarchy: Optional[SchemaType], superset: bool) -> None:
     h = get_tag_schema(xml)
     if (not superset and target_hierarchy != h) or (superset and not dicts.is_dict_subset_deep(h, target_hierarchy)):
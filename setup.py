@@ -20,7 +20,8 @@ setup(
     packages=find_packages(exclude=['tests*']),
     install_requires=read('requirements.txt').splitlines(),
     extras_require={
-        'dev': ['pytest', 'pytest-cov', 'requests-mock']
+        'dev': ['pytest', 'pytest-cov', 'requests-mock'],
+        'compression': ['brotli', 'zstandard']
     },
     python_requires='>=3.7',
     classifiers=[
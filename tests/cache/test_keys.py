@@ -0,0 +1,80 @@
+import pytest
+import requests
+
+from reqcli.cache import CacheKeyRules, CacheKeyStatsRecorder
+from reqcli.source import SourceConfig, ReqData
+
+from ..conftest import MOCK_BASE, _get_source
+
+
+def _prepare(url, headers=None):
+    return requests.Request('GET', url, headers=headers).prepare()
+
+
+@pytest.mark.parametrize('rules, url, expected_url', [
+    (CacheKeyRules(), 'http://test/p?b=1&a=2', 'http://test/p?a=2&b=1'),
+    (CacheKeyRules(sort_params=False), 'http://test/p?b=1&a=2', 'http://test/p?b=1&a=2'),
+    (CacheKeyRules(ignored_params={'ts', 'nonce'}), 'http://test/p?ts=1&a=2&nonce=x', 'http://test/p?a=2'),
+    (CacheKeyRules(ignored_params={'ts'}), 'http://test/p?ts=1', 'http://test/p'),
+    (CacheKeyRules(ignored_params={'TS'}, casefold_params=True), 'http://test/p?ts=1&A=B', 'http://test/p?a=b'),
+    (CacheKeyRules(), 'http://test/p?a=&b=1', 'http://test/p?a=&b=1'),
+])
+def test_rules__params(rules, url, expected_url):
+    request = _prepare(url)
+    assert rules.normalize(request).url == expected_url
+    # original request should not be modified
+    assert request.url == url
+
+
+@pytest.mark.parametrize('rules, expected_headers', [
+    (CacheKeyRules(), {'A': '1', 'B': '2', 'C': '3'}),
+    (CacheKeyRules(ignored_headers={'a', 'C'}), {'B': '2'}),
+    (CacheKeyRules(included_headers={'b'}), {'B': '2'}),
+    (CacheKeyRules(ignored_headers={'b'}, included_headers={'a', 'b'}), {'A': '1'}),
+])
+def test_rules__headers(rules, expected_headers):
+    request = _prepare('http://test/', {'A': '1', 'B': '2', 'C': '3'})
+    assert dict(rules.normalize(request).headers) == expected_headers
+
+
+def test_stats_recorder():
+    recorder = CacheKeyStatsRecorder()
+    for raw_key, key in [('a', 'x'), ('b', 'x'), ('a', 'x'), ('c', 'y')]:
+        recorder.record(raw_key, key)
+    stats = recorder.stats
+    assert stats.requests == 4
+    assert stats.distinct_raw_keys == 3
+    assert stats.distinct_keys == 2
+    assert stats.collapsed_keys == 1
+
+
+@pytest.mark.parametrize('soft_ttl', (None, 3600))
+@pytest.mark.parametrize('use_rules', (True, False))
+def test_source(requests_mock, use_rules, soft_ttl):
+    requests_mock.get(MOCK_BASE + 'path', text='response')
+    rules = CacheKeyRules(ignored_params={'ts'}, ignored_headers={'X-Request-Id'}) if use_rules else None
+    # cache hits are returned without going through requests-cache if a soft ttl is set
+    source = _get_source(SourceConfig(cache_key_rules=rules, cache_key_stats=True, cache_soft_ttl=soft_ttl))
+
+    results = [
+        source.get(ReqData(path='path', params={'a': 1, 'ts': i}, headers={'X-Request-Id': str(i)})).from_cache  # type: ignore
+        for i in range(3)
+    ]
+    # equivalent requests should hit the cache if rules are used
+    assert results == ([False, True, True] if use_rules else [False, False, False])
+    assert requests_mock.call_count == (1 if use_rules else 3)
+
+    stats = source.cache_key_stats
+    assert stats is not None
+    # recorded once per request
+    assert stats.requests == 3
+    assert stats.distinct_raw_keys == 3
+    assert stats.collapsed_keys == (2 if use_rules else 0)
+
+    # internal cache lookups are not counted
+    assert source.warm_cache([ReqData(path='path', params={'a': 1, 'ts': 0}, headers={'X-Request-Id': '0'})]).fetched == 0
+    assert source.cache_key_stats == stats
+
+
+def test_source__no_stats():
+    assert _get_source(None).cache_key_stats is None
@@ -0,0 +1,158 @@
+import io
+import os
+import datetime
+import pytest
+
+from reqcli.cache import maintenance
+from reqcli.cache.cli import main, parse_duration
+from reqcli.config import Configuration
+from reqcli.source import SourceConfig, ReqData
+
+from ..conftest import _get_source
+
+
+@pytest.fixture()
+def cache_path(tmp_path):
+    Configuration.cache_backend = 'sqlite'
+    Configuration.cache_name = str(tmp_path / 'cache.db')
+    yield Configuration.cache_name
+    Configuration.cache_name = './requests_cache.db'
+
+
+def _fill(source, count):
+    for i in range(count):
+        source.get(ReqData(path=f'path{i}'))
+
+
+# changes cached responses in place, e.g. to simulate other hosts or old entries
+def _modify(source, index, **attrs):
+    responses = source._session.cache.responses
+    for key in list(responses):
+        response = responses[key]
+        if response.url.endswith(f'/path{index}'):
+            for name, value in attrs.items():
+                setattr(response, name, value)
+            responses[key] = response
+            return key
+    raise AssertionError
+
+
+def test_stats(cache_path, http_server):
+    source = _get_source(None, http_server)
+    _fill(source, 4)
+    _modify(source, 1, status_code=404, url='http://other-host/path1')
+    _modify(source, 2, created_at=datetime.datetime.utcnow() - datetime.timedelta(days=2))
+    _modify(source, 3, _content=b'x' * 10000)
+
+    stats = maintenance.get_stats(cache_path, top=2)
+    assert stats.entries == 4
+    assert stats.invalid == 0
+    assert stats.size > 10000
+    assert stats.file_size >= stats.size
+
+    host = http_server.split('/')[2]
+    assert {name: group.entries for name, group in stats.by_host.items()} == {host: 3, 'other-host': 1}
+    assert {status: group.entries for status, group in stats.by_status.items()} == {200: 3, 404: 1}
+    assert {name: group.entries for name, group in stats.by_age.items()} == {'<1h': 3, '<1d': 0, '<7d': 1, '<30d': 0, '>=30d': 0}
+    assert sum(group.size for group in stats.by_host.values()) == stats.size
+
+    assert len(stats.largest) == 2
+    assert stats.largest[0].url.endswith('/path3')
+    assert stats.largest[0].size > stats.largest[1].size
+
+
+def test_prune(cache_path, http_server):
+    source = _get_source(None, http_server)
+    _fill(source, 5)
+    _modify(source, 0, status_code=404, url='http://other-host/path0')
+    _modify(source, 1, status_code=404)
+    old_key = _modify(source, 2, created_at=datetime.datetime.utcnow() - datetime.timedelta(days=2))
+    source._session.cache.redirects['redirect'] = old_key
+
+    with pytest.raises(ValueError):
+        maintenance.prune(cache_path)
+
+    # criteria are combined
+    assert maintenance.prune(cache_path, statuses=[404], hosts=['other-host'], dry_run=True) == 1
+    assert maintenance.prune(cache_path, statuses=[404], dry_run=True) == 2
+    assert len(source._session.cache.responses) == 5
+
+    assert maintenance.prune(cache_path, statuses=[404], chunk_size=1) == 2
+    assert maintenance.prune(cache_path, older_than=86400) == 1
+    assert len(source._session.cache.responses) == 2
+    # redirects to deleted entries are removed as well
+    assert len(source._session.cache.redirects) == 0
+
+    # deleted entries are requested again
+    res = source.get(ReqData(path='path1'))
+    assert res.from_cache is False  # type: ignore
+
+
+@pytest.mark.parametrize('full', (False, True))
+def test_vacuum(cache_path, http_server, full):
+    source = _get_source(None, http_server)
+    _fill(source, 50)
+    for i in range(50):
+        _modify(source, i, _content=os.urandom(4096))
+
+    size = os.path.getsize(cache_path)
+    assert maintenance.prune(cache_path, older_than=0) == 50
+    assert os.path.getsize(cache_path) == size
+
+    freed = maintenance.vacuum(cache_path, full=full, chunk_pages=10)
+    assert freed > 50 * 4096
+    assert maintenance.get_stats(cache_path).free_size == 0
+    # no-op if there is nothing to reclaim
+    assert maintenance.vacuum(cache_path, full=full) == 0
+
+
+@pytest.mark.parametrize('soft_ttl', (None, 3600))
+def test_hot_keys(cache_path, http_server, soft_ttl):
+    source = _get_source(SourceConfig(cache_access_tracking=True, cache_soft_ttl=soft_ttl), http_server)
+    assert maintenance.get_hot_keys(cache_path) == []
+
+    _fill(source, 3)
+    for _ in range(3):
+        source.get(ReqData(path='path1'))
+    source.get(ReqData(path='path2'))
+    # uncached requests are not counted
+    source.get(ReqData(path='path0'), skip_cache_read=True)
+    source._cache_access_tracker.flush()
+
+    keys = maintenance.get_hot_keys(cache_path)
+    assert [(key.url.rsplit('/', 1)[1], key.hits) for key in keys] == [('path1', 3), ('path2', 1)]
+
+    maintenance.prune(cache_path, older_than=0)
+    assert maintenance.get_hot_keys(cache_path) == []
+
+
+def test_hot_keys__unsupported_backend(caplog):
+    source = _get_source(SourceConfig(cache_access_tracking=True))
+    assert source._cache_access_tracker is None
+    assert 'not supported' in caplog.text
+
+
+@pytest.mark.parametrize('value, expected', [('30', 30), ('1.5m', 90), ('12h', 43200), ('7d', 604800), ('2w', 1209600)])
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == expected
+
+
+def test_cli(cache_path, http_server, tmp_path):
+    source = _get_source(None, http_server)
+    _fill(source, 3)
+
+    out = io.StringIO()
+    assert main(['stats'], out) == 0
+    assert 'entries:   3 (0 redirects, 0 invalid)' in out.getvalue()
+    assert '/path0' in out.getvalue()
+
+    out = io.StringIO()
+    assert main(['--db', cache_path, 'prune', '--older-than', '0s', '--dry-run'], out) == 0
+    assert out.getvalue() == 'would delete 3 entries\n'
+    out = io.StringIO()
+    assert main(['prune', '--host', 'other-host'], out) == 0
+    assert out.getvalue() == 'deleted 0 entries\n'
+
+    with pytest.raises(SystemExit):
+        main(['prune'])
+    assert main(['--db', str(tmp_path / 'missing.db'), 'stats']) == 1
@@ -0,0 +1,139 @@
+import pickle
+import datetime
+import pytest
+import requests
+from requests_cache import CachedResponse
+
+from reqcli.cache import CompactCachedResponse, ShardedDbCache, maintenance, serializer
+from reqcli.config import Configuration
+from reqcli.reader import ResponseReader
+from reqcli.source import SourceConfig, ReqData
+
+from ..conftest import BaseTypeTest, _get_source
+
+
+def _create_response(**kwargs):
+    res = requests.Response()
+    res.status_code = 200
+    res.reason = 'OK'
+    res.url = 'http://test/path?x=1'
+    res.encoding = 'utf-8'
+    res.headers.update({
+        'Content-Type': 'text/plain',
+        'Content-Encoding': 'gzip',
+        'Content-Length': '5',
+        'Connection': 'keep-alive',
+        'X-Unicode': 'äö€'
+    })
+    res._content = b'decoded body'
+    res.elapsed = datetime.timedelta(milliseconds=12.5)
+    res.request = requests.Request('GET', res.url).prepare()
+    for name, value in kwargs.items():
+        setattr(res, name, value)
+    return CachedResponse(res, expire_after=60)
+
+
+def test_roundtrip():
+    cached = _create_response()
+    data = serializer.dumps(cached)
+    assert data.endswith(b'decoded body')
+    res = serializer.loads(data)
+
+    assert isinstance(res, CompactCachedResponse)
+    assert isinstance(res, CachedResponse)
+    assert res.from_cache is True
+    assert res.status_code == 200
+    assert res.reason == 'OK'
+    assert res.url == cached.url
+    assert res.encoding == 'utf-8'
+    assert res.elapsed == cached.elapsed
+    assert res.created_at == cached.created_at
+    assert res.expires == cached.expires
+    assert res.is_expired is False
+    assert res.content == b'decoded body'
+    assert res.text == 'decoded body'
+    assert res.request.method == 'GET'
+    assert res.request.url == cached.url
+    assert len(res.cookies) == 0
+
+    # bodies are stored decoded
+    assert dict(res.headers) == {'Content-Type': 'text/plain', 'X-Unicode': 'äö€', 'Content-Length': '12'}
+    assert res.headers['content-type'] == 'text/plain'
+
+
+def test_roundtrip__empty():
+    res = serializer.loads(serializer.dumps(_create_response(_content=b'', encoding=None, reason=None)))
+    assert res.content == b''
+    assert res.encoding is None
+    assert res.expires is not None
+    res.expires = None
+    assert serializer.loads(serializer.dumps(res)).expires is None
+
+
+def test_stream():
+    res = serializer.loads(serializer.dumps(_create_response()))
+    reader = ResponseReader(res, buffer_size=4)
+    assert reader.size == 12
+    assert reader.read(7) == b'decoded'
+    assert reader.read() == b' body'
+    with res:
+        pass
+    assert b''.join(res.iter_content(5)) == b'decoded body'
+
+
+def test_pickle_compatibility():
+    cached = _create_response()
+    # existing entries and other values are still (de)serialized using pickle
+    assert serializer.loads(pickle.dumps(cached)).content == b'decoded body'
+    assert serializer.loads(serializer.dumps('key')) == 'key'
+
+    # e.g. for snapshots
+    res = serializer.loads(serializer.dumps(cached))
+    res.raw.read(3)
+    res = pickle.loads(pickle.dumps(res))
+    assert isinstance(res, CompactCachedResponse)
+    assert res.raw.read() == b'decoded body'
+    assert res.request.url == cached.url
+
+
+def test_invalid():
+    data = serializer.dumps(_create_response())
+    with pytest.raises(ValueError):
+        serializer.loads(data[:-1])
+
+
+@pytest.fixture(params=('sqlite', ShardedDbCache))
+def cache_path(request, tmp_path):
+    Configuration.cache_backend = request.param
+    Configuration.cache_name = str(tmp_path / 'cache.db')
+    yield Configuration.cache_name
+    Configuration.cache_name = './requests_cache.db'
+
+
+def test_source(cache_path, http_server):
+    source = _get_source(SourceConfig(cache_compact_entries=True), http_server)
+    for _ in range(2):
+        source.get(ReqData(path='path'))
+    if isinstance(source._session.cache, ShardedDbCache):
+        source._session.cache.flush()
+
+    res = source.get(ReqData(path='path'))
+    assert isinstance(res, CompactCachedResponse)
+    assert res.text == 'response:/path'
+    assert source._create_type(ReqData(path='path'), BaseTypeTest()).test_data == b'response:/path'
+
+    # compact entries are smaller than pickled ones
+    responses = source._session.cache.responses
+    assert len(responses.serialize(res)) * 3 < len(pickle.dumps(res))
+
+    if not isinstance(source._session.cache, ShardedDbCache):
+        stats = maintenance.get_stats(cache_path)
+        assert stats.entries == 1
+        assert stats.invalid == 0
+
+
+def test_source__memory():
+    # responses are not serialized at all
+    source = _get_source(SourceConfig(cache_compact_entries=True))
+    source.get_test()
+    assert source.get(ReqData(path='testpath')).from_cache is True  # type: ignore
@@ -0,0 +1,116 @@
+import os
+import pytest
+import threading
+from unittest.mock import patch
+
+from reqcli.cache import ShardedDbCache, ShardedDbDict
+from reqcli.config import Configuration
+from reqcli.source import ReqData
+
+from ..conftest import _get_source
+
+
+@pytest.fixture()
+def storage(tmp_path):
+    storage = ShardedDbDict(str(tmp_path / 'cache.db'), 'test', shards=4, flush_interval=60, pickle_values=True)
+    yield storage
+    storage.close()
+
+
+def test_storage(storage, tmp_path):
+    assert sorted(f for f in os.listdir(tmp_path) if f.endswith('.db')) == [f'cache.shard{i}.db' for i in range(4)]
+
+    assert all(con.execute('PRAGMA journal_mode').fetchone()[0] == 'wal' for con in storage._connections())
+
+    for i in range(20):
+        storage[f'key{i}'] = {'value': i}
+    # pending writes should be visible before flushing
+    assert storage['key3'] == {'value': 3}
+    assert 'key3' in storage
+    assert 'other' not in storage
+    with pytest.raises(KeyError):
+        storage['other']
+
+    del storage['key3']
+    assert 'key3' not in storage
+    with pytest.raises(KeyError):
+        del storage['key3']
+
+    assert len(storage) == 19
+    assert {k for k in storage} == {f'key{i}' for i in range(20) if i != 3}
+
+    # keys should be distributed across all shards
+    used = {storage._shard(k) for k in storage}
+    assert used == set(range(4))
+
+    storage.clear()
+    assert len(storage) == 0
+
+
+def test_storage__persistence(storage, tmp_path):
+    storage['a'] = 1
+    storage.flush()
+    other = ShardedDbDict(str(tmp_path / 'cache.db'), 'test', shards=4, pickle_values=True)
+    assert other['a'] == 1
+    # writes are not visible to other instances before flushing
+    storage['b'] = 2
+    assert 'b' not in other
+    storage.flush()
+    assert other['b'] == 2
+    other.close()
+
+
+def test_storage__batch_size(tmp_path):
+    storage = ShardedDbDict(str(tmp_path / 'cache.db'), 'test', flush_interval=60, batch_size=10)
+    flushed = threading.Event()
+    orig_flush = storage.flush
+
+    def flush():
+        orig_flush()
+        flushed.set()
+
+    with patch.object(storage, 'flush', flush):
+        for i in range(9):
+            storage[str(i)] = i
+        assert not flushed.wait(0.2)
+        storage['9'] = 9
+        assert flushed.wait(5)
+    assert storage._pending_count == 0
+    storage.close()
+
+
+def test_storage__threads(storage):
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(100):
+                storage[f'{n}-{i}'] = i
+                assert storage[f'{n}-{i}'] == i
+                if i % 10 == 0:
+                    storage.flush()
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(storage) == 800
+
+
+def test_cache(tmp_path, http_server):
+    Configuration.cache_backend = ShardedDbCache
+    Configuration.cache_name = str(tmp_path / 'cache.db')
+    try:
+        source = _get_source(None, http_server)
+        assert isinstance(source._session.cache, ShardedDbCache)
+        assert source.get(ReqData(path='a')).from_cache is False  # type: ignore
+        res = source.get(ReqData(path='a'))
+        assert res.from_cache is True  # type: ignore
+        assert res.text == 'response:/a'
+        source._session.cache.close()
+    finally:
+        Configuration.cache_name = './requests_cache.db'
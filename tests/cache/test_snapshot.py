@@ -0,0 +1,75 @@
+import pytest
+from requests_cache.backends.sqlite import DbDict
+
+from reqcli.config import Configuration
+from reqcli.source import SourceConfig, ReqData
+
+from ..conftest import _get_source
+
+
+@pytest.fixture(params=('memory', 'sqlite'))
+def backend(request, tmp_path):
+    Configuration.cache_backend = request.param
+    Configuration.cache_name = str(tmp_path / 'cache.db')
+    yield request.param
+    Configuration.cache_name = './requests_cache.db'
+
+
+def _fill(source, count):
+    for i in range(count):
+        source.get(ReqData(path=f'path{i}'))
+
+
+def test_export_import(backend, tmp_path, http_server):
+    source = _get_source(None, http_server)
+    _fill(source, 3)
+    source._session.cache.redirects['redirect'] = 'key'
+
+    snapshot = str(tmp_path / 'snapshot.db')
+    assert source.export_cache(snapshot) == 3
+
+    # import into a new, empty cache
+    Configuration.cache_name = str(tmp_path / 'cache2.db')
+    other = _get_source(None, http_server)
+    cache = other._session.cache
+    assert isinstance(cache.responses, DbDict) is (backend == 'sqlite')
+
+    assert other.import_cache(snapshot) == 3
+    assert len(cache.responses) == 3
+    assert cache.redirects['redirect'] == 'key'
+    for i in range(3):
+        res = other.get(ReqData(path=f'path{i}'), skip_cache_write=True)
+        assert res.from_cache is True
+        assert res.text == f'response:/path{i}'
+
+    # existing entries are skipped unless overwriting
+    assert other.import_cache(snapshot) == 0
+    assert other.import_cache(snapshot, overwrite=True) == 3
+
+
+def test_export__expired(backend, tmp_path, http_server):
+    source = _get_source(None, http_server)
+    _fill(source, 2)
+    cache = source._session.cache
+    key = next(iter(cache.responses))
+    response = cache.responses[key]
+    response.expires = response.created_at
+    cache.responses[key] = response
+
+    snapshot = str(tmp_path / 'snapshot.db')
+    assert source.export_cache(snapshot) == 1
+    assert source.export_cache(snapshot, include_expired=True) == 2
+
+
+def test_export__error(tmp_path, requests_mock):
+    source = _get_source(None)
+    source._session.cache.responses['x'] = object()
+    with pytest.raises(Exception):
+        source.export_cache(str(tmp_path / 'snapshot.db'))
+    # no partial files should be left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disabled():
+    with pytest.raises(AssertionError):
+        _get_source(SourceConfig(enable_cache=False)).export_cache('x')
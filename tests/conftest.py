@@ -1,14 +1,19 @@
+import os
+import ssl
 import pytest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Any, Optional
 
 from reqcli.config import Configuration
-from reqcli.type import BaseTypeLoadable
+from reqcli.type import BaseTypeLoadable, TypeLoadConfig
 from reqcli.source import BaseSource, ReqData, SourceConfig
 
 
 @pytest.fixture(autouse=True)
 def config_setup(request):
     Configuration.cache_backend = 'memory'
+    Configuration.type_load_config_type = TypeLoadConfig
 
     if 'no_ratelimit_patch' not in request.keywords:
         # disable ratelimit while testing (unless set explicitly)
@@ -58,3 +63,51 @@ class BaseSourceTest(BaseSource):
 
 def _get_source(config: Optional[SourceConfig], base: Optional[str] = None, **kwargs: Any) -> BaseSourceTest:
     return BaseSourceTest(ReqData(path=base or MOCK_BASE), config, **kwargs)
+
+
+class _TestRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = f'response:{self.path}'.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# real local server, for tests that can't use `requests_mock` (e.g. when responses need to be pickled)
+@pytest.fixture()
+def http_server(requests_mock):
+    requests_mock.real_http = True
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _TestRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+TLS_CERT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'localhost.pem')
+
+
+# same as `http_server`, using a self-signed certificate for localhost (see `TLS_CERT_PATH`)
+@pytest.fixture()
+def https_server(requests_mock, monkeypatch):
+    requests_mock.real_http = True
+    # a CA bundle from the environment would override `verify=False`
+    monkeypatch.delenv('REQUESTS_CA_BUNDLE', raising=False)
+    monkeypatch.delenv('CURL_CA_BUNDLE', raising=False)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _TestRequestHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(TLS_CERT_PATH)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f'https://localhost:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
@@ -1,16 +1,28 @@
+import os
+import gzip
+import ssl
+import socket
 import pytest
+import time
+import itertools
+import threading
+import hashlib
 import requests
 from unittest.mock import patch
+from concurrent.futures import ProcessPoolExecutor
 from requests_cache import CacheMixin
 from typing import cast
 
 from reqcli.config import Configuration
+from reqcli.errors import DownloadError, ResponseStatusError, ResponseTooLargeError
+from reqcli.reader import SpooledReader
 from reqcli.type import TypeLoadConfig
-from reqcli.source import SourceConfig, UnloadableType, ReqData, StatusCheckMode
+from reqcli.source import CacheWarmResult, ConnectionReleaseStats, RequestScheduler, SourceConfig, UnloadableType, ReqData, StatusCheckMode
 from reqcli.source.ratelimit import RateLimitedSession, RateLimitingMixin
+from reqcli.utils import decoding, tls
 from reqcli.utils.fingerprint_adapter import FingerprintAdapter
 
-from ..conftest import MOCK_BASE, MOCK_PATH, BaseTypeTest, _get_source
+from ..conftest import MOCK_BASE, MOCK_PATH, TLS_CERT_PATH, BaseTypeTest, _get_source
 
 
 def test_fingerprint():
@@ -18,8 +30,9 @@ def test_fingerprint():
     adapter = source._session.adapters['https://']
     # check adapter
     assert isinstance(adapter, FingerprintAdapter)
-    # ensure retries are still enabled
-    assert adapter.max_retries.total == 1337
+    # ensure urllib3 retries are disabled, same as for the default adapter
+    assert adapter.max_retries.total == 0
+    assert source._retry_handler._config.http_retries == 1337
 
 
 @pytest.mark.parametrize('verify_tls', (True, False))
@@ -137,6 +150,189 @@ def test_skip_cache_write(skip, requests_mock):
     assert res.text == expected_text
 
 
+def test_download(tmp_path):
+    path = str(tmp_path / 'file')
+    digests = _get_source(None).download(ReqData(path=MOCK_PATH), path, hash_algorithms=('sha256', 'md5'))
+
+    with open(path, 'rb') as f:
+        assert f.read() == b'response'
+    assert digests == {
+        'sha256': hashlib.sha256(b'response').hexdigest(),
+        'md5': hashlib.md5(b'response').hexdigest()
+    }
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='POSIX file modes')
+@pytest.mark.parametrize('umask', (0o022, 0o077))
+def test_download__mode(tmp_path, umask):
+    path = str(tmp_path / 'file')
+    old_umask = os.umask(umask)
+    try:
+        _get_source(None).download(ReqData(path=MOCK_PATH), path)
+        with open(tmp_path / 'reference', 'wb'):
+            pass
+    finally:
+        os.umask(old_umask)
+    # same mode as a file created by `open`
+    assert os.stat(path).st_mode == os.stat(tmp_path / 'reference').st_mode == 0o100666 & ~umask
+
+
+@pytest.mark.parametrize('headers', ({}, {'content-length': '8'}))
+def test_download__expected_size(tmp_path, requests_mock, headers):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, content=b'response', headers=headers)
+    path = str(tmp_path / 'file')
+
+    with pytest.raises(DownloadError):
+        _get_source(None).download(ReqData(path=MOCK_PATH), path, expected_size=42)
+    # neither target nor temporary file should exist
+    assert os.listdir(tmp_path) == []
+
+
+def test_prewarm(http_server):
+    source = _get_source(None, http_server)
+    pool = source._session.adapters['http://'].poolmanager.connection_from_url(http_server)
+    assert source.prewarm(3) == 3
+    assert pool.num_connections == 3
+    assert pool.pool.qsize() == pool.pool.maxsize
+
+    # requests use the existing connections
+    assert source.get(ReqData(path='a')).text == 'response:/a'
+    assert source.prewarm(3) == 3
+    assert pool.num_connections == 3
+
+    # pool size is not exceeded
+    assert source.prewarm(100) == pool.pool.maxsize
+
+
+def test_prewarm__timeout(http_server):
+    source = _get_source(SourceConfig(timeout=7), http_server)
+    pool = source._session.adapters['http://'].poolmanager.connection_from_url(http_server)
+    assert source.prewarm(2) == 2
+    assert [conn.sock.gettimeout() for conn in pool.pool.queue if conn is not None] == [7, 7]
+
+
+def test_prewarm__error():
+    # find a port nothing listens on
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    source = _get_source(SourceConfig(timeout=2), f'http://127.0.0.1:{port}')
+    with pytest.raises(requests.ConnectionError):
+        source.prewarm(1)
+
+
+def test_prewarm__dns_cache(http_server):
+    source = _get_source(SourceConfig(dns_cache_ttl=60), http_server)
+    with patch('socket.getaddrinfo', wraps=socket.getaddrinfo) as mock_getaddrinfo:
+        source.prewarm(2)
+        assert source.get(ReqData(path='a')).text == 'response:/a'
+    assert mock_getaddrinfo.call_count == 1
+
+
+@pytest.mark.parametrize('resumption', (True, False))
+def test_tls_session_resumption(https_server, resumption):
+    with open(TLS_CERT_PATH) as f:
+        pem = f.read()
+    cert = ssl.PEM_cert_to_DER_cert(pem[:pem.index(ssl.PEM_FOOTER) + len(ssl.PEM_FOOTER)])
+    source = _get_source(SourceConfig(tls_session_resumption=resumption, http_retries=0), https_server, verify_tls=False, require_fingerprint=hashlib.sha256(cert).hexdigest())
+    adapter = source._session.adapters['https://']
+    # prewarmed connections use the same TLS settings
+    assert source.prewarm(1) == 1
+
+    for path in ('a', 'b', 'c'):
+        assert source.get(ReqData(path=path)).text == f'response:/{path}'
+        # force new connections
+        adapter.poolmanager.clear()
+
+    if resumption:
+        assert source.tls_session_stats == tls.TlsSessionStats(full_handshakes=1, resumed_handshakes=2, cached_sessions=1)
+    else:
+        assert source.tls_session_stats is None
+
+    # fingerprint is still checked for resumed sessions
+    adapter.poolmanager.connection_pool_kw['assert_fingerprint'] = '00' * 32
+    with pytest.raises(requests.exceptions.SSLError):
+        source.get(ReqData(path='d'), skip_cache=True)
+    if resumption:
+        assert source.tls_session_stats.resumed_handshakes == 3
+
+
+def test_tls_session_resumption__contexts(https_server):
+    source = _get_source(SourceConfig(tls_session_resumption=True), https_server, verify_tls=False)
+    poolmanager = source._session.adapters['https://'].poolmanager
+    context = poolmanager.connection_from_url(https_server).conn_kw['ssl_context']
+    # each host uses its own context, which is kept when pools are recreated
+    assert poolmanager.connection_from_url('https://example.invalid/').conn_kw['ssl_context'] is not context
+    poolmanager.clear()
+    assert poolmanager.connection_from_url(https_server).conn_kw['ssl_context'] is context
+
+    # client certificates can't differ between requests
+    with pytest.raises(ValueError):
+        source.get(ReqData(path='a', cert=TLS_CERT_PATH))
+
+
+# pagination
+
+class PageTest(BaseTypeTest):
+    @property
+    def items(self):
+        return self.test_data.decode().split(',')
+
+    @property
+    def has_next(self):
+        return self.items[-1] != '19'
+
+
+@pytest.fixture()
+def mock_pages(requests_mock):
+    def callback(request, context):
+        offset = int(request.qs['offset'][0])
+        return ','.join(str(i) for i in range(offset, min(offset + 5, 20)))
+    requests_mock.get(MOCK_BASE + 'page', text=callback)
+    return requests_mock
+
+
+def _paginate(source, **kwargs):
+    return source._paginate(
+        lambda i: ReqData(path='page', params={'offset': i * 5}),
+        PageTest,
+        lambda p: p.items,
+        lambda p: p.has_next,
+        **kwargs
+    )
+
+
+@pytest.mark.parametrize('prefetch', (0, 1, 3))
+def test_paginate(mock_pages, prefetch):
+    items = list(_paginate(_get_source(SourceConfig(enable_cache=False)), prefetch=prefetch))
+    assert items == [str(i) for i in range(20)]
+    # no more than `prefetch` speculative requests after the last page
+    assert 4 <= mock_pages.call_count <= 4 + prefetch
+
+
+def test_paginate__no_prefetch(mock_pages):
+    it = _paginate(_get_source(SourceConfig(enable_cache=False)), prefetch=0)
+    assert list(itertools.islice(it, 5)) == ['0', '1', '2', '3', '4']
+    # next page is only requested once the current one was consumed
+    assert mock_pages.call_count == 1
+    assert next(it) == '5'
+    assert mock_pages.call_count == 2
+    it.close()
+
+
+@pytest.mark.no_ratelimit_patch
+def test_paginate__stop(mock_pages):
+    # the prefetched page is re-queued until the ratelimit allows it
+    source = _get_source(SourceConfig(enable_cache=False, requests_per_second=2))
+    it = _paginate(source, prefetch=1)
+    assert list(itertools.islice(it, 3)) == ['0', '1', '2']
+    it.close()
+
+    source._get_scheduler().shutdown()
+    time.sleep(0.6)
+    assert mock_pages.call_count == 1
+
+
 # config stuff
 
 def test_config__enable_cache():
@@ -162,10 +358,58 @@ def test_config__cache_response_codes():
     assert list(cast(CacheMixin, source._session).allowable_codes) == [418]
 
 
-def test_config__http_retries():
-    source = _get_source(SourceConfig(http_retries=1337))
+@patch('time.sleep')
+def test_config__http_retries(mock_sleep, requests_mock):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, status_code=503)
+    source = _get_source(SourceConfig(http_retries=2))
     for prefix in ('http://', 'https://'):
-        assert source._session.adapters[prefix].max_retries.total == 1337
+        # retries are handled by source, not by urllib3
+        assert source._session.adapters[prefix].max_retries.total == 0
+
+    with pytest.raises(ResponseStatusError):
+        source.get_test()
+    assert requests_mock.call_count == 3
+
+
+@pytest.mark.parametrize('body, headers, reused', [
+    (b'x' * 100, {}, True),
+    (b'x' * 100, {'content-length': '100'}, True),
+    (b'x' * 101, {}, False),
+    # not read at all
+    (b'x' * 101, {'content-length': '101'}, False),
+])
+def test_config__drain(requests_mock, body, headers, reused):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, status_code=404, content=body, headers=headers)
+    source = _get_source(SourceConfig(enable_cache=False, drain_max_bytes=100))
+    with pytest.raises(ResponseStatusError):
+        source.get_test()
+
+    drained = 0 if 'content-length' in headers and not reused else len(body)
+    assert source.connection_release_stats == ConnectionReleaseStats(reused=int(reused), discarded=int(not reused), drained_bytes=drained)
+
+
+@pytest.mark.parametrize('finish_read_on_error, timeout', [(True, 0), (False, 1)])
+def test_config__drain__disabled(requests_mock, finish_read_on_error, timeout):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, status_code=404)
+    source = _get_source(SourceConfig(enable_cache=False, finish_read_on_error=finish_read_on_error, drain_timeout=timeout))
+    with pytest.raises(ResponseStatusError):
+        source.get_test()
+    assert source.connection_release_stats == ConnectionReleaseStats(reused=0, discarded=1, drained_bytes=0)
+
+
+@pytest.mark.parametrize('max_bytes, reused', [(100, True), (1, False)])
+def test_config__drain__connection(http_server, max_bytes, reused):
+    source = _get_source(SourceConfig(drain_max_bytes=max_bytes), http_server)
+    res = source.get(ReqData(path='a'), skip_cache=True)
+    # same as for error responses
+    source._BaseSource__release(res)  # type: ignore
+
+    # connection is returned to the pool in both cases, but closed if the response wasn't drained
+    pool = source._session.adapters['http://'].poolmanager.connection_from_url(http_server)
+    conn = pool._get_conn()
+    assert res.raw.connection is None
+    assert (conn.sock is not None) is reused
+    pool._put_conn(conn)
 
 
 def test_config__timeout():
@@ -181,12 +425,128 @@ def test_config__requests_per_second(cached):
     assert cast(RateLimitedSession, source._session)._ratelimit_interval == 1.0 / 64
 
 
+@pytest.mark.parametrize('enable_cache', (True, False))
+@pytest.mark.parametrize('headers', ({}, {'content-length': '100'}))
+def test_config__max_response_bytes(requests_mock, enable_cache, headers):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, content=b'x' * 100, headers=headers)
+    source = _get_source(SourceConfig(enable_cache=enable_cache, max_response_bytes=99))
+
+    with pytest.raises(ResponseTooLargeError):
+        source.get_test()
+    with pytest.raises(ResponseTooLargeError):
+        source.submit(ReqData(path=MOCK_PATH)).result()
+    if enable_cache:
+        # oversized responses must not be cached
+        assert len(cast(CacheMixin, source._session).cache.responses) == 0
+
+    source = _get_source(SourceConfig(enable_cache=enable_cache, max_response_bytes=100))
+    assert source.get_test().test_data == b'x' * 100
+    assert source.submit(ReqData(path=MOCK_PATH)).result().content == b'x' * 100
+    if enable_cache:
+        # responses of unknown size are not cached, since they'd have to be read entirely
+        assert len(cast(CacheMixin, source._session).cache.responses) == len(headers)
+
+
+def test_config__max_response_bytes__decoded(requests_mock):
+    body = gzip.compress(b'x' * 1000)
+    requests_mock.get(MOCK_BASE + MOCK_PATH, content=body, headers={'content-encoding': 'gzip', 'content-length': str(len(body))})
+    source = _get_source(SourceConfig(max_response_bytes=500))
+    with pytest.raises(ResponseTooLargeError):
+        source.get_test()
+    assert len(cast(CacheMixin, source._session).cache.responses) == 0
+
+
+@pytest.mark.parametrize('threshold, spilled', ((1000, False), (10, True)))
+def test_config__spill_threshold(requests_mock, threshold, spilled):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, content=b'x' * 100)
+    source = _get_source(SourceConfig(spill_threshold=threshold))
+    with source.get_reader(ReqData(path=MOCK_PATH)) as reader:
+        assert isinstance(reader, SpooledReader)
+        assert reader.spilled is spilled
+        assert reader.read() == b'x' * 100
+    assert source.get_test().test_data == b'x' * 100
+
+
+def test_config__cache_soft_ttl(requests_mock):
+    release = threading.Event()
+    calls = 0
+
+    def callback(request, context):
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            release.wait(5)
+        return f'r{calls}'
+    requests_mock.get(MOCK_BASE + MOCK_PATH, text=callback)
+
+    source = _get_source(SourceConfig(cache_soft_ttl=0))
+    futures = []
+    orig_submit = source.submit
+    with patch.object(source, 'submit', side_effect=lambda *args, **kwargs: futures.append(orig_submit(*args, **kwargs)) or futures[-1]):
+        assert source.get_test().test_data == b'r1'
+        assert not futures
+
+        # stale responses are returned immediately, refreshes are deduplicated
+        for _ in range(3):
+            assert source.get_test().test_data == b'r1'
+        assert len(futures) == 1
+        release.set()
+        futures[0].result()
+        assert calls == 2
+
+        assert source.get_test().test_data == b'r2'
+        futures[1].result()
+    assert calls == 3
+
+
+def test_config__cache_soft_ttl__hooks(requests_mock):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, [{'text': 'first'}, {'text': 'second'}, {'text': 'third'}])
+    source = _get_source(SourceConfig(cache_soft_ttl=0))
+    source._scheduler = RequestScheduler(max_workers=1)
+    assert source.get_test().test_data == b'first'
+
+    # background refreshes use the same hooks, i.e. the refreshed response isn't cached
+    assert source.get(ReqData(path=MOCK_PATH), skip_cache_write=True).text == 'first'
+    source._scheduler.shutdown()
+    assert requests_mock.call_count == 2
+    assert source.get_test().test_data != b'second'
+
+
+@pytest.mark.parametrize('stale_if_error', (True, False))
+@pytest.mark.parametrize('error', ({'status_code': 500}, {'exc': requests.ConnectionError}))
+def test_config__cache_hard_ttl(requests_mock, stale_if_error, error):
+    requests_mock.get(MOCK_BASE + MOCK_PATH, [{'text': 'first'}, {'text': 'second'}, error])
+    source = _get_source(SourceConfig(cache_hard_ttl=0, cache_stale_if_error=stale_if_error, http_retries=0))
+
+    # refreshed synchronously
+    assert source.get_test().test_data == b'first'
+    assert source.get_test().test_data == b'second'
+    assert requests_mock.call_count == 2
+
+    if stale_if_error:
+        res = source.get(ReqData(path=MOCK_PATH))
+        assert res.from_cache is True  # type: ignore
+        assert res.text == 'second'
+    else:
+        with pytest.raises((ResponseStatusError, requests.ConnectionError)):
+            source.get_test()
+    assert requests_mock.call_count == 3
+
+
 def test_config__type_load_config():
     type_load_config = TypeLoadConfig()
     source = _get_source(SourceConfig(type_load_config=type_load_config))
     assert source.get_test().test_config is type_load_config
 
 
+def test_config__load_executor():
+    with ProcessPoolExecutor(1) as executor:
+        source = _get_source(SourceConfig(load_executor=executor))
+        result = source.get_test()
+    assert isinstance(result, BaseTypeTest)
+    assert result.test_data == b'response'
+
+
 def test_config__type_load_config__global_default():
 
     class TestConfig(TypeLoadConfig):
@@ -195,3 +555,55 @@ def test_config__type_load_config__global_default():
     Configuration.type_load_config_type = TestConfig
     source = _get_source(SourceConfig())
     assert isinstance(source.get_test().test_config, TestConfig)
+
+
+def test_warm_cache(requests_mock):
+    requests_mock.get(MOCK_BASE + 'a', text='a')
+    requests_mock.get(MOCK_BASE + 'notfound', status_code=404)
+    source = _get_source(None)
+    source.get(ReqData(path='a'), skip_cache=True)  # not cached
+    source.get(ReqData(path=MOCK_PATH))  # cached
+    requests_mock.reset_mock()
+
+    result = source.warm_cache([ReqData(path=MOCK_PATH), ReqData(path='a'), ReqData(path='a'), ReqData(path='notfound')])
+    assert result == CacheWarmResult(requested=3, skipped=1, fetched=1, failed=1)
+    assert requests_mock.call_count == 2
+
+    # warmed requests should now be served from cache
+    assert source.get(ReqData(path='a')).from_cache is True  # type: ignore
+    assert source.warm_cache([ReqData(path='a')]).skipped == 1
+
+
+def test_warm_cache__expired(requests_mock):
+    source = _get_source(None)
+    source.get(ReqData(path=MOCK_PATH))
+    cache = source._session.cache
+    for key, response in list(cache.responses.items()):
+        response.expires = response.created_at
+        cache.responses[key] = response
+
+    assert source.warm_cache([ReqData(path=MOCK_PATH)]).fetched == 1
+
+
+def test_accept_encoding(requests_mock):
+    source = _get_source(None)
+    source.get(ReqData(path=MOCK_PATH), skip_cache=True)
+    assert requests_mock.last_request.headers['Accept-Encoding'] == decoding.ACCEPT_ENCODING
+    assert 'gzip' in decoding.ACCEPT_ENCODING
+
+
+def test_accept_encoding__cache_key(requests_mock):
+    # cache keys don't depend on the available decoders
+    keys = []
+    for accept_encoding in ('gzip, deflate', 'gzip, deflate, br, zstd'):
+        with patch('reqcli.utils.decoding.ACCEPT_ENCODING', accept_encoding):
+            source = _get_source(None)
+            source.get(ReqData(path=MOCK_PATH))
+            assert requests_mock.last_request.headers['Accept-Encoding'] == accept_encoding
+            keys.append(list(source._session.cache.responses.keys()))
+    assert len(keys[0]) == 1
+    assert keys[0] == keys[1]
+
+    # other values are still part of the key
+    source.get(ReqData(path=MOCK_PATH, headers={'Accept-Encoding': 'identity'}))
+    assert len(source._session.cache.responses) == 2
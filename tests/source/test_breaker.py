@@ -0,0 +1,161 @@
+import pytest
+import requests
+from unittest.mock import patch
+
+from reqcli.errors import CircuitOpenError, ResponseStatusError
+from reqcli.source import CircuitState, ReqData, SourceConfig
+from reqcli.source.breaker import CircuitBreaker
+
+from ..conftest import _get_source
+
+
+@pytest.fixture()
+def clock():
+    now = [1000.0]
+    with patch('time.monotonic', side_effect=lambda: now[0]):
+        yield now
+
+
+def _fail(breaker, n=1):
+    for _ in range(n):
+        breaker.record(breaker.try_acquire(), False)
+
+
+def test_breaker__consecutive_failures(clock):
+    breaker = CircuitBreaker(3, None)
+    _fail(breaker, 2)
+    # successes reset the counter
+    breaker.record(breaker.try_acquire(), True)
+    _fail(breaker, 2)
+    assert breaker.state is CircuitState.CLOSED
+    _fail(breaker)
+    assert breaker.state is CircuitState.OPEN
+
+    assert breaker.try_acquire() is None
+    stats = breaker.stats
+    assert stats.opened == 1
+    assert stats.rejected == 1
+    assert stats.consecutive_failures == 3
+
+
+def test_breaker__error_rate(clock):
+    breaker = CircuitBreaker(None, 0.5, min_requests=4, window=10)
+    _fail(breaker, 3)
+    # not enough requests yet
+    assert breaker.state is CircuitState.CLOSED
+
+    # old results are discarded
+    clock[0] += 11
+    for success in (True, False, True):
+        breaker.record(breaker.try_acquire(), success)
+    assert breaker.state is CircuitState.CLOSED
+    _fail(breaker)
+    assert breaker.state is CircuitState.OPEN
+
+
+@pytest.mark.parametrize('probe_success', (True, False))
+def test_breaker__half_open(clock, probe_success):
+    breaker = CircuitBreaker(1, None, open_duration=5, half_open_probes=2)
+    _fail(breaker)
+    clock[0] += 5
+    assert breaker.state is CircuitState.HALF_OPEN
+
+    # only a limited number of probes are let through
+    tickets = [breaker.try_acquire(), breaker.try_acquire()]
+    assert None not in tickets
+    assert breaker.try_acquire() is None
+
+    # released tickets allow new probes
+    breaker.record(tickets[0], None)
+    tickets[0] = breaker.try_acquire()
+    assert tickets[0] is not None
+
+    breaker.record(tickets[0], True)
+    assert breaker.state is CircuitState.HALF_OPEN
+    breaker.record(tickets[1], probe_success)
+    assert breaker.state is (CircuitState.CLOSED if probe_success else CircuitState.OPEN)
+    assert breaker.stats.opened == (1 if probe_success else 2)
+
+
+def test_breaker__stale_ticket(clock):
+    breaker = CircuitBreaker(1, None, open_duration=5)
+    ticket = breaker.try_acquire()
+    _fail(breaker)
+    clock[0] += 5
+    # outcomes of requests started before the breaker opened don't affect probing
+    breaker.record(ticket, True)
+    assert breaker.state is CircuitState.HALF_OPEN
+
+
+@patch('time.sleep')
+def test_breaker__source(mock_sleep, requests_mock):
+    base = 'http://breaker-test/'
+    requests_mock.get(base + 'ok', text='cached')
+    requests_mock.get(base + 'fail', exc=requests.ConnectionError)
+    source = _get_source(SourceConfig(breaker_failure_threshold=3, http_retries=5), base)
+
+    # populate cache
+    assert source.get(ReqData(path='ok')).text == 'cached'
+
+    # remaining retries fail fast once the breaker opens
+    with pytest.raises(CircuitOpenError):
+        source.get(ReqData(path='fail'))
+    assert requests_mock.call_count == 4
+    assert source.circuit_breaker_stats['breaker-test'].state is CircuitState.OPEN
+
+    # cached responses are still served
+    assert source.get(ReqData(path='ok')).text == 'cached'
+    with pytest.raises(CircuitOpenError):
+        source.get(ReqData(path='ok'), skip_cache_read=True)
+    assert requests_mock.call_count == 4
+
+
+def test_breaker__cache_hits(requests_mock):
+    base = 'http://breaker-test-cache/'
+    requests_mock.get(base + 'ok', text='cached')
+    requests_mock.get(base + 'fail', exc=requests.ConnectionError)
+    source = _get_source(SourceConfig(breaker_failure_threshold=3, http_retries=0), base)
+    source.get(ReqData(path='ok'))
+
+    # interleaved cache hits don't reset the failure count
+    for _ in range(3):
+        with pytest.raises(requests.ConnectionError):
+            source.get(ReqData(path='fail'))
+        assert source.get(ReqData(path='ok')).from_cache is True  # type: ignore
+    assert source.circuit_breaker_stats['breaker-test-cache'].state is CircuitState.OPEN
+
+
+def test_breaker__half_open_cache_hit(requests_mock):
+    base = 'http://breaker-test-probe/'
+    requests_mock.get(base + 'ok', text='cached')
+    requests_mock.get(base + 'fail', exc=requests.ConnectionError)
+    source = _get_source(SourceConfig(breaker_failure_threshold=1, breaker_open_duration=0, http_retries=0), base)
+    source.get(ReqData(path='ok'))
+    with pytest.raises(requests.ConnectionError):
+        source.get(ReqData(path='fail'))
+    assert source.circuit_breaker_stats['breaker-test-probe'].state is CircuitState.HALF_OPEN
+
+    # probes answered from the cache neither close the breaker nor use up the probe
+    assert source.get(ReqData(path='ok')).from_cache is True  # type: ignore
+    assert source.circuit_breaker_stats['breaker-test-probe'].state is CircuitState.HALF_OPEN
+    assert source.get(ReqData(path='ok', params={'x': 1})).text == 'cached'
+    assert source.circuit_breaker_stats['breaker-test-probe'].state is CircuitState.CLOSED
+
+
+@pytest.mark.parametrize('serve_stale', (True, False))
+def test_breaker__serve_stale(requests_mock, serve_stale):
+    base = f'http://breaker-test-{serve_stale}/'
+    requests_mock.get(base + 'x', [{'text': 'stale'}, {'status_code': 500}])
+    source = _get_source(SourceConfig(breaker_failure_threshold=1, breaker_serve_stale=serve_stale, http_retries=0), base)
+    source.get(ReqData(path='x'))
+
+    with patch('requests_cache.CachedResponse.is_expired', True):
+        with pytest.raises(ResponseStatusError):
+            source.get(ReqData(path='x'))
+        if serve_stale:
+            res = source.get(ReqData(path='x'))
+            assert res.from_cache is True  # type: ignore
+            assert res.text == 'stale'
+        else:
+            with pytest.raises(CircuitOpenError):
+                source.get(ReqData(path='x'))
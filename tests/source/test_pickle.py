@@ -0,0 +1,96 @@
+import gc
+import os
+import copy
+import pickle
+import weakref
+import pytest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from reqcli.source import SourceConfig, ReqData
+
+from ..conftest import BaseSourceTest, _get_source
+
+
+class SubclassSource(BaseSourceTest):
+    def __init__(self, value):
+        self.value = value
+        super().__init__(ReqData(path='http://test/'), SourceConfig(timeout=42, load_executor=ThreadPoolExecutor(1)))
+        self.other_value = value * 2
+
+
+def _fetch(source):
+    return os.getpid(), id(source), id(source._session), source.get_test().test_data
+
+
+def test_pickle__same_process():
+    source = _get_source(None)
+    # unpickling in the same process should return the original instance
+    assert pickle.loads(pickle.dumps(source)) is source
+
+
+def test_pickle__subclass():
+    source = SubclassSource(21)
+    # simulate other process
+    data = pickle.dumps(source)
+    del source
+
+    restored = pickle.loads(data)
+    assert isinstance(restored, SubclassSource)
+    assert (restored.value, restored.other_value) == (21, 42)
+    assert restored._config.timeout == 42
+    assert restored._config.load_executor is None
+    # should be reused for subsequent unpickling
+    assert pickle.loads(data) is restored
+
+
+def test_pickle__same_process_not_kept():
+    source = _get_source(None)
+    data = pickle.dumps(source)
+    del source
+    gc.collect()
+
+    # sources restored in the process they were created in are not kept alive
+    restored = weakref.ref(pickle.loads(data))
+    gc.collect()
+    assert restored() is None
+
+
+def test_copy():
+    source = SubclassSource(21)
+    source.items = [1]
+    for copied in (copy.copy(source), copy.deepcopy(source)):
+        assert isinstance(copied, SubclassSource)
+        assert copied is not source
+        assert copied._session is not source._session
+        assert (copied.value, copied.other_value) == (21, 42)
+        # config is not stripped, unlike when pickling
+        assert copied._config is source._config
+        assert copied.get_test().test_data == b'response'
+        # copies are independent sources when pickled
+        assert pickle.loads(pickle.dumps(copied)) is copied
+
+    assert copy.copy(source).items is source.items
+    assert copy.deepcopy(source).items == [1]
+    assert copy.deepcopy(source).items is not source.items
+
+
+def test_pickle__process_pool(http_server):
+    source = _get_source(SourceConfig(requests_per_second=1000), http_server)
+    ctx = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(1, mp_context=ctx) as executor:
+        results = [executor.submit(_fetch, source).result() for _ in range(3)]
+
+    pids, source_ids, session_ids, data = zip(*results)
+    assert os.getpid() not in pids
+    # source and session should be created once per worker and reused across tasks
+    assert len(set(source_ids)) == 1
+    assert len(set(session_ids)) == 1
+    assert set(data) == {b'response:/testpath'}
+
+
+def test_pickle__unpicklable_state():
+    source = _get_source(None)
+    source.x = lambda: None
+    with pytest.raises(Exception):
+        pickle.dumps(source)
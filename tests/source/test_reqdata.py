@@ -0,0 +1,78 @@
+import gc
+import pickle
+import pytest
+import dataclasses
+
+from reqcli.source import ReqData
+
+
+def test_reqdata__hashable():
+    a = ReqData('path', {'a': 1}, {'X-Test': 'x'})
+    b = ReqData('path', params={'a': 1}, headers={'X-Test': 'x'})
+    assert a == b
+    assert hash(a) == hash(b)
+    assert len({a, b}) == 1
+    assert a != ReqData('path', {'a': 2}, {'X-Test': 'x'})
+    assert repr(a) == "ReqData(path='path', params={'a': 1}, headers={'X-Test': 'x'}, cert=None)"
+
+
+def test_reqdata__frozen():
+    reqdata = ReqData('path')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        reqdata.path = 'other'  # type: ignore
+    with pytest.raises(TypeError):
+        reqdata.params['a'] = 1  # type: ignore
+    assert not hasattr(reqdata, '__dict__')
+
+
+def test_reqdata__dataclass():
+    reqdata = ReqData('path', {'a': 1}, {'X-Test': 'x'})
+    assert dataclasses.is_dataclass(reqdata)
+    assert [f.name for f in dataclasses.fields(reqdata)] == ['path', 'params', 'headers', 'cert']
+    assert dataclasses.asdict(reqdata) == {'path': 'path', 'params': {'a': 1}, 'headers': {'X-Test': 'x'}, 'cert': None}
+
+    replaced = dataclasses.replace(reqdata, params={'b': 2})
+    assert replaced == ReqData('path', {'b': 2}, {'X-Test': 'x'})
+    # mappings are frozen as well
+    hash(replaced)
+    assert dataclasses.replace(reqdata) == reqdata
+
+
+def test_reqdata__fingerprint():
+    a = ReqData('path', {'b': 2, 'a': 1}, {'X-Test': 'x'})
+    assert a.fingerprint == ReqData('path', {'a': 1, 'b': 2}, {'x-test': 'x'}).fingerprint
+    assert a.fingerprint != ReqData('path', {'a': 1, 'b': '2'}, {'X-Test': 'x'}).fingerprint
+    assert a.fingerprint != ReqData('path', {'a': 1, 'b': 2}, {'X-Test': 'x'}, 'cert').fingerprint
+    # fingerprint should be stable across processes
+    assert ReqData('path').fingerprint == '57b5a844f2b171a1749a212b17f02db518840477'
+
+
+def test_reqdata__fingerprint_case_duplicates():
+    # names only differing in case, with values of different types
+    a = ReqData('path', headers={'X-Test': 1, 'x-test': 'x'})
+    assert a.fingerprint == ReqData('path', headers={'x-test': 'x', 'X-Test': 1}).fingerprint
+    assert a.fingerprint != ReqData('path', headers={'X-Test': 1}).fingerprint
+
+
+def test_reqdata__add():
+    base = ReqData('http://test/a/', {'a': 1}, {'X-A': 'a'}, 'cert')
+    result = base + ReqData('b', {'b': 2})
+    assert result == ReqData('http://test/a/b', {'a': 1, 'b': 2}, {'X-A': 'a'}, 'cert')
+    # unchanged mappings should be reused
+    assert result.headers is base.headers
+
+
+def test_reqdata__intern():
+    a = ReqData('path', {'a': 1}).intern()
+    b = ReqData('path', {'a': 1})
+    assert b.intern() is a
+    assert ReqData('other').intern() is not a
+
+    del a
+    gc.collect()
+    assert b.intern() is b
+
+
+def test_reqdata__pickle():
+    reqdata = ReqData('path', {'a': 1}, {'b': '2'}, ('cert', 'key'))
+    assert pickle.loads(pickle.dumps(reqdata)) == reqdata
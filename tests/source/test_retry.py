@@ -0,0 +1,120 @@
+import pytest
+import requests
+import email.utils
+from unittest.mock import patch
+
+from reqcli.source import SourceConfig, ReqData
+from reqcli.source.retry import RetryBudget, RetryHandler, parse_retry_after
+from reqcli.errors import ResponseStatusError
+
+from ..conftest import MOCK_URL, MOCK_PATH, _get_source
+
+
+@pytest.fixture(autouse=True)
+def reset_budgets():
+    getattr(RetryHandler, '_RetryHandler__budgets').clear()
+
+
+@pytest.fixture()
+def mock_sleep():
+    with patch('time.sleep') as mock:
+        yield mock
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('5', 5.0),
+    ('invalid', None),
+    (email.utils.formatdate(0, usegmt=True), 0.0),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after__date():
+    import time
+    value = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= parse_retry_after(value) <= 60  # type: ignore
+
+
+def test_retry(requests_mock, mock_sleep):
+    requests_mock.get(MOCK_URL, [
+        {'status_code': 503},
+        {'status_code': 429, 'headers': {'Retry-After': '7'}},
+        {'text': 'response'}
+    ])
+    source = _get_source(SourceConfig(retry_backoff_factor=1))
+
+    assert source.get_test().test_data == b'response'
+    assert requests_mock.call_count == 3
+    # first delay from backoff, second delay from header
+    delays = [c[0][0] for c in mock_sleep.call_args_list]
+    assert len(delays) == 2
+    assert 0.9 <= delays[0] <= 1
+    assert 6.9 <= delays[1] <= 7
+
+
+def test_retry__exception(requests_mock, mock_sleep):
+    requests_mock.get(MOCK_URL, [
+        {'exc': requests.ConnectTimeout},
+        {'text': 'response'}
+    ])
+    assert _get_source(None).get_test().test_data == b'response'
+    assert requests_mock.call_count == 2
+
+
+def test_retry__exception_exhausted(requests_mock, mock_sleep):
+    requests_mock.get(MOCK_URL, exc=requests.ConnectionError)
+    with pytest.raises(requests.ConnectionError):
+        _get_source(SourceConfig(http_retries=1)).get_test()
+    assert requests_mock.call_count == 2
+
+
+def test_retry__max_delay(requests_mock, mock_sleep):
+    requests_mock.get(MOCK_URL, status_code=503, headers={'Retry-After': '3600'})
+    with pytest.raises(ResponseStatusError):
+        _get_source(None).get_test()
+    assert requests_mock.call_count == 1
+    assert mock_sleep.call_count == 0
+
+
+def test_retry__not_cached_response(mock_sleep):
+    source = _get_source(None)
+    reqdata = ReqData(path=MOCK_PATH)
+    source.get(reqdata)
+    assert source.get(reqdata).from_cache  # type: ignore
+    assert mock_sleep.call_count == 0
+
+
+def test_retry__budget(requests_mock, mock_sleep):
+    requests_mock.get(MOCK_URL, status_code=503)
+    source = _get_source(SourceConfig(http_retries=10, retry_budget_ratio=0, retry_budget_min_per_second=0.3))
+
+    # 0.3/s * 10s window -> 3 retries in total, regardless of number of attempts
+    with pytest.raises(ResponseStatusError):
+        source.get_test()
+    assert requests_mock.call_count == 4
+
+    with pytest.raises(ResponseStatusError):
+        source.get_test()
+    assert requests_mock.call_count == 5
+
+
+def test_budget_ratio():
+    budget = RetryBudget(0.5, 0)
+    assert not budget.try_acquire()
+    for _ in range(4):
+        budget.record_request()
+    assert budget.try_acquire()
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+
+def test_budget_window():
+    budget = RetryBudget(0, 1, window=2)
+    with patch('time.monotonic', return_value=0):
+        assert budget.try_acquire()
+        assert budget.try_acquire()
+        assert not budget.try_acquire()
+    with patch('time.monotonic', return_value=10):
+        assert budget.try_acquire()
@@ -0,0 +1,307 @@
+import time
+import pytest
+import threading
+from concurrent.futures import CancelledError
+from unittest.mock import patch
+
+from reqcli.source import RequestScheduler, ReqData, SourceConfig
+from reqcli.source.ratelimit import RateLimitingMixin
+from reqcli.source.scheduler import RetryLater
+from reqcli.errors import ResponseStatusError
+
+from ..conftest import MOCK_BASE, MOCK_URL, MOCK_PATH, BaseTypeTest, _get_source
+
+
+@pytest.fixture(autouse=True)
+def reset_ratelimits():
+    getattr(RateLimitingMixin, '_RateLimitingMixin__last_call').clear()
+
+
+@pytest.fixture()
+def scheduler():
+    scheduler = RequestScheduler(max_workers=1)
+    yield scheduler
+    scheduler.shutdown(cancel_pending=True)
+
+
+def _block(scheduler, host='a'):
+    # occupies the (single) worker until the returned event is set
+    event = threading.Event()
+    started = threading.Event()
+
+    def fn():
+        started.set()
+        event.wait()
+    scheduler.submit(host, fn)
+    started.wait()
+    return event
+
+
+def test_priority(scheduler):
+    event = _block(scheduler)
+    order = []
+    futures = [
+        scheduler.submit(host, lambda p=p: order.append(p), priority=p)
+        for host, p in [('a', 0), ('b', 2), ('a', 1), ('b', 0)]
+    ]
+    event.set()
+    for f in futures:
+        f.result()
+    assert order == [2, 1, 0, 0]
+
+
+def test_host_concurrency():
+    scheduler = RequestScheduler(max_workers=4, max_concurrency_per_host=2)
+    lock = threading.Lock()
+    current = {'a': 0, 'b': 0}
+    peak = {'a': 0, 'b': 0}
+
+    def fn(host):
+        with lock:
+            current[host] += 1
+            peak[host] = max(peak[host], current[host])
+        time.sleep(0.02)
+        with lock:
+            current[host] -= 1
+
+    scheduler.set_host_limits('b', max_concurrency=1)
+    futures = [scheduler.submit(host, lambda h=host: fn(h)) for host in 'ab' * 5]
+    for f in futures:
+        f.result()
+    scheduler.shutdown()
+    assert peak == {'a': 2, 'b': 1}
+
+
+def test_ratelimit_interleave(scheduler):
+    scheduler.set_host_limits('a', requests_per_second=5)
+    event = _block(scheduler, 'x')
+    order = []
+    futures = [scheduler.submit(host, lambda h=host: order.append(h)) for host in 'aab']
+    start = time.monotonic()
+    event.set()
+    for f in futures:
+        f.result()
+
+    # second request to `a` has to wait, `b` should be run in the meantime
+    assert order == ['a', 'b', 'a']
+    assert time.monotonic() - start >= 0.15
+
+
+def test_set_host_limits_overwrite(scheduler):
+    scheduler.set_host_limits('a', max_concurrency=3)
+    scheduler.set_host_limits('a', max_concurrency=5, overwrite=False)
+    assert scheduler._hosts['a'].max_concurrency == 3
+
+
+def test_retry_later(scheduler):
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RetryLater(time.monotonic() + 0.1)
+        return 42
+
+    assert scheduler.submit('a', fn).result() == 42
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.1
+    assert scheduler.stats.rescheduled == 1
+
+
+def test_exception(scheduler):
+    def fn():
+        raise ValueError
+    with pytest.raises(ValueError):
+        scheduler.submit('a', fn).result()
+
+
+def test_cancel(scheduler):
+    event = _block(scheduler)
+    future = scheduler.submit('a', lambda: pytest.fail('should not be called'))
+    assert future.cancel()
+    event.set()
+    scheduler.submit('a', lambda: None).result()
+
+
+def _requeued(scheduler, calls):
+    def fn():
+        calls.append(1)
+        raise RetryLater(time.monotonic() + 0.2)
+    future = scheduler.submit('a', fn)
+    while not scheduler.stats.delayed:
+        time.sleep(0.01)
+    assert future.running()
+    return future
+
+
+def test_cancel__requeued(scheduler):
+    calls = []
+    future = _requeued(scheduler, calls)
+    assert future.cancel()
+    assert not future.cancel()
+    with pytest.raises(CancelledError):
+        future.result(timeout=1)
+    assert scheduler.stats.delayed == 0
+    time.sleep(0.3)
+    assert len(calls) == 1
+
+
+def test_shutdown__cancel_requeued():
+    scheduler = RequestScheduler(max_workers=1)
+    calls = []
+    future = _requeued(scheduler, calls)
+    scheduler.shutdown(cancel_pending=True)
+    with pytest.raises(CancelledError):
+        future.result(timeout=1)
+    assert len(calls) == 1
+
+
+def test_stats(scheduler):
+    event = _block(scheduler)
+    futures = [scheduler.submit(host, lambda: None) for host in 'aab']
+
+    stats = scheduler.stats
+    assert stats.queue_depth == 3
+    assert stats.queue_depth_by_host == {'a': 2, 'b': 1}
+    assert stats.in_flight == 1
+
+    time.sleep(0.05)
+    event.set()
+    for f in futures:
+        f.result()
+
+    stats = scheduler.stats
+    assert stats.queue_depth == 0
+    assert stats.completed == 4
+    assert stats.max_wait_time >= 0.05
+    assert 0 < stats.mean_wait_time <= stats.max_wait_time
+
+
+def test_shutdown():
+    scheduler = RequestScheduler()
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        scheduler.submit('a', lambda: None)
+
+
+def test_idle_timeout():
+    scheduler = RequestScheduler(idle_timeout=0.05)
+    scheduler.submit('a', lambda: None).result()
+    thread, = scheduler._threads
+    thread.join(1)
+    assert not thread.is_alive()
+    assert scheduler._threads == []
+
+    # workers are started again when needed
+    assert scheduler.submit('a', lambda: 1).result() == 1
+    scheduler.shutdown()
+    assert scheduler._threads == []
+
+
+# source integration
+
+def test_source_submit(scheduler):
+    source = _get_source(None, scheduler=scheduler)
+    result = source.submit(ReqData(path=MOCK_PATH), BaseTypeTest()).result()
+    assert isinstance(result, BaseTypeTest)
+    assert result.test_data == b'response'
+
+    res = source.submit(ReqData(path=MOCK_PATH)).result()
+    assert res.content == b'response'
+
+
+def test_source_submit__default_scheduler():
+    source = _get_source(None)
+    assert source.submit(ReqData(path=MOCK_PATH)).result().content == b'response'
+    assert isinstance(source._scheduler, RequestScheduler)
+
+
+def test_source_submit__scheduler_created_once():
+    source = _get_source(None)
+    barrier = threading.Barrier(8)
+    schedulers = []
+
+    def get():
+        barrier.wait()
+        schedulers.append(source._get_scheduler())
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(map(id, schedulers))) == 1
+
+
+def test_source_close(scheduler):
+    source = _get_source(None)
+    source.submit(ReqData(path=MOCK_PATH)).result()
+    owned = source._scheduler
+    threads = list(owned._threads)
+    source.close()
+    assert all(not t.is_alive() for t in threads)
+    with pytest.raises(RuntimeError):
+        owned.submit('a', lambda: None)
+
+    # new scheduler is created on demand
+    with source:
+        assert source.submit(ReqData(path=MOCK_PATH)).result().content == b'response'
+        assert source._scheduler is not owned
+
+    # schedulers passed to the source are not shut down
+    with _get_source(None, scheduler=scheduler) as source:
+        source.submit(ReqData(path=MOCK_PATH)).result()
+    assert scheduler.submit('a', lambda: 1).result() == 1
+
+
+@patch('time.sleep')
+def test_source_submit__retry(mock_sleep, requests_mock, scheduler):
+    requests_mock.get(MOCK_URL, [
+        {'status_code': 503, 'headers': {'Retry-After': '0'}},
+        {'text': 'response'}
+    ])
+    source = _get_source(None, scheduler=scheduler)
+    assert source.submit(ReqData(path=MOCK_PATH)).result().content == b'response'
+    assert requests_mock.call_count == 2
+    # retry was re-queued instead of waiting on the worker thread
+    assert scheduler.stats.rescheduled == 1
+    assert mock_sleep.call_count == 0
+
+
+def test_source_submit__status(requests_mock, scheduler):
+    requests_mock.get(MOCK_BASE + 'notfound', status_code=404)
+    source = _get_source(None, scheduler=scheduler)
+    with pytest.raises(ResponseStatusError):
+        source.submit(ReqData(path='notfound')).result()
+
+
+@pytest.mark.no_ratelimit_patch
+@patch('time.sleep')
+def test_source_submit__ratelimit(mock_sleep, scheduler):
+    source = _get_source(SourceConfig(enable_cache=False, requests_per_second=10))
+    source._scheduler = scheduler
+
+    start = time.monotonic()
+    futures = [source.submit(ReqData(path=MOCK_PATH)) for _ in range(3)]
+    for f in futures:
+        f.result()
+    # scheduler waits instead of the session
+    assert time.monotonic() - start >= 0.2
+    assert mock_sleep.call_count == 0
+
+
+@pytest.mark.no_ratelimit_patch
+def test_source_submit__ratelimit_cached(scheduler):
+    source = _get_source(SourceConfig(requests_per_second=4))
+    source._scheduler = scheduler
+    source.get(ReqData(path=MOCK_PATH))
+
+    # cache hits don't use up ratelimit slots
+    start = time.monotonic()
+    for _ in range(10):
+        assert source.submit(ReqData(path=MOCK_PATH)).result().from_cache is True
+    assert time.monotonic() - start < 0.15
+    assert scheduler.stats.rescheduled == 0
+
+    # requests that aren't cached are still limited
+    source.submit(ReqData(path=MOCK_PATH), skip_cache_read=True).result()
+    assert time.monotonic() - start >= 0.15
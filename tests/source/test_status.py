@@ -23,7 +23,7 @@ def mock_status(requests_mock):
 ])
 @pytest.mark.parametrize('func_name', ('get', 'get_reader'))
 def test_status(mode, success, fail, func_name):
-    source = _get_source(SourceConfig(response_status_checking=mode))
+    source = _get_source(SourceConfig(response_status_checking=mode, http_retries=0))
     func = getattr(source, func_name)
 
     def check(code):
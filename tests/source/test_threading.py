@@ -0,0 +1,55 @@
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from reqcli.source import SourceConfig, ReqData
+
+from ..conftest import _get_source
+
+
+def test_session_per_thread():
+    source = _get_source(None)
+    sessions = {}
+    barrier = threading.Barrier(3)
+
+    def get():
+        sessions[threading.get_ident()] = source._get_session()
+        assert source._get_session() is sessions[threading.get_ident()]
+        barrier.wait()  # keep threads alive, to avoid reused identifiers
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # creating thread uses main session, other threads use separate sessions
+    assert source._get_session() is source._session
+    assert len({id(s) for s in sessions.values()}) == 3
+    for session in sessions.values():
+        assert session is not source._session
+        # connection pools, cookies and cache should be shared
+        assert session.adapters is source._session.adapters
+        assert session.cookies is source._session.cookies
+        assert session.cache is source._session.cache
+        assert session.headers is not source._session.headers
+        assert session.headers == source._session.headers
+
+
+@pytest.mark.parametrize('enable_cache', (True, False))
+def test_stress(http_server, enable_cache):
+    source = _get_source(SourceConfig(enable_cache=enable_cache), http_server)
+
+    def get(i):
+        # mix of cached and uncached requests
+        path = f'path{i % 20}'
+        res = source.get(ReqData(path=path, params={'x': i % 5}), skip_cache=(i % 3 == 0))
+        return res.text == f'response:/{path}?x={i % 5}'
+
+    with ThreadPoolExecutor(16) as executor:
+        results = list(executor.map(get, range(400)))
+    assert all(results)
+
+    # connections should be reused
+    pool = source._session.adapters['http://'].poolmanager.connection_from_url(http_server)
+    assert pool.num_connections <= 16
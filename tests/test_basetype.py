@@ -1,10 +1,19 @@
 import io
+import os
+import copy
+import time
+import pickle
+import threading
 from typing import Optional
 import pytest
-from dataclasses import dataclass
-from construct import Byte, Struct, Computed
+import requests
+from dataclasses import dataclass, field
+from unittest.mock import patch
+from construct import Byte, Bytes, Computed, Int32ub, Lazy, StreamError, Struct, this
+from concurrent.futures import ProcessPoolExecutor
 
-from reqcli.type import BaseTypeLoadable, BaseTypeLoadableConstruct, XmlBaseType, TypeLoadConfig
+from reqcli.type import BaseTypeLoadable, BaseTypeLoadableConstruct, XmlBaseType, TypeLoadConfig, offload
+from reqcli.reader import IOReader, ResponseReader
 from reqcli.errors import TypeAlreadyLoadedError, XmlSchemaError
 from reqcli.utils import xml
 
@@ -66,6 +75,38 @@ def test_basetypeconstruct():
     assert testtype.test_construct == {'a': 1, 'b': 2, 'param': 42}
 
 
+@pytest.mark.parametrize('seekable', (True, False))
+def test_basetypeconstruct__stream(requests_mock, seekable):
+    class BaseTypeTestConstructStream(BaseTypeLoadableConstruct):
+        def _read(self, reader, config):
+            self.test_construct = self._parse_construct_stream(reader, config)
+            if seekable:
+                self.test_payload = self.test_construct.payload()
+            else:
+                # payload was skipped, but can't be read anymore
+                with pytest.raises(StreamError):
+                    self.test_construct.payload()
+                self.test_payload = None
+
+    struct = Struct(
+        'size' / Int32ub,
+        'payload' / Lazy(Bytes(this.size)),
+        'trailer' / Byte
+    )
+    data = b'\x00\x00\x00\x04abcd\x2a'
+
+    if seekable:
+        reader = IOReader(io.BytesIO(data))
+    else:
+        requests_mock.get('http://test', content=data)
+        reader = ResponseReader(requests.get('http://test', stream=True))
+    testtype = BaseTypeTestConstructStream(struct).load(reader)
+
+    assert testtype.test_construct.size == 4
+    assert testtype.test_construct.trailer == 0x2a
+    assert testtype.test_payload == (b'abcd' if seekable else None)
+
+
 @pytest.mark.parametrize('schema, xml_str, expect_err', [
     # valid schema, no superset
     (({'value': None}, False), '<value>test</value>', False),
@@ -99,3 +140,273 @@ def test_xmlbasetype(schema, xml_str, expect_err):
     else:
         xmltype = XmlType._parse(xmldata)
         assert xmltype.x == 'test'
+
+
+@dataclass(frozen=True)
+class XmlManyType(XmlBaseType):
+    x: str
+    y: Optional[str] = None
+
+    @classmethod
+    def _parse_internal(cls, xml):
+        return {'x': xml.value.text, **({'y': xml.other.text} if hasattr(xml, 'other') else {})}
+
+    @classmethod
+    def _get_schema(cls):
+        return ({'value': None, 'other': None}, True)
+
+
+@pytest.mark.parametrize('parser', (None, xml.get_parser()))
+def test_xmlbasetype__parse_many(parser):
+    root = xml.read_object(io.BytesIO(b'''<root>
+        <e><value>a</value></e>
+        <e><value>b</value><other>c</other></e>
+        <e><value>d</value></e>
+    </root>'''), parser)
+
+    with patch.object(xml, 'validate_schema', wraps=xml.validate_schema) as mock_validate:
+        result = XmlManyType._parse_many(root.getchildren())
+    assert result == [XmlManyType('a'), XmlManyType('b', 'c'), XmlManyType('d')]
+    # schema should only be validated once for each structure
+    assert mock_validate.call_count == 2
+
+
+def test_xmlbasetype__parse_many__invalid():
+    root = xml.read_object(io.BytesIO(b'<root><e><value>a</value></e><e><x/></e></root>'))
+    with pytest.raises(XmlSchemaError):
+        XmlManyType._parse_many(root.getchildren())
+
+
+def test_xmlbasetype__parse_many__constructor():
+    calls = []
+
+    @dataclass
+    class PostInitType(XmlBaseType):
+        x: str
+
+        def __post_init__(self):
+            calls.append(self.x)
+
+        @classmethod
+        def _parse_internal(cls, xml):
+            return {'x': xml.text}
+
+    root = xml.read_object(io.BytesIO(b'<root><e>a</e><e>b</e></root>'))
+    # regular constructor should be used if there's additional initialization
+    assert PostInitType._parse_many(root.getchildren()) == [PostInitType('a'), PostInitType('b')]
+    assert calls == ['a', 'b', 'a', 'b']
+
+    # fast path should bypass `__init__`, and fall back to it for missing fields
+    root = xml.read_object(io.BytesIO(b'<root><e><value>a</value><other>b</other></e><e><value>c</value></e></root>'))
+    expected = [XmlManyType('a', 'b'), XmlManyType('c')]
+    XmlManyType._parse_many([])  # initialize constructor before patching
+    with patch.object(XmlManyType, '__init__', side_effect=XmlManyType.__init__, autospec=True) as mock_init:
+        assert XmlManyType._parse_many(root.getchildren()) == expected
+    assert mock_init.call_count == 1
+
+
+def test_xmlbasetype__parse_many__init_false():
+    @dataclass(frozen=True)
+    class InitFalseType(XmlBaseType):
+        x: str
+        tags: list = field(default_factory=list, init=False)
+
+        @classmethod
+        def _parse_internal(cls, xml):
+            return {'x': xml.text}
+
+    class CustomInitType(XmlManyType):
+        def __init__(self, x, y=None):
+            super().__init__(x.upper(), y)
+
+    root = xml.read_object(io.BytesIO(b'<root><e>a</e><e>b</e></root>'))
+    # fields with `init=False` are set by the regular constructor
+    result = InitFalseType._parse_many(root.getchildren())
+    assert result == [InitFalseType('a'), InitFalseType('b')]
+    assert result[0].tags == []
+
+    # `__init__` of subclasses is used as well
+    root = xml.read_object(io.BytesIO(b'<root><e><value>a</value><other>b</other></e></root>'))
+    inst, = CustomInitType._parse_many(root.getchildren())
+    assert (inst.x, inst.y) == ('A', 'b')
+
+
+@pytest.mark.parametrize('detach', (False, True))
+def test_xmlbasetype__lazy(detach):
+    @dataclass(frozen=True)
+    class LazyType(XmlManyType):
+        pass
+
+    root = xml.read_object(io.BytesIO(b'<root><e><value>a</value><other>b</other></e><e><value>c</value></e></root>'))
+    with patch.object(LazyType, '_parse_internal', wraps=LazyType._parse_internal) as mock_parse:
+        result = LazyType._parse_many(root.getchildren(), lazy=True, detach=detach)
+        assert mock_parse.call_count == 0
+        assert result[0].y == 'b'
+        assert mock_parse.call_count == 1
+        # all fields are parsed at once without field parsers, missing ones use defaults
+        assert result[0].x == 'a'
+        assert result[1] == LazyType('c')
+        assert mock_parse.call_count == 2
+    assert result == [LazyType('a', 'b'), LazyType('c')]
+    assert '_xml_element' not in vars(result[0])
+    # instances use the original class once materialized, which isn't modified
+    assert type(result[0]) is LazyType
+    assert 'x' not in vars(LazyType) and 'y' not in vars(LazyType)
+    # eager parsing is unaffected
+    assert LazyType._parse(root.e) == LazyType('a', 'b')
+    assert LazyType.y is None
+
+
+def test_xmlbasetype__lazy__copy():
+    root = xml.read_object(io.BytesIO(b'<root><e><value>a</value></e></root>'))
+    inst = XmlManyType._parse(root.e, lazy=True)
+    assert isinstance(inst, XmlManyType)
+    assert type(inst) is not XmlManyType
+    assert hash(inst) == hash(XmlManyType('a'))
+    assert pickle.loads(pickle.dumps(inst)) == XmlManyType('a')
+    assert type(copy.copy(XmlManyType._parse(root.e, lazy=True))) is XmlManyType
+
+
+def test_xmlbasetype__lazy__required():
+    @dataclass
+    class MissingParserType(XmlBaseType):
+        x: str
+        y: str
+
+        @classmethod
+        def _parse_internal(cls, xml):
+            return {'x': xml.text}
+
+        @classmethod
+        def _get_field_parsers(cls):
+            return {'x': lambda xml: xml.text}
+
+    @dataclass
+    class MissingValueType(MissingParserType):
+        @classmethod
+        def _get_field_parsers(cls):
+            return None
+
+    root = xml.read_object(io.BytesIO(b'<root><e>a</e></root>'))
+    # required fields must be parsed
+    with pytest.raises(TypeError):
+        MissingParserType._parse(root.e, lazy=True)
+    inst = MissingValueType._parse(root.e, lazy=True)
+    with pytest.raises(TypeError):
+        inst.x
+
+
+def test_xmlbasetype__lazy__threads():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    @dataclass(frozen=True)
+    class SlowType(XmlBaseType):
+        x: str
+
+        @classmethod
+        def _parse_internal(cls, xml):
+            calls.append(1)
+            time.sleep(0.05)
+            return {'x': xml.text}
+
+    root = xml.read_object(io.BytesIO(b'<root><e>a</e></root>'))
+    inst = SlowType._parse(root.e, lazy=True)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(inst.x)
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ['a'] * 8
+    assert len(calls) == 1
+
+
+def test_xmlbasetype__lazy__field_parsers():
+    calls = []
+
+    @dataclass
+    class LazyFieldType(XmlBaseType):
+        x: str
+        y: int = 0
+        z: list = field(default_factory=list)
+
+        @classmethod
+        def _parse_internal(cls, xml):
+            raise AssertionError
+
+        @classmethod
+        def _get_field_parsers(cls):
+            return {
+                'x': lambda xml: calls.append('x') or xml.value.text,
+                'y': lambda xml: calls.append('y') or int(xml.num)
+            }
+
+    root = xml.read_object(io.BytesIO(b'<root><e><value>a</value><num>5</num></e></root>'))
+    inst = LazyFieldType._parse(root.e, lazy=True)
+    assert inst.z == []
+    assert inst.x == 'a'
+    assert calls == ['x']
+    assert '_xml_element' in vars(inst)
+    assert inst.y == 5
+    assert calls == ['x', 'y']
+    assert '_xml_element' not in vars(inst)
+    assert inst == LazyFieldType('a', 5)
+
+    with pytest.raises(XmlSchemaError):
+        XmlManyType._parse_many(root.getchildren(), lazy=True)
+
+
+# offload.py
+
+class OffloadTestType(BaseTypeLoadable):
+    def _read(self, reader, config):
+        self.test_data = reader.read()
+        self.test_config = config
+        self.test_pid = os.getpid()
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with ProcessPoolExecutor(1) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize('size', (0, 10, offload.INLINE_MAX_SIZE + 10))
+def test_offload(executor, size):
+    data = os.urandom(size)
+    config = TypeLoadConfig(construct_kwargs={'x': 1})
+    inst = OffloadTestType()
+
+    removed = threading.Event()
+    orig_remove = os.remove
+
+    def remove(path):
+        orig_remove(path)
+        removed.set()
+
+    with patch('os.remove', side_effect=remove) as mock_remove:
+        future = offload.load_offloaded(executor, inst, IOReader(io.BytesIO(data)), config)
+        result = future.result()
+        # temporary file should only be used for large bodies, and should be removed afterwards;
+        #  done callbacks might still be running once `result` returns
+        if size > offload.INLINE_MAX_SIZE:
+            assert removed.wait(5)
+    assert mock_remove.call_count == (size > offload.INLINE_MAX_SIZE)
+    assert result.test_data == data
+    assert result.test_config == config
+    assert result.test_pid != os.getpid()
+    # loaded in the executor, the original instance is not modified
+    assert not hasattr(inst, 'test_data')
+
+
+def test_offload__error(executor):
+    class Unpicklable(OffloadTestType):
+        pass
+    # local classes can't be pickled
+    with pytest.raises((AttributeError, pickle.PicklingError)):
+        offload.load_offloaded(executor, Unpicklable(), IOReader(io.BytesIO(b'')), TypeLoadConfig()).result()
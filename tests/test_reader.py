@@ -1,11 +1,14 @@
 import os
 import io
 import gzip
+import zlib
 import pytest
 import requests
+from unittest.mock import patch
 
-from reqcli.reader import Reader, IOReader, ResponseReader
-from reqcli.errors import ReaderError
+from reqcli.reader import Reader, IOReader, ResponseReader, SpooledReader
+from reqcli.errors import ReaderError, ResponseTooLargeError
+from reqcli.utils import decoding
 
 
 @pytest.fixture()
@@ -80,6 +83,32 @@ def test_responsereader__tell(requests_mock):
     assert reader.tell() == 5
 
 
+def test_responsereader__readinto(requests_mock):
+    requests_mock.get('http://test', content=b'response')
+    reader = ResponseReader(requests.get('http://test', stream=True))
+    buf = bytearray(5)
+    assert reader.readinto(buf) == 5
+    assert buf == b'respo'
+    assert reader.readinto(buf) == 3
+    assert buf[:3] == b'nse'
+    assert reader.readinto(buf) == 0
+    assert reader.tell() == 8
+
+
+def test_responsereader__seek(requests_mock):
+    requests_mock.get('http://test', content=b'response')
+    reader = ResponseReader(requests.get('http://test', stream=True))
+    assert reader.seek(2) == 2
+    assert reader.seek(2, os.SEEK_CUR) == 4
+    assert reader.read(2) == b'on'
+    # backwards seeks are not supported
+    with pytest.raises(io.UnsupportedOperation):
+        reader.seek(0)
+    with pytest.raises(io.UnsupportedOperation):
+        reader.seek(0, os.SEEK_END)
+    assert reader.seek(100) == 8
+
+
 def test_responsereader__tell_encoded(requests_mock):
     requests_mock.get(
         'http://test',
@@ -91,3 +120,252 @@ def test_responsereader__tell_encoded(requests_mock):
     read_data = reader.read(100)  # read_data is not necessarily 100 bytes
     assert read_data.startswith(b'response')
     assert reader.tell() == len(read_data)
+
+
+def _compress(encoding, data):
+    if encoding == 'gzip':
+        return gzip.compress(data)
+    elif encoding == 'deflate':
+        return zlib.compress(data)
+    elif encoding == 'deflate-raw':
+        obj = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        return obj.compress(data) + obj.flush()
+    elif encoding == 'br':
+        return pytest.importorskip('brotli').compress(data)
+    elif encoding == 'zstd':
+        return pytest.importorskip('zstandard').ZstdCompressor().compress(data)
+    raise AssertionError
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate', 'deflate-raw', 'br', 'zstd'])
+def test_responsereader__decode(requests_mock, encoding):
+    data = b'response' * 10000 + os.urandom(50000)
+    body = _compress(encoding, data)
+    requests_mock.get('http://test', content=body, headers={'Content-Encoding': encoding.split('-')[0], 'Content-Length': str(len(body))})
+    reader = ResponseReader(requests.get('http://test', stream=True))
+    assert reader.size is None
+    assert reader.wire_size == len(body)
+
+    # reads should return exactly the requested amount of data
+    assert reader.read(100) == data[:100]
+    assert reader.tell() == 100
+    assert 0 < reader.wire_bytes <= len(body)
+    if encoding != 'zstd':  # zstd blocks (up to 128KiB) are only decoded once complete
+        assert reader.wire_bytes < len(body)
+    assert reader.read() == data[100:]
+    assert reader.read(1) == b''
+    assert reader.wire_bytes == len(body)
+
+
+def test_responsereader__decode_multiple(requests_mock):
+    data = b'response' * 1000
+    requests_mock.get('http://test', content=_compress('gzip', _compress('deflate', data)), headers={'Content-Encoding': 'deflate, gzip'})
+    assert ResponseReader(requests.get('http://test', stream=True)).read() == data
+
+
+@pytest.mark.parametrize('encoding', ['deflate', 'deflate-raw'])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3])
+def test_decoder__deflate_split(encoding, chunk_size):
+    data = b'response' * 100
+    body = _compress(encoding, data)
+    decoder = decoding.get_decoder('deflate')
+    # first chunks might not produce any output
+    result = b''.join(decoder.decompress(body[i:i + chunk_size]) for i in range(0, len(body), chunk_size))
+    assert result + decoder.flush() == data
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate', 'deflate-raw', 'br', 'zstd', 'deflate, gzip'])
+def test_decoder__max_length(encoding):
+    data = b'\0' * (16 * 1024 * 1024) + b'end'
+    body = data
+    for e in encoding.split(', '):
+        body = _compress(e, body)
+    decoder = decoding.get_decoder(encoding.split('-')[0])
+
+    # output should be limited, regardless of how much the input expands
+    parts = [decoder.decompress(body, 64 * 1024)]
+    while parts[-1]:
+        parts.append(decoder.decompress(b'', 64 * 1024))
+    assert max(len(part) for part in parts) == 64 * 1024
+    assert b''.join(parts) + decoder.flush() == data
+
+
+def test_decoder__gzip_members():
+    decoder = decoding.get_decoder('gzip')
+    body = gzip.compress(b'a' * 100) + gzip.compress(b'b' * 100)
+    assert decoder.decompress(body, 150) == b'a' * 100 + b'b' * 50
+    assert decoder.decompress(b'', 150) == b'b' * 50
+    assert decoder.decompress(b'', 150) == b''
+
+
+def test_responsereader__decode_invalid(requests_mock):
+    requests_mock.get('http://test', content=b'not gzip', headers={'Content-Encoding': 'gzip'})
+    with pytest.raises(ReaderError):
+        ResponseReader(requests.get('http://test', stream=True)).read()
+
+
+def test_responsereader__decode_unsupported(requests_mock):
+    requests_mock.get('http://test', content=b'data', headers={'Content-Encoding': 'unknown'})
+    reader = ResponseReader(requests.get('http://test', stream=True))
+    # data is returned as-is
+    assert reader.read() == b'data'
+    assert reader.wire_bytes == 4
+
+
+def test_responsereader__decode_cached(requests_mock):
+    requests_mock.get('http://test', content=b'decoded', headers={'Content-Encoding': 'gzip', 'Content-Length': '7'})
+    res = requests.get('http://test', stream=True)
+    # cached responses are already decoded
+    res.from_cache = True  # type: ignore
+    with patch('reqcli.utils.decoding.get_decoder') as mock_get_decoder:
+        reader = ResponseReader(res)
+    assert not mock_get_decoder.called
+    assert reader.size == 7
+
+
+@pytest.fixture()
+def buffered_reader(requests_mock):
+    requests_mock.get('http://test', content=b'line1\nline2\n' + b'x' * 100)
+    res = requests.get('http://test', stream=True)
+    with patch.object(res.raw, 'read', wraps=res.raw.read) as mock_read:
+        yield ResponseReader(res, buffer_size=8), mock_read
+
+
+def test_responsereader__buffered_read(buffered_reader):
+    reader, mock_read = buffered_reader
+    assert reader.read(1) == b'l'
+    assert reader.read(2) == b'in'
+    # small reads should be served from buffer
+    assert mock_read.call_count == 1
+    assert reader.tell() == 3
+    # large reads bypass the buffer
+    assert reader.read(20) == b'e1\nline2\n' + b'x' * 11
+    assert mock_read.call_args[0][0] == 15
+    assert reader.read() == b'x' * 89
+    assert reader.tell() == 112
+    assert reader.wire_bytes == 112
+
+
+def test_responsereader__peek(buffered_reader):
+    reader, mock_read = buffered_reader
+    assert reader.peek() == b'line1\nli'
+    assert reader.peek(100) == b'line1\nli'
+    assert reader.tell() == 0
+    assert reader.read(4) == b'line'
+    assert reader.peek() == b'1\nli'
+    assert mock_read.call_count == 1
+
+
+def test_responsereader__read1(buffered_reader):
+    reader, _ = buffered_reader
+    assert reader.read1(3) == b'lin'
+    assert reader.read1() == b'e1\nli'
+    assert reader.read1(100) == b'ne2\nxxxx'
+    assert reader.tell() == 16
+
+    buf = bytearray(100)
+    assert reader.readinto1(buf) == 8
+    assert buf[:8] == b'x' * 8
+
+
+def test_responsereader__readline(buffered_reader):
+    reader, _ = buffered_reader
+    assert reader.readline() == b'line1\n'
+    assert reader.readline(3) == b'lin'
+    assert reader.readline() == b'e2\n'
+    assert reader.readline(10) == b'x' * 10
+    assert reader.readline() == b'x' * 90
+    assert reader.readline() == b''
+    assert reader.tell() == 112
+
+
+def test_responsereader__iter(buffered_reader):
+    reader, _ = buffered_reader
+    assert reader.readline(3) == b'lin'
+    assert list(reader) == [b'e1\n', b'line2\n', b'x' * 100]
+    assert list(reader) == []
+
+
+def test_responsereader__readlines(buffered_reader):
+    reader, _ = buffered_reader
+    assert reader.readlines(2) == [b'line1\n']
+    assert reader.readlines() == [b'line2\n', b'x' * 100]
+    assert reader.readlines() == []
+
+
+def test_responsereader__buffered_decode(requests_mock):
+    data = b'\n'.join(str(i).encode() for i in range(10000))
+    requests_mock.get('http://test', content=gzip.compress(data), headers={'Content-Encoding': 'gzip'})
+    reader = ResponseReader(requests.get('http://test', stream=True), buffer_size=100)
+    lines = []
+    while True:
+        line = reader.readline()
+        if not line:
+            break
+        lines.append(line)
+    assert b''.join(lines) == data
+    assert len(lines) == 10000
+
+
+@pytest.mark.parametrize('headers', ({}, {'Content-Length': '100'}))
+def test_responsereader__max_size(requests_mock, headers):
+    requests_mock.get('http://test', content=b'x' * 100, headers=headers)
+    assert ResponseReader(requests.get('http://test', stream=True), max_size=100).read() == b'x' * 100
+
+    def read():
+        ResponseReader(requests.get('http://test', stream=True), max_size=99, buffer_size=8).read()
+    with pytest.raises(ResponseTooLargeError):
+        read()
+
+
+def test_responsereader__max_size_decoded(requests_mock):
+    body = gzip.compress(b'x' * 100000)
+    requests_mock.get('http://test', content=body, headers={'Content-Encoding': 'gzip', 'Content-Length': str(len(body))})
+    reader = ResponseReader(requests.get('http://test', stream=True), max_size=50000)
+    # limit applies to the decoded size, which is only known while reading
+    with pytest.raises(ResponseTooLargeError):
+        reader.read()
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br', 'zstd'])
+def test_responsereader__max_size_bomb(requests_mock, encoding):
+    # small body that expands to 16 MiB
+    body = _compress(encoding, b'\0' * (16 * 1024 * 1024))
+    assert len(body) < 20 * 1024
+    requests_mock.get('http://test', content=body, headers={'Content-Encoding': encoding})
+    reader = ResponseReader(requests.get('http://test', stream=True), max_size=1000)
+
+    decoder_cls = type(decoding.get_decoder(encoding))
+    decompress = decoder_cls.decompress
+    sizes = []
+
+    def decompress_wrapper(self, data, max_length=0):
+        result = decompress(self, data, max_length)
+        sizes.append(len(result))
+        return result
+
+    with patch.object(decoder_cls, 'decompress', decompress_wrapper):
+        with pytest.raises(ResponseTooLargeError):
+            reader.read()
+    # decoding should stop right after exceeding the limit
+    assert sum(sizes) == 1001
+
+
+@pytest.mark.parametrize('threshold, spilled', ((1000, False), (100, True)))
+def test_spooledreader(requests_mock, threshold, spilled):
+    data = os.urandom(500)
+    requests_mock.get('http://test', content=data)
+    res = requests.get('http://test', stream=True)
+    reader = SpooledReader(ResponseReader(res), threshold, chunk_size=64)
+    # body is read entirely
+    assert res.raw.isclosed()
+    assert reader.spilled is spilled
+    assert reader.size == 500
+
+    assert reader.read(10) == data[:10]
+    reader.seek(0)
+    assert reader.read() == data
+    view = reader.getbuffer()
+    assert view == data
+    view.release()
+    reader.close()
@@ -0,0 +1,207 @@
+import io
+import json
+import pytest
+import threading
+
+from reqcli import tracing
+from reqcli.source import ReqData, SourceConfig
+
+from .conftest import BaseTypeTest, _get_source
+
+
+class ListExporter(tracing.SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def get(self, name):
+        return [span for span in self.spans if span.name == name]
+
+
+@pytest.fixture()
+def exporter():
+    return ListExporter()
+
+
+def test_tracer(exporter):
+    tracer = tracing.Tracer(exporter)
+    with tracer.span('root', a=1) as root:
+        assert tracing.current_span() is root
+        with tracing.span('child') as child:
+            tracing.set_attributes(b=2)
+        with pytest.raises(ValueError):
+            with tracer.span('failed'):
+                raise ValueError('test')
+    assert tracing.current_span() is None
+
+    # spans are exported once finished
+    assert [span.name for span in exporter.spans] == ['child', 'failed', 'root']
+    failed = exporter.spans[1]
+    assert failed.error == 'ValueError: test'
+    assert child.parent_id == failed.parent_id == root.span_id
+    assert child.trace_id == root.trace_id
+    assert root.parent_id is None
+    assert root.attributes == {'a': 1}
+    assert child.attributes == {'b': 2}
+    assert root.duration >= child.duration >= 0
+
+    # new trace
+    with tracer.span('other') as other:
+        pass
+    assert other.trace_id != root.trace_id
+
+
+def test_tracer__no_active_span(exporter):
+    with tracing.span('ignored') as span:
+        tracing.set_attributes(a=1)
+    assert span is None
+
+    # not sampled, children are skipped as well
+    tracer = tracing.Tracer(exporter, sample_rate=0)
+    with tracer.span('root') as root:
+        with tracing.span('child') as child:
+            pass
+    assert root is None and child is None
+    assert exporter.spans == []
+
+
+def test_tracer__sample_rate(exporter):
+    tracer = tracing.Tracer(exporter, sample_rate=0.5)
+
+    def thread_func(parent):
+        with tracer.span('thread', parent=parent):
+            pass
+
+    sampled = 0
+    for _ in range(100):
+        with tracer.span('root') as root:
+            sampled += root is not None
+            with tracer.span('child'):
+                with tracing.span('grandchild'):
+                    tracing.set_attributes(a=1)
+            # parents are passed to other threads explicitly
+            thread = threading.Thread(target=thread_func, args=(tracing.current_span(),))
+            thread.start()
+            thread.join()
+    assert 0 < sampled < 100
+
+    # traces are either exported or dropped entirely
+    roots = exporter.get('root')
+    assert len(roots) == sampled
+    assert all(span.parent_id is None for span in roots)
+    assert len(exporter.spans) == 4 * sampled
+    span_ids = {span.span_id for span in exporter.spans}
+    assert all(span.parent_id in span_ids for span in exporter.spans if span.name != 'root')
+
+
+def test_tracer__failing_exporter(exporter):
+    class FailingExporter(tracing.SpanExporter):
+        def export(self, span):
+            raise RuntimeError
+
+    tracer = tracing.Tracer(FailingExporter(), exporter)
+    with tracer.span('root'):
+        pass
+    assert len(exporter.spans) == 1
+
+
+def test_json_lines_exporter(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = tracing.Tracer(tracing.JsonLinesExporter(path))
+    with tracer.span('root', obj=object()):
+        with tracer.span('child', n=1):
+            pass
+    tracer.close()
+
+    with open(path) as f:
+        spans = [json.loads(line) for line in f]
+    assert [span['name'] for span in spans] == ['child', 'root']
+    assert spans[0]['attributes'] == {'n': 1}
+    assert spans[0]['parent_id'] == spans[1]['span_id']
+    assert spans[1]['attributes']['obj'].startswith('<object')
+
+    # also works with file objects, which are left open
+    out = io.StringIO()
+    exporter = tracing.JsonLinesExporter(out)
+    with tracing.Tracer(exporter).span('y'):
+        pass
+    exporter.close()
+    assert json.loads(out.getvalue())['name'] == 'y'
+
+
+def test_source(exporter, http_server):
+    source = _get_source(SourceConfig(tracer=tracing.Tracer(exporter)), http_server)
+    source._create_type(ReqData(path='path'), BaseTypeTest())
+
+    create, = exporter.get('reqcli.create_type')
+    get, = exporter.get('reqcli.get')
+    attempt, = exporter.get('reqcli.attempt')
+    lookup, = exporter.get('reqcli.cache_lookup')
+    http, = exporter.get('reqcli.http')
+    connect, = exporter.get('reqcli.connect')
+    tcp_connect, = exporter.get('reqcli.tcp_connect')
+    load, = exporter.get('reqcli.load')
+
+    assert create.parent_id is None
+    assert create.attributes['type'] == 'BaseTypeTest'
+    assert create.attributes['body_bytes'] == len('response:/path')
+    assert get.parent_id == load.parent_id == create.span_id
+    assert attempt.parent_id == get.span_id
+    assert lookup.parent_id == http.parent_id == attempt.span_id
+    assert connect.parent_id == http.span_id
+    assert tcp_connect.parent_id == connect.span_id
+
+    assert get.attributes == {'url': http_server + 'path', 'status': 200, 'from_cache': False}
+    assert attempt.attributes['host'] == http_server.split('/')[2]
+    assert attempt.attributes['attempt'] == 0
+    assert lookup.attributes == {'hit': False}
+    assert http.attributes == {'status': 200}
+    assert connect.attributes['tls'] is False
+
+    # cached response
+    exporter.spans.clear()
+    source.get(ReqData(path='path'))
+    assert [span.name for span in exporter.spans] == ['reqcli.cache_lookup', 'reqcli.attempt', 'reqcli.get']
+    assert exporter.spans[0].attributes == {'hit': True}
+    assert exporter.spans[2].attributes['from_cache'] is True
+
+
+def test_source__submit(exporter, http_server):
+    tracer = tracing.Tracer(exporter)
+    source = _get_source(SourceConfig(tracer=tracer, enable_cache=False), http_server)
+    with tracer.span('root') as root:
+        source.submit(ReqData(path='path'), BaseTypeTest()).result()
+        source.submit(ReqData(path='path')).result()
+
+    submits = exporter.get('reqcli.submit')
+    assert len(submits) == 2
+    # worker spans belong to the same trace
+    assert all(span.parent_id == root.span_id for span in submits)
+    assert all(span.attributes['queued'] >= 0 for span in submits)
+    load, = exporter.get('reqcli.load')
+    read_body, = exporter.get('reqcli.read_body')
+    assert load.parent_id == submits[0].span_id
+    assert read_body.parent_id == submits[1].span_id
+
+
+@pytest.mark.no_ratelimit_patch
+def test_source__ratelimit(exporter, http_server):
+    source = _get_source(SourceConfig(tracer=tracing.Tracer(exporter), enable_cache=False, requests_per_second=20), http_server)
+    source.get(ReqData(path='a'))
+    source.get(ReqData(path='b'))
+
+    wait, = exporter.get('reqcli.ratelimit_wait')
+    assert wait.attributes['wait'] > 0
+    assert wait.duration >= wait.attributes['wait'] * 0.9
+
+
+def test_source__spooled(exporter, http_server):
+    source = _get_source(SourceConfig(tracer=tracing.Tracer(exporter), enable_cache=False, spill_threshold=1024), http_server)
+    source._create_type(ReqData(path='path'), BaseTypeTest())
+
+    create, = exporter.get('reqcli.create_type')
+    read_body, = exporter.get('reqcli.read_body')
+    assert read_body.parent_id == create.span_id
+    assert read_body.attributes == {'body_bytes': len('response:/path'), 'spilled': False}
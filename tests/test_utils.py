@@ -1,8 +1,12 @@
 import io
+import socket
+import pickle
 import pytest
+import threading
+import lxml.objectify
 from unittest.mock import patch
 
-from reqcli.utils import dicts, xml
+from reqcli.utils import dicts, dns, xml
 from reqcli.utils.fingerprint_adapter import FingerprintAdapter
 from reqcli.errors import XmlLoadError, XmlSchemaError
 
@@ -39,8 +43,60 @@ def test_dicts__is_dict_subset_deep__invalid(a, b):
     assert not dicts.is_dict_subset_deep(a, b)
 
 
+def test_dicts__frozendict():
+    d = dicts.FrozenDict({'a': 1}, b=2)
+    assert d == {'a': 1, 'b': 2}
+    assert d == dicts.FrozenDict(b=2, a=1)
+    assert hash(d) == hash(dicts.FrozenDict(b=2, a=1))
+    assert repr(d) == "{'a': 1, 'b': 2}"
+    assert pickle.loads(pickle.dumps(d)) == d
+    with pytest.raises(TypeError):
+        d['c'] = 3  # type: ignore
+    with pytest.raises(AttributeError):
+        d.x = 1  # type: ignore
+
+
 # xml.py
 
+def test_dns__cache():
+    now = [1000.0]
+    cache = dns.DnsCache(10, max_entries=2)
+    with patch('time.monotonic', side_effect=lambda: now[0]), \
+            patch('socket.getaddrinfo', return_value=[(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', 80))]) as mock_getaddrinfo:
+        assert cache.resolve('a', 80) == cache.resolve('a', 80)
+        assert mock_getaddrinfo.call_count == 1
+
+        # entries expire after ttl
+        now[0] += 10
+        cache.resolve('a', 80)
+        assert mock_getaddrinfo.call_count == 2
+
+        # oldest entries are dropped if full
+        cache.resolve('b', 80)
+        cache.resolve('c', 80)
+        cache.resolve('a', 80)
+        assert mock_getaddrinfo.call_count == 5
+
+        cache.invalidate('c')
+        cache.resolve('c', 80)
+        assert mock_getaddrinfo.call_count == 6
+
+
+def test_dns__create_connection():
+    server = socket.create_server(('127.0.0.1', 0))
+    port = server.getsockname()[1]
+    cache = dns.DnsCache(10)
+    with server, patch('socket.getaddrinfo', wraps=socket.getaddrinfo) as mock_getaddrinfo:
+        for _ in range(2):
+            cache.create_connection(('127.0.0.1', port), socket_options=[(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]).close()
+        assert mock_getaddrinfo.call_count == 1
+
+    # failed connections invalidate cached addresses
+    with pytest.raises(OSError):
+        cache.create_connection(('127.0.0.1', port))
+    assert cache._entries == {}
+
+
 def test_xml__load_root():
     # invalid
     with pytest.raises(XmlLoadError):
@@ -86,6 +142,30 @@ def test_xml__get_tag_schema(xml_element):
     assert xml.get_tag_schema(xml_element) == {'node': {'el1': None, 'el2': None}}
 
 
+def test_xml__get_tag_signature(xml_element):
+    assert xml.get_tag_signature(xml_element) == (('node', (('el1', None), ('el1', None), ('el2', None))),)
+    assert hash(xml.get_tag_signature(xml_element))
+
+
+def test_xml__get_parser():
+    parser = xml.get_parser()
+    assert xml.get_parser() is parser
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(xml.get_parser()))
+    t.start()
+    t.join()
+    assert other[0] is not parser
+
+
+def test_xml__read_object__parser():
+    root = xml.read_object(io.BytesIO(b'<root>\n  <!-- comment -->\n  <a>1</a>\n</root>'), xml.get_parser())
+    assert root.a.text == '1'
+    assert xml.get_child_tags(root) == {'a'}
+    # no type guessing
+    assert type(root.a) is lxml.objectify.ObjectifiedElement
+
+
 def test_xml__validate_schema(xml_element):
     xml.validate_schema(xml_element, {'node': {'el1': None, 'el2': None}}, False)
     with pytest.raises(XmlSchemaError):